@@ -1,20 +1,49 @@
-from sqlalchemy import create_engine
+import asyncio
+
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker
+
 from .config import settings
+from .utils.pool import InstrumentedAsyncPool
+
+# Async driver URL (asyncpg with SSL for PostgreSQL, aiosqlite for SQLite)
+SQLALCHEMY_DATABASE_URL = settings.ASYNC_DATABASE_URL
 
-# Use the URL with SSL for PostgreSQL
-SQLALCHEMY_DATABASE_URL = settings.DATABASE_URL_WITH_SSL
+def pool_options() -> dict:
+    # An in-memory SQLite database lives inside its single connection, so keep
+    # SQLAlchemy's default (static) pool for it
+    if SQLALCHEMY_DATABASE_URL.startswith("sqlite") and ":memory:" in SQLALCHEMY_DATABASE_URL:
+        return {}
+    return {
+        "poolclass": InstrumentedAsyncPool,
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
 
-engine = create_engine(SQLALCHEMY_DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+engine = create_async_engine(SQLALCHEMY_DATABASE_URL, **pool_options())
+# expire_on_commit=False: attributes must stay loaded after commit, since
+# response models are serialized outside the session's greenlet context
+SessionLocal = async_sessionmaker(bind=engine, class_=AsyncSession, autoflush=False, expire_on_commit=False)
 
 Base = declarative_base()
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
\ No newline at end of file
+
+async def warm_up_pool(connections: int):
+    """Open pooled connections up front so the first requests don't pay for connecting"""
+    if not isinstance(engine.pool, InstrumentedAsyncPool):
+        return
+    opened = await asyncio.gather(*(engine.connect() for _ in range(min(connections, settings.DB_POOL_SIZE))))
+    for connection in opened:
+        await connection.close()
+
+def pool_stats() -> dict:
+    if isinstance(engine.pool, InstrumentedAsyncPool):
+        return engine.pool.stats()
+    return {"pool": type(engine.pool).__name__}
\ No newline at end of file
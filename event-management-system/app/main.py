@@ -1,15 +1,21 @@
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
-from .database import engine, Base
+from .config import settings
+from .database import engine, Base, warm_up_pool
+from .utils.broker import broker
+from .utils.hashing import password_hasher
+from .utils.metrics import MetricsMiddleware, instrument_engine
+from .utils.pagination import NEXT_CURSOR_HEADER
 from .models.user import User
 from .models.event import Event
 from .models.permission import Permission
 from .models.version import EventVersion
-from .routers import auth_router, events_router, collaboration_router, versions_router
-
-# Create tables
-Base.metadata.create_all(bind=engine)
+from .models.change import EventChange
+from .routers import (
+    auth_router, events_router, collaboration_router, versions_router, diagnostics_router, metrics_router, stream_router,
+    scheduling_router, sync_router, calendar_router
+)
 
 app = FastAPI(
     title="Collaborative Event Management System",
@@ -17,6 +23,31 @@ app = FastAPI(
     version="1.0.0"
 )
 
+# Migrations own the schema (alembic upgrade head, run once per deploy), so
+# workers no longer race each other issuing DDL on startup
+@app.on_event("startup")
+async def create_tables():
+    if settings.AUTO_CREATE_TABLES:
+        async with engine.begin() as conn:
+            await conn.run_sync(Base.metadata.create_all)
+
+@app.on_event("startup")
+async def warm_up_connections():
+    if settings.DB_POOL_WARMUP:
+        await warm_up_pool(settings.DB_POOL_WARMUP)
+
+@app.on_event("startup")
+async def start_broker():
+    await broker.start()
+
+@app.on_event("shutdown")
+async def shutdown_password_hasher():
+    password_hasher.shutdown()
+
+@app.on_event("shutdown")
+async def stop_broker():
+    await broker.stop()
+
 # Add CORS middleware
 app.add_middleware(
     CORSMiddleware,
@@ -24,13 +55,24 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=[NEXT_CURSOR_HEADER, "ETag"],
 )
 
+# Per-route latency and SQL counts, exported on /metrics
+instrument_engine(engine.sync_engine)
+app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(auth_router)
 app.include_router(events_router)
 app.include_router(collaboration_router)
 app.include_router(versions_router)
+app.include_router(diagnostics_router)
+app.include_router(metrics_router)
+app.include_router(stream_router)
+app.include_router(scheduling_router)
+app.include_router(sync_router)
+app.include_router(calendar_router)
 
 @app.get("/")
 def read_root():
@@ -0,0 +1,25 @@
+from sqlalchemy import BigInteger, Column, Integer, ForeignKey, DateTime, Index
+from sqlalchemy.sql import func
+from ..database import Base
+
+class EventChange(Base):
+    """
+    One row per user whose view of an event changed: the event was created,
+    edited, rolled back or deleted, or the user's role on it was granted, changed
+    or removed. The id is the sync sequence. There is deliberately no foreign key
+    to events, so rows outlive a deleted event as its tombstones.
+    """
+    __tablename__ = "event_changes"
+
+    # SQLite only auto-increments INTEGER PRIMARY KEY columns
+    id = Column(BigInteger().with_variant(Integer, "sqlite"), primary_key=True)
+    user_id = Column(Integer, ForeignKey("users.id", ondelete="CASCADE"), nullable=False)
+    event_id = Column(Integer, nullable=False)
+    created_at = Column(DateTime(timezone=True), server_default=func.now())
+
+    __table_args__ = (
+        # A user's changes after a sync token: one range scan
+        Index("ix_event_changes_user_seq", user_id, id),
+        # When a user's calendar feed last changed: one lookup of the newest entry
+        Index("ix_event_changes_user_time", user_id, created_at),
+    )
@@ -1,4 +1,4 @@
-from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text
+from sqlalchemy import Boolean, Column, Integer, String, DateTime, ForeignKey, Text, Index, JSON
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB
@@ -14,11 +14,26 @@ class Event(Base):
     end_time = Column(DateTime(timezone=True))
     location = Column(String, nullable=True)
     is_recurring = Column(Boolean, default=False)
-    recurrence_pattern = Column(JSONB, nullable=True)  # PostgreSQL JSONB type
+    recurrence_pattern = Column(JSONB().with_variant(JSON(), "sqlite"), nullable=True)  # PostgreSQL JSONB type
     owner_id = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
+    # Number of the event's latest version; every write bumps it (optimistic locking, ETags)
+    version = Column(Integer, nullable=False, default=1, server_default="1")
     
     owner = relationship("User")
     permissions = relationship("Permission", back_populates="event", cascade="all, delete-orphan")
-    versions = relationship("EventVersion", back_populates="event", cascade="all, delete-orphan")
\ No newline at end of file
+    versions = relationship("EventVersion", back_populates="event", cascade="all, delete-orphan")
+
+    __table_args__ = (
+        # B-tree index on (start_time, end_time); serves the overlap predicate on every backend
+        Index("ix_events_start_end", start_time, end_time),
+        # Sort key of the keyset-paginated event list
+        Index("ix_events_start_id", start_time, id),
+        # GiST index on the half-open period [start_time, end_time) for && lookups on PostgreSQL
+        Index(
+            "ix_events_period",
+            func.tstzrange(start_time, end_time),
+            postgresql_using="gist",
+        ).ddl_if(dialect="postgresql"),
+    )
\ No newline at end of file
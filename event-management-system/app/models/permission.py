@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, String, ForeignKey, DateTime
+from sqlalchemy import Column, Integer, String, ForeignKey, DateTime, Index
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from ..database import Base
@@ -14,4 +14,11 @@ class Permission(Base):
     updated_at = Column(DateTime(timezone=True), onupdate=func.now())
     
     event = relationship("Event", back_populates="permissions")
-    user = relationship("User")
\ No newline at end of file
+    user = relationship("User")
+
+    __table_args__ = (
+        # "Events visible to user X" lookups join from here on (user_id, event_id)
+        Index("ix_permissions_user_event", user_id, event_id),
+        # One role per user and event; also the conflict target of the share upsert
+        Index("uq_permissions_event_user", event_id, user_id, unique=True),
+    )
\ No newline at end of file
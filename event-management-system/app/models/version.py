@@ -1,4 +1,4 @@
-from sqlalchemy import Column, Integer, ForeignKey, DateTime, Text
+from sqlalchemy import Boolean, Column, Integer, ForeignKey, DateTime, Text, Index, JSON, true
 from sqlalchemy.orm import relationship
 from sqlalchemy.sql import func
 from sqlalchemy.dialects.postgresql import JSONB
@@ -9,11 +9,17 @@ class EventVersion(Base):
 
     id = Column(Integer, primary_key=True, index=True)
     event_id = Column(Integer, ForeignKey("events.id", ondelete="CASCADE"))
-    data = Column(JSONB)  # PostgreSQL JSONB type
+    data = Column(JSONB().with_variant(JSON(), "sqlite"))  # PostgreSQL JSONB type
+    is_keyframe = Column(Boolean, nullable=False, default=True, server_default=true())  # False: data is a delta
     created_by = Column(Integer, ForeignKey("users.id"))
     created_at = Column(DateTime(timezone=True), server_default=func.now())
     change_description = Column(Text, nullable=True)
     
     event = relationship("Event", back_populates="versions")
     user = relationship("User")
-    
\ No newline at end of file
+    
+
+    __table_args__ = (
+        # Newest-first changelog pages seek on (created_at, id) within one event
+        Index("ix_event_versions_event_created", event_id, created_at, id),
+    )
\ No newline at end of file
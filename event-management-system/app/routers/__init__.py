@@ -2,5 +2,13 @@ from .auth import router as auth_router
 from .events import router as events_router
 from .collaboration import router as collaboration_router
 from .versions import router as versions_router
+from .diagnostics import router as diagnostics_router
+from .metrics import router as metrics_router
+from .stream import router as stream_router
+from .scheduling import router as scheduling_router
+from .sync import router as sync_router
+from .calendar import router as calendar_router
 
-__all__ = ["auth_router", "events_router", "collaboration_router", "versions_router"]
\ No newline at end of file
+__all__ = ["auth_router", "events_router", "collaboration_router", "versions_router", "diagnostics_router",
+           "metrics_router", "stream_router", "scheduling_router",
+           "sync_router", "calendar_router"]
\ No newline at end of file
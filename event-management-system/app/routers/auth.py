@@ -1,12 +1,15 @@
 from fastapi import APIRouter, Depends, HTTPException, status
 from fastapi.security import OAuth2PasswordRequestForm
-from sqlalchemy.orm import Session
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
 from datetime import timedelta
 
 from ..database import get_db
 from ..schemas.user import UserCreate, User, Token
 from ..models.user import User as UserModel
-from ..utils.auth import authenticate_user, create_access_token, get_password_hash, get_current_active_user
+from ..utils.auth import authenticate_user, create_access_token, get_current_active_user
+from ..utils.hashing import password_hasher
+from ..utils.query_budget import query_budget
 from ..config import settings
 
 router = APIRouter(
@@ -14,30 +17,30 @@ router = APIRouter(
     tags=["authentication"]
 )
 
-@router.post("/register", response_model=User)
-def register_user(user: UserCreate, db: Session = Depends(get_db)):
-    db_user = db.query(UserModel).filter(UserModel.username == user.username).first()
+@router.post("/register", response_model=User, dependencies=[Depends(query_budget(4))])
+async def register_user(user: UserCreate, db: AsyncSession = Depends(get_db)):
+    db_user = await db.scalar(select(UserModel).filter(UserModel.username == user.username))
     if db_user:
         raise HTTPException(status_code=400, detail="Username already registered")
     
-    db_email = db.query(UserModel).filter(UserModel.email == user.email).first()
+    db_email = await db.scalar(select(UserModel).filter(UserModel.email == user.email))
     if db_email:
         raise HTTPException(status_code=400, detail="Email already registered")
     
-    hashed_password = get_password_hash(user.password)
+    hashed_password = await password_hasher.hash(user.password)
     db_user = UserModel(
         username=user.username,
         email=user.email,
         hashed_password=hashed_password
     )
     db.add(db_user)
-    db.commit()
-    db.refresh(db_user)
+    await db.commit()
+    await db.refresh(db_user)
     return db_user
 
-@router.post("/login", response_model=Token)
-def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: Session = Depends(get_db)):
-    user = authenticate_user(db, form_data.username, form_data.password)
+@router.post("/login", response_model=Token, dependencies=[Depends(query_budget(2))])
+async def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db: AsyncSession = Depends(get_db)):
+    user = await authenticate_user(db, form_data.username, form_data.password)
     if not user:
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
@@ -50,7 +53,7 @@ def login_for_access_token(form_data: OAuth2PasswordRequestForm = Depends(), db:
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.post("/refresh", response_model=Token)
+@router.post("/refresh", response_model=Token, dependencies=[Depends(query_budget(1))])
 def refresh_token(current_user: UserModel = Depends(get_current_active_user)):
     access_token_expires = timedelta(minutes=settings.ACCESS_TOKEN_EXPIRE_MINUTES)
     access_token = create_access_token(
@@ -58,7 +61,7 @@ def refresh_token(current_user: UserModel = Depends(get_current_active_user)):
     )
     return {"access_token": access_token, "token_type": "bearer"}
 
-@router.post("/logout")
+@router.post("/logout", dependencies=[Depends(query_budget(0))])
 def logout():
     # In a stateless JWT system, the client simply discards the token
     # For added security, you could implement a token blacklist
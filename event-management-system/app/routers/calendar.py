@@ -0,0 +1,109 @@
+from fastapi import APIRouter, Depends, HTTPException, Request, Response
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator
+
+from ..config import settings
+from ..database import get_db
+from ..schemas.calendar import CalendarFeedToken
+from ..models.event import Event as EventModel
+from ..models.permission import Permission as PermissionModel
+from ..models.user import User as UserModel
+from ..utils.acl import READ_ROLES, require_event_role
+from ..utils.auth import create_feed_token, get_current_active_user, get_feed_user
+from ..utils.etag import event_etag, last_modified, not_modified, not_modified_since
+from ..utils.ical import CALENDAR_FOOTER, calendar_header, encode_event
+from ..utils.query_budget import query_budget
+from ..utils.sync import last_change_at
+
+router = APIRouter(
+    prefix="/api",
+    tags=["calendar"]
+)
+
+CALENDAR_MEDIA_TYPE = "text/calendar"
+
+# Everything a VEVENT needs, read as plain rows so nothing accumulates in the session
+FEED_COLUMNS = (
+    EventModel.id, EventModel.title, EventModel.description, EventModel.location,
+    EventModel.start_time, EventModel.end_time, EventModel.is_recurring, EventModel.recurrence_pattern,
+    EventModel.created_at, EventModel.updated_at, EventModel.version
+)
+
+async def stream_calendar(rows, name: str) -> AsyncIterator[str]:
+    """Yield a VCALENDAR, encoding each batch of a server-side cursor as it arrives"""
+    yield calendar_header(name)
+    async for batch in rows.partitions():
+        yield "".join(encode_event(row) for row in batch)
+    yield CALENDAR_FOOTER
+
+@router.post("/calendar/feed-token", response_model=CalendarFeedToken, dependencies=[Depends(query_budget(2))])
+async def create_calendar_feed_token(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    A token for calendar subscription URLs, valid for CALENDAR_FEED_TOKEN_EXPIRE_DAYS.
+    It only opens the caller's feeds; the rest of the API refuses it. Issuing
+    one revokes the caller's previous feed token.
+    """
+    token, expires_at = await create_feed_token(db, current_user)
+    await db.commit()
+    url = request.url_for("get_calendar_feed").include_query_params(token=token)
+    return CalendarFeedToken(token=token, expires_at=expires_at, url=str(url))
+
+@router.get("/calendar.ics", response_class=Response, dependencies=[Depends(query_budget(3))])
+async def get_calendar_feed(
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_feed_user)
+):
+    """
+    Every event the caller holds a role on, as an iCalendar feed. Recurring
+    events are sent as one VEVENT with an RRULE. Rows are streamed from a
+    server-side cursor and encoded a batch at a time, so memory stays flat
+    however many events there are. A poll with If-Modified-Since gets a 304
+    until the caller's change log has something newer.
+    """
+    headers = {}
+    changed_at = await last_change_at(db, current_user.id)
+    if changed_at is not None:
+        headers["Last-Modified"] = last_modified(changed_at)
+        unchanged = not_modified_since(request, changed_at, headers)
+        if unchanged:
+            return unchanged
+
+    # Driven by ix_permissions_user_event
+    rows = await db.stream(
+        select(*FEED_COLUMNS).join(
+            PermissionModel,
+            (PermissionModel.event_id == EventModel.id) & (PermissionModel.user_id == current_user.id)
+        ).order_by(EventModel.id).execution_options(yield_per=settings.CALENDAR_FEED_BATCH_SIZE)
+    )
+    return StreamingResponse(stream_calendar(rows, current_user.username), media_type=CALENDAR_MEDIA_TYPE,
+                             headers=headers)
+
+@router.get("/events/{event_id}/calendar.ics", response_class=Response, dependencies=[Depends(query_budget(2))])
+async def get_event_calendar(
+    event_id: int,
+    request: Request,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_feed_user)
+):
+    """One event as an iCalendar feed, with the event's ETag and Last-Modified"""
+    access = await require_event_role(db, event_id, current_user.id, READ_ROLES,
+                                      "You don't have access to this event", load_event=True)
+    event = access.event
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+
+    changed_at = event.updated_at or event.created_at
+    headers = {"ETag": event_etag(event), "Last-Modified": last_modified(changed_at)}
+    unchanged = not_modified(request, headers["ETag"]) or not_modified_since(request, changed_at, headers)
+    if unchanged:
+        return unchanged
+
+    body = calendar_header(event.title or "") + encode_event(event) + CALENDAR_FOOTER
+    return Response(body, media_type=CALENDAR_MEDIA_TYPE, headers=headers)
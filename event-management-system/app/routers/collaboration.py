@@ -1,129 +1,135 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status
+from sqlalchemy import func, select
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Dict, List
 
 from ..database import get_db
 from ..schemas.permission import Permission, PermissionCreate, PermissionUpdate, ShareEvent, RoleEnum
 from ..models.permission import Permission as PermissionModel
-from ..models.event import Event as EventModel
 from ..models.user import User as UserModel
+from ..utils.acl import OWNER_ROLES, event_user_ids, invalidate_event_access, require_event_role, resolve_event_access
 from ..utils.auth import get_current_active_user
+from ..utils.broker import broker, permission_changed
+from ..utils.etag import not_modified, permissions_etag
+from ..utils.query_budget import query_budget
+from ..utils.sync import record_user_changes
 
 router = APIRouter(
     prefix="/api/events",
     tags=["collaboration"]
 )
 
-def check_event_ownership(db: Session, event_id: int, user_id: int):
-    """Check if user is the owner of the event"""
-    permission = db.query(PermissionModel).filter(
-        PermissionModel.event_id == event_id,
-        PermissionModel.user_id == user_id,
-        PermissionModel.role == RoleEnum.owner.value
-    ).first()
-    
-    if not permission:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Only the owner can manage permissions"
-        )
-    return permission
+async def upsert_permissions(db: AsyncSession, event_id: int, roles: Dict[int, str]):
+    """
+    INSERT ... ON CONFLICT (event_id, user_id) DO UPDATE for every user, executed
+    as one executemany. The owner's own row is never downgraded. The caller commits.
+    """
+    insert = pg_insert if db.get_bind().dialect.name == "postgresql" else sqlite_insert
+    statement = insert(PermissionModel)
+    statement = statement.on_conflict_do_update(
+        index_elements=[PermissionModel.event_id, PermissionModel.user_id],
+        set_={"role": statement.excluded.role, "updated_at": func.now()},
+        where=PermissionModel.role != RoleEnum.owner.value
+    )
+    await db.execute(statement, [
+        {"event_id": event_id, "user_id": user_id, "role": role}
+        for user_id, role in roles.items()
+    ])
 
-@router.post("/{event_id}/share", response_model=List[Permission])
-def share_event(
+@router.post("/{event_id}/share", response_model=List[Permission], dependencies=[Depends(query_budget(7))])
+async def share_event(
     event_id: int,
     share_data: ShareEvent,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
-    # Check if event exists
-    event = db.query(EventModel).filter(EventModel.id == event_id).first()
-    if not event:
+    # Check if event exists and current user is the owner
+    access = await resolve_event_access(db, event_id, current_user.id)
+    if not access.event_exists:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    # Check if current user is the owner
-    check_event_ownership(db, event_id, current_user.id)
-    
-    # Create permissions for each user
-    created_permissions = []
-    for user_perm in share_data.users:
-        # Check if user exists
-        user = db.query(UserModel).filter(UserModel.id == user_perm.user_id).first()
-        if not user:
-            raise HTTPException(status_code=404, detail=f"User with ID {user_perm.user_id} not found")
-        
-        # Check if permission already exists
-        existing_perm = db.query(PermissionModel).filter(
-            PermissionModel.event_id == event_id,
-            PermissionModel.user_id == user_perm.user_id
-        ).first()
-        
-        if existing_perm:
-            # Update existing permission
-            existing_perm.role = user_perm.role
-            db.commit()
-            db.refresh(existing_perm)
-            created_permissions.append(existing_perm)
-        else:
-            # Create new permission
-            new_perm = PermissionModel(
-                event_id=event_id,
-                user_id=user_perm.user_id,
-                role=user_perm.role
-            )
-            db.add(new_perm)
-            db.commit()
-            db.refresh(new_perm)
-            created_permissions.append(new_perm)
-    
-    return created_permissions
+    if access.role != RoleEnum.owner.value:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Only the owner can manage permissions"
+        )
+    
+    # Last entry wins if a user is listed twice
+    roles = {user_perm.user_id: user_perm.role.value for user_perm in share_data.users}
+    if not roles:
+        return []
+    
+    # Validate every user in one query
+    found = set((await db.scalars(select(UserModel.id).filter(UserModel.id.in_(roles)))).all())
+    missing = [user_id for user_id in roles if user_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"User with ID {missing[0]} not found")
+    
+    # Write every role in one statement and one transaction
+    await upsert_permissions(db, event_id, roles)
+    await record_user_changes(db, ((user_id, event_id) for user_id in roles))
+    await db.commit()
+    invalidate_event_access(db, event_id, roles)
+    await broker.publish(permission_changed(event_id, current_user.id), await event_user_ids(db, event_id))
+    
+    permissions = (await db.scalars(select(PermissionModel).filter(
+        PermissionModel.event_id == event_id,
+        PermissionModel.user_id.in_(roles)
+    ))).all()
+    order = {user_id: position for position, user_id in enumerate(roles)}
+    return sorted(permissions, key=lambda permission: order[permission.user_id])
 
-@router.get("/{event_id}/permissions", response_model=List[Permission])
-def get_event_permissions(
+@router.get("/{event_id}/permissions", response_model=List[Permission], dependencies=[Depends(query_budget(3))])
+async def get_event_permissions(
     event_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
-    # Check if event exists
-    event = db.query(EventModel).filter(EventModel.id == event_id).first()
-    if not event:
+    # Check if event exists and user has access to it
+    access = await resolve_event_access(db, event_id, current_user.id)
+    if not access.event_exists:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    # Check if user has access to the event
-    user_perm = db.query(PermissionModel).filter(
-        PermissionModel.event_id == event_id,
-        PermissionModel.user_id == current_user.id
-    ).first()
-    
-    if not user_perm:
+    if not access.role:
         raise HTTPException(
             status_code=status.HTTP_403_FORBIDDEN,
             detail="You don't have access to this event"
         )
     
     # Get all permissions for the event
-    permissions = db.query(PermissionModel).filter(
+    permissions = (await db.scalars(select(PermissionModel).filter(
         PermissionModel.event_id == event_id
-    ).all()
+    ))).all()
+    
+    # Answer a poll for an unchanged list before building the response models
+    etag = permissions_etag(event_id, permissions)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
     
+    response.headers["ETag"] = etag
     return permissions
 
-@router.put("/{event_id}/permissions/{user_id}", response_model=Permission)
-def update_permission(
+@router.put("/{event_id}/permissions/{user_id}", response_model=Permission, dependencies=[Depends(query_budget(6))])
+async def update_permission(
     event_id: int,
     user_id: int,
     permission_update: PermissionUpdate,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     # Check if current user is the owner
-    check_event_ownership(db, event_id, current_user.id)
+    await require_event_role(db, event_id, current_user.id, OWNER_ROLES, "Only the owner can manage permissions")
     
     # Find the permission to update
-    permission = db.query(PermissionModel).filter(
+    permission = await db.scalar(select(PermissionModel).filter(
         PermissionModel.event_id == event_id,
         PermissionModel.user_id == user_id
-    ).first()
+    ))
     
     if not permission:
         raise HTTPException(status_code=404, detail="Permission not found")
@@ -137,26 +143,29 @@ def update_permission(
     
     # Update the permission
     permission.role = permission_update.role
-    db.commit()
-    db.refresh(permission)
+    await record_user_changes(db, [(user_id, event_id)])
+    await db.commit()
+    await db.refresh(permission)
+    invalidate_event_access(db, event_id, [user_id])
+    await broker.publish(permission_changed(event_id, current_user.id), await event_user_ids(db, event_id))
     
     return permission
 
-@router.delete("/{event_id}/permissions/{user_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_permission(
+@router.delete("/{event_id}/permissions/{user_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(query_budget(5))])
+async def delete_permission(
     event_id: int,
     user_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     # Check if current user is the owner
-    check_event_ownership(db, event_id, current_user.id)
+    await require_event_role(db, event_id, current_user.id, OWNER_ROLES, "Only the owner can manage permissions")
     
     # Find the permission to delete
-    permission = db.query(PermissionModel).filter(
+    permission = await db.scalar(select(PermissionModel).filter(
         PermissionModel.event_id == event_id,
         PermissionModel.user_id == user_id
-    ).first()
+    ))
     
     if not permission:
         raise HTTPException(status_code=404, detail="Permission not found")
@@ -169,7 +178,11 @@ def delete_permission(
         )
     
     # Delete the permission
-    db.delete(permission)
-    db.commit()
+    await db.delete(permission)
+    await record_user_changes(db, [(user_id, event_id)])
+    await db.commit()
+    invalidate_event_access(db, event_id, [user_id])
+    await broker.publish(permission_changed(event_id, current_user.id, revoked=[user_id]),
+                         await event_user_ids(db, event_id) + [user_id])
     
     return None
\ No newline at end of file
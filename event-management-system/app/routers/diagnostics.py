@@ -0,0 +1,45 @@
+from fastapi import APIRouter, Depends
+
+from ..database import pool_stats
+from ..models.user import User as UserModel
+from ..utils import acl
+from ..utils.auth import get_diagnostics_user, user_cache
+from ..utils.broker import broker
+from ..utils.hashing import password_hasher
+from ..utils.metrics import registry as request_metrics
+from ..utils.recurrence import rule_cache_stats
+
+router = APIRouter(
+    prefix="/api/diagnostics",
+    tags=["diagnostics"]
+)
+
+@router.get("/caches")
+async def get_cache_stats(current_user: UserModel = Depends(get_diagnostics_user)):
+    """Hit/miss counters of the in-process caches"""
+    return {
+        "users": user_cache.stats(),
+        "event_access": acl.stats(),
+        "recurrence": rule_cache_stats()
+    }
+
+@router.get("/password-hashing")
+async def get_password_hashing_stats(current_user: UserModel = Depends(get_diagnostics_user)):
+    """Pool saturation and per-operation bcrypt latency"""
+    return password_hasher.stats()
+
+
+@router.get("/db-pool")
+async def get_db_pool_stats(current_user: UserModel = Depends(get_diagnostics_user)):
+    """Connection pool occupancy, overflow and checkout wait times"""
+    return pool_stats()
+
+@router.get("/routes")
+async def get_route_stats(current_user: UserModel = Depends(get_diagnostics_user)):
+    """Per-route request counts, status codes, latency and SQL per request"""
+    return request_metrics.snapshot()
+
+@router.get("/stream")
+async def get_stream_stats(current_user: UserModel = Depends(get_diagnostics_user)):
+    """Live-feed subscribers in this process, fan-out time and publish-to-delivery latency"""
+    return broker.stats()
\ No newline at end of file
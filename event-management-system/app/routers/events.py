@@ -1,80 +1,168 @@
-from fastapi import APIRouter, Depends, HTTPException, status, Query
-from sqlalchemy.orm import Session
+from fastapi import APIRouter, Depends, HTTPException, Request, Response, status, Query
+from sqlalchemy import insert, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
 from typing import List, Optional
-from datetime import datetime
+from datetime import datetime, timedelta
 
+from ..config import settings
 from ..database import get_db
-from ..schemas.event import Event, EventCreate, EventUpdate, EventBatchCreate
+from ..schemas.event import Event, EventCreate, EventUpdate, EventBatchCreate, Occurrence
 from ..models.event import Event as EventModel
 from ..models.permission import Permission as PermissionModel
 from ..models.version import EventVersion as EventVersionModel
 from ..schemas.permission import RoleEnum
 from ..models.user import User as UserModel
+from ..utils.acl import EDIT_ROLES, OWNER_ROLES, READ_ROLES, event_user_ids, invalidate_event_access, require_event_role
 from ..utils.auth import get_current_active_user
+from ..utils.broker import broker, event_deleted, version_created
+from ..utils.etag import check_if_match, event_etag, not_modified, precondition_failed
+from ..utils.intervals import as_utc, find_overlaps
+from ..utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, parse_datetime, seek
+from ..utils.query_budget import allow_statements, query_budget
+from ..utils.recurrence import event_occurrences, expand, horizon
+from ..utils.sync import record_event_change, record_user_changes
+from ..utils.versioning import create_event_version, event_snapshot, update_event_row
 
 router = APIRouter(
     prefix="/api/events",
     tags=["events"]
 )
 
-def check_event_access(db: Session, event_id: int, user_id: int, required_roles: List[str]):
-    """Check if user has required access to the event"""
-    permission = db.query(PermissionModel).filter(
-        PermissionModel.event_id == event_id,
-        PermissionModel.user_id == user_id
-    ).first()
-    
-    if not permission or permission.role not in required_roles:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="Not enough permissions"
+def overlaps_period(db: AsyncSession, start_time: datetime, end_time: datetime):
+    """
+    Half-open overlap predicate: start < other_end AND end > other_start.
+    On PostgreSQL it is written as tstzrange && tstzrange so it can use the
+    ix_events_period GiST index; elsewhere the (start_time, end_time) index serves it.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        return func.tstzrange(EventModel.start_time, EventModel.end_time).op("&&")(
+            func.tstzrange(start_time, end_time)
         )
-    return permission
+    return (EventModel.start_time < end_time) & (EventModel.end_time > start_time)
 
-def check_event_conflicts(db: Session, start_time: datetime, end_time: datetime, 
-                         user_id: int, exclude_event_id: Optional[int] = None):
-    """Check for conflicting events"""
-    query = db.query(EventModel).join(
+async def fetch_occurrences(db: AsyncSession, user_id: int, window_start: datetime, window_end: datetime,
+                            exclude_event_id: Optional[int] = None):
+    """
+    (start, end, event) for every occurrence of the user's events overlapping
+    [window_start, window_end). One-off events are matched in SQL; recurring
+    series that began before the window ends are fetched and expanded.
+    """
+    query = select(EventModel).join(
         PermissionModel, EventModel.id == PermissionModel.event_id
     ).filter(
         PermissionModel.user_id == user_id,
-        # Event starts during another event
-        ((EventModel.start_time <= start_time) & (EventModel.end_time > start_time)) |
-        # Event ends during another event
-        ((EventModel.start_time < end_time) & (EventModel.end_time >= end_time)) |
-        # Event completely contains another event
-        ((EventModel.start_time >= start_time) & (EventModel.end_time <= end_time))
+        or_(
+            overlaps_period(db, window_start, window_end),
+            EventModel.is_recurring.is_(True) & (EventModel.start_time < window_end)
+        )
     )
     
     if exclude_event_id:
         query = query.filter(EventModel.id != exclude_event_id)
     
-    conflicts = query.all()
-    return conflicts
+    return [
+        (start, end, event)
+        for event in (await db.scalars(query)).all()
+        for start, end in event_occurrences(event, window_start, window_end)
+    ]
 
-def create_event_version(db: Session, event_id: int, user_id: int, data: dict, description: str = None):
-    """Create a new version of an event"""
-    version = EventVersionModel(
-        event_id=event_id,
-        created_by=user_id,
-        data=data,
-        change_description=description
+def candidate_occurrences(start_time: datetime, end_time: datetime, is_recurring: Optional[bool],
+                          recurrence_pattern: Optional[dict]):
+    """Occurrences of an event about to be written, up to the recurrence horizon"""
+    pattern = recurrence_pattern if is_recurring else None
+    return expand(pattern, start_time, end_time, start_time, horizon(start_time))
+
+async def check_event_conflicts(db: AsyncSession, start_time: datetime, end_time: datetime, 
+                               user_id: int, exclude_event_id: Optional[int] = None,
+                               is_recurring: bool = False, recurrence_pattern: Optional[dict] = None):
+    """Check for conflicting events, comparing every occurrence of recurring ones"""
+    candidates = candidate_occurrences(start_time, end_time, is_recurring, recurrence_pattern)
+    if not candidates:
+        return []
+    
+    existing = await fetch_occurrences(
+        db, user_id, candidates[0][0], max(end for _, end in candidates), exclude_event_id
+    )
+    overlaps = find_overlaps(
+        ((start, end, event.id) for start, end, event in existing),
+        ((start, end, idx) for idx, (start, end) in enumerate(candidates))
     )
-    db.add(version)
-    db.commit()
-    db.refresh(version)
-    return version
+    conflict_ids = set().union(*(found["existing"] for found in overlaps.values()))
+    
+    conflicts = {event.id: event for _, _, event in existing if event.id in conflict_ids}
+    return list(conflicts.values())
+
+async def bulk_create_events(db: AsyncSession, owner_id: int, events: List[EventCreate],
+                             chunk_size: Optional[int] = None):
+    """
+    Insert events in one multi-row statement with RETURNING, then their owner
+    permissions, initial versions and sync changes with executemany, chunk_size
+    events at a time: four statements per chunk. The caller commits.
+    """
+    chunk_size = chunk_size or settings.BATCH_INSERT_CHUNK_SIZE
+    created_events = []
+    for offset in range(0, len(events), chunk_size):
+        chunk = events[offset:offset + chunk_size]
+        
+        # One multi-row VALUES statement: as executemany parameters, rows would be
+        # split into one INSERT per set of non-null keys (e.g. with and without a
+        # location). The database numbers the rows in VALUES order, but RETURNING
+        # needn't list them that way, so they are put back in order by id
+        db_events = (await db.scalars(
+            insert(EventModel).values([
+                {
+                    "title": event.title,
+                    "description": event.description,
+                    "start_time": event.start_time,
+                    "end_time": event.end_time,
+                    "location": event.location,
+                    "is_recurring": event.is_recurring,
+                    "recurrence_pattern": event.recurrence_pattern,
+                    "owner_id": owner_id
+                }
+                for event in chunk
+            ]).returning(EventModel)
+        )).all()
+        db_events.sort(key=lambda db_event: db_event.id)
+        
+        await db.execute(
+            insert(PermissionModel),
+            [
+                {"event_id": db_event.id, "user_id": owner_id, "role": RoleEnum.owner.value}
+                for db_event in db_events
+            ]
+        )
+        
+        await db.execute(
+            insert(EventVersionModel),
+            [
+                {
+                    "event_id": db_event.id,
+                    "created_by": owner_id,
+                    "data": event_snapshot(db_event),
+                    "change_description": "Event created in batch"
+                }
+                for db_event in db_events
+            ]
+        )
+        await record_user_changes(db, ((owner_id, db_event.id) for db_event in db_events))
+        
+        created_events.extend(db_events)
+    
+    return created_events
 
-@router.post("", response_model=Event)
-def create_event(
+@router.post("", response_model=Event, dependencies=[Depends(query_budget(6))])
+async def create_event(
     event: EventCreate, 
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
     force_create: bool = Query(False, description="Create event even if conflicts exist")
 ):
     # Check for conflicts
-    conflicts = check_event_conflicts(
-        db, event.start_time, event.end_time, current_user.id
+    conflicts = await check_event_conflicts(
+        db, event.start_time, event.end_time, current_user.id,
+        is_recurring=event.is_recurring, recurrence_pattern=event.recurrence_pattern
     )
     
     if conflicts and not force_create:
@@ -83,7 +171,7 @@ def create_event(
             detail=f"Event conflicts with {len(conflicts)} existing events"
         )
     
-    # Create the event
+    # Create the event, its owner permission and its first version in one transaction
     db_event = EventModel(
         title=event.title,
         description=event.description,
@@ -95,8 +183,7 @@ def create_event(
         owner_id=current_user.id
     )
     db.add(db_event)
-    db.commit()
-    db.refresh(db_event)
+    await db.flush()
     
     # Create owner permission
     permission = PermissionModel(
@@ -107,100 +194,152 @@ def create_event(
     db.add(permission)
     
     # Create initial version
-    create_event_version(
-        db, 
-        db_event.id, 
-        current_user.id, 
-        {
-            "title": db_event.title,
-            "description": db_event.description,
-            "start_time": db_event.start_time.isoformat(),
-            "end_time": db_event.end_time.isoformat(),
-            "location": db_event.location,
-            "is_recurring": db_event.is_recurring,
-            "recurrence_pattern": db_event.recurrence_pattern
-        },
-        "Event created"
-    )
+    await create_event_version(db, db_event, current_user.id, "Event created")
+    await record_user_changes(db, [(current_user.id, db_event.id)])
     
-    db.commit()
+    await db.commit()
     return db_event
 
-@router.get("", response_model=List[Event])
-def get_events(
+# Page queries one list request may issue: its budget of 5 less the user lookup
+LIST_MAX_SCANS = 4
+
+@router.get("", response_model=List[Event], dependencies=[Depends(query_budget(5))])
+async def get_events(
+    response: Response,
     skip: int = 0, 
     limit: int = 100,
     start_date: Optional[datetime] = None,
     end_date: Optional[datetime] = None,
-    db: Session = Depends(get_db),
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from a previous page's {NEXT_CURSOR_HEADER} header"),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     # Get all events where user has any permission
-    query = db.query(EventModel).join(
+    query = select(EventModel).join(
         PermissionModel, EventModel.id == PermissionModel.event_id
     ).filter(
         PermissionModel.user_id == current_user.id
     )
     
-    # Apply date filters if provided
+    # Apply date filters if provided. A recurring series is a candidate whenever it
+    # began before the window ends; its occurrences decide below.
     if start_date:
-        query = query.filter(EventModel.end_time >= start_date)
+        query = query.filter(or_(EventModel.end_time >= start_date, EventModel.is_recurring.is_(True)))
     if end_date:
         query = query.filter(EventModel.start_time <= end_date)
     
-    events = query.offset(skip).limit(limit).all()
+    # A window bounded on one side only is closed at the recurrence horizon
+    window = None
+    if start_date or end_date:
+        window_start = start_date or end_date - timedelta(days=settings.RECURRENCE_HORIZON_DAYS)
+        window_end = end_date or horizon(start_date)
+        window = (window_start, window_end)
+    
+    # Pages are ordered by (start_time, id) and served from ix_events_start_id.
+    # A cursor seeks past the last row of the previous page; skip is only
+    # honoured without one, for older clients.
+    sort_key = (EventModel.start_time, EventModel.id)
+    if cursor:
+        page_query = query.filter(seek(db, sort_key, decode_cursor(cursor, (parse_datetime, int))))
+    else:
+        page_query = query.offset(skip)
+    
+    # Fetch one extra row to learn whether there is a next page. Series with no
+    # occurrence in the window are dropped, so keep seeking until the page is full,
+    # for at most LIST_MAX_SCANS queries; past that the page is returned short,
+    # with a cursor that resumes after the last row scanned.
+    events = []
+    next_key = None
+    for scan in range(LIST_MAX_SCANS):
+        batch = (await db.scalars(page_query.order_by(*sort_key).limit(limit + 1))).all()
+        for db_event in batch:
+            if window is None or not db_event.is_recurring:
+                events.append(db_event)
+                continue
+            occurrences = event_occurrences(db_event, *window)
+            if occurrences:
+                item = Event.from_orm(db_event)
+                item.occurrences = [Occurrence(start_time=start, end_time=end) for start, end in occurrences]
+                events.append(item)
+        if len(events) > limit or len(batch) <= limit:
+            break
+        next_key = (batch[-1].start_time, batch[-1].id)
+        page_query = query.filter(seek(db, sort_key, next_key))
+    else:
+        # Out of scans with the page still short: resume after what was read
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(*next_key)
+    
+    if len(events) > limit:
+        events = events[:limit]
+        if events:
+            response.headers[NEXT_CURSOR_HEADER] = encode_cursor(events[-1].start_time, events[-1].id)
     return events
 
-@router.get("/{event_id}", response_model=Event)
-def get_event(
+@router.get("/{event_id}", response_model=Event, dependencies=[Depends(query_budget(2))])
+async def get_event(
     event_id: int, 
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
-    # Check if user has access to the event (any role)
-    check_event_access(db, event_id, current_user.id, 
-                      [RoleEnum.owner.value, RoleEnum.editor.value, RoleEnum.viewer.value])
+    # Check if user has access to the event (any role), loading it in the same query
+    access = await require_event_role(db, event_id, current_user.id, READ_ROLES, load_event=True)
     
-    event = db.query(EventModel).filter(EventModel.id == event_id).first()
+    event = access.event
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
+    # Answer a poll for an unchanged event before building the response model
+    etag = event_etag(event)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    
+    response.headers["ETag"] = etag
     return event
 
-@router.put("/{event_id}", response_model=Event)
-def update_event(
+@router.put("/{event_id}", response_model=Event, dependencies=[Depends(query_budget(6))])
+async def update_event(
     event_id: int,
     event_update: EventUpdate,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
     force_update: bool = Query(False, description="Update event even if conflicts exist")
 ):
-    # Check if user has edit access to the event
-    check_event_access(db, event_id, current_user.id, [RoleEnum.owner.value, RoleEnum.editor.value])
+    # Check if user has edit access to the event, loading it in the same query
+    access = await require_event_role(db, event_id, current_user.id, EDIT_ROLES, load_event=True)
     
     # Get the existing event
-    db_event = db.query(EventModel).filter(EventModel.id == event_id).first()
+    db_event = access.event
     if not db_event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    # Store original data for versioning
-    original_data = {
-        "title": db_event.title,
-        "description": db_event.description,
-        "start_time": db_event.start_time.isoformat(),
-        "end_time": db_event.end_time.isoformat(),
-        "location": db_event.location,
-        "is_recurring": db_event.is_recurring,
-        "recurrence_pattern": db_event.recurrence_pattern
-    }
+    # Optimistic concurrency: the ETag names the version the client read, and the
+    # UPDATE below only matches while the row is still at that version
+    expected_version = None
+    if "if-match" in request.headers:
+        check_if_match(request, event_etag(db_event))
+        expected_version = db_event.version
     
-    # Check for conflicts if times are being updated
-    if event_update.start_time or event_update.end_time:
+    # Check for conflicts if times or recurrence are being updated
+    update_data = event_update.dict(exclude_unset=True)
+    if update_data.keys() & {"start_time", "end_time", "is_recurring", "recurrence_pattern"}:
         start_time = event_update.start_time or db_event.start_time
         end_time = event_update.end_time or db_event.end_time
+        # The schema checks the two ends only when both are sent
+        if as_utc(end_time) <= as_utc(start_time):
+            raise HTTPException(
+                status_code=status.HTTP_422_UNPROCESSABLE_ENTITY,
+                detail="end_time must be after start_time"
+            )
         
-        conflicts = check_event_conflicts(
-            db, start_time, end_time, current_user.id, exclude_event_id=event_id
+        conflicts = await check_event_conflicts(
+            db, start_time, end_time, current_user.id, exclude_event_id=event_id,
+            is_recurring=update_data.get("is_recurring", db_event.is_recurring),
+            recurrence_pattern=update_data.get("recurrence_pattern", db_event.recurrence_pattern)
         )
         
         if conflicts and not force_update:
@@ -209,121 +348,104 @@ def update_event(
                 detail=f"Event update conflicts with {len(conflicts)} existing events"
             )
     
-    # Update event fields
-    update_data = event_update.dict(exclude_unset=True)
-    for key, value in update_data.items():
-        setattr(db_event, key, value)
-    
-    db.commit()
-    db.refresh(db_event)
-    
-    # Create new version
-    new_data = {
-        "title": db_event.title,
-        "description": db_event.description,
-        "start_time": db_event.start_time.isoformat(),
-        "end_time": db_event.end_time.isoformat(),
-        "location": db_event.location,
-        "is_recurring": db_event.is_recurring,
-        "recurrence_pattern": db_event.recurrence_pattern
-    }
+    # Update the row and record the new version in the same transaction
+    db_event = await update_event_row(db, event_id, update_data, expected_version)
+    if not db_event:
+        if expected_version is not None:
+            raise precondition_failed()
+        raise HTTPException(status_code=404, detail="Event not found")
     
-    create_event_version(
-        db, 
-        event_id, 
-        current_user.id, 
-        new_data,
-        "Event updated"
-    )
+    # Another writer may have committed since the event was loaded, so the delta
+    # holds every field this request set rather than a diff against a stale copy
+    version = await create_event_version(db, db_event, current_user.id, "Event updated", changed=update_data.keys())
+    await record_event_change(db, event_id)
+    await db.commit()
+    await broker.publish(version_created(db_event, version), await event_user_ids(db, event_id))
     
+    response.headers["ETag"] = event_etag(db_event)
     return db_event
 
-@router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT)
-def delete_event(
+@router.delete("/{event_id}", status_code=status.HTTP_204_NO_CONTENT, dependencies=[Depends(query_budget(9))])
+async def delete_event(
     event_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
-    # Check if user has owner access to the event
-    check_event_access(db, event_id, current_user.id, [RoleEnum.owner.value])
+    # Check if user has owner access to the event, loading it in the same query
+    access = await require_event_role(db, event_id, current_user.id, OWNER_ROLES, load_event=True)
     
     # Get the event
-    db_event = db.query(EventModel).filter(EventModel.id == event_id).first()
+    db_event = access.event
     if not db_event:
         raise HTTPException(status_code=404, detail="Event not found")
     
-    # Delete the event (and related records through cascade)
-    db.delete(db_event)
-    db.commit()
+    # Everyone with a role on the event loses it along with the event
+    user_ids = await event_user_ids(db, event_id)
+    
+    # Delete the event (and related records through cascade), leaving its sync
+    # changes behind as tombstones
+    await record_event_change(db, event_id)
+    await db.delete(db_event)
+    await db.commit()
+    invalidate_event_access(db, event_id, user_ids)
+    await broker.publish(event_deleted(event_id, current_user.id), user_ids)
     
     return None
 
-@router.post("/batch", response_model=List[Event])
-def create_batch_events(
+@router.post("/batch", response_model=List[Event], dependencies=[Depends(query_budget(6))])
+async def create_batch_events(
     batch: EventBatchCreate,
-    db: Session = Depends(get_db),
+    request: Request,
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user),
     force_create: bool = Query(False, description="Create events even if conflicts exist")
 ):
-    # Check for conflicts for all events
-    all_conflicts = []
-    for idx, event in enumerate(batch.events):
-        conflicts = check_event_conflicts(
-            db, event.start_time, event.end_time, current_user.id
-        )
-        if conflicts:
-            all_conflicts.append((idx, conflicts))
-    
-    if all_conflicts and not force_create:
-        raise HTTPException(
-            status_code=status.HTTP_409_CONFLICT,
-            detail=f"Found conflicts for {len(all_conflicts)} events in batch"
-        )
-    
-    # Create all events in a transaction
-    created_events = []
-    for event in batch.events:
-        db_event = EventModel(
-            title=event.title,
-            description=event.description,
-            start_time=event.start_time,
-            end_time=event.end_time,
-            location=event.location,
-            is_recurring=event.is_recurring,
-            recurrence_pattern=event.recurrence_pattern,
-            owner_id=current_user.id
-        )
-        db.add(db_event)
-        db.flush()  # Get ID without committing
-        
-        # Create owner permission
-        permission = PermissionModel(
-            event_id=db_event.id,
-            user_id=current_user.id,
-            role=RoleEnum.owner.value
-        )
-        db.add(permission)
-        
-        # Create initial version
-        event_data = {
-            "title": db_event.title,
-            "description": db_event.description,
-            "start_time": db_event.start_time.isoformat(),
-            "end_time": db_event.end_time.isoformat(),
-            "location": db_event.location,
-            "is_recurring": db_event.is_recurring,
-            "recurrence_pattern": db_event.recurrence_pattern
-        }
+    # Expand every batch event (recurring ones up to the horizon), fetch every existing
+    # occurrence overlapping the batch envelope in one query, then sweep the sorted
+    # intervals to find existing-vs-new and new-vs-new overlaps
+    if batch.events and not force_create:
+        candidates = [
+            (start, end, idx)
+            for idx, event in enumerate(batch.events)
+            for start, end in candidate_occurrences(
+                event.start_time, event.end_time, event.is_recurring, event.recurrence_pattern
+            )
+        ]
+        window_start = min((start for start, _, _ in candidates), default=None)
+        window_end = max((end for _, end, _ in candidates), default=None)
+        existing = await fetch_occurrences(db, current_user.id, window_start, window_end) if candidates else []
         
-        version = EventVersionModel(
-            event_id=db_event.id,
-            created_by=current_user.id,
-            data=event_data,
-            change_description="Event created in batch"
+        overlaps = find_overlaps(
+            ((start, end, e.id) for start, end, e in existing),
+            candidates
         )
-        db.add(version)
+        # Occurrences of one recurring batch event don't conflict with each other
+        for idx, found in list(overlaps.items()):
+            found["candidates"].discard(idx)
+            if not found["existing"] and not found["candidates"]:
+                del overlaps[idx]
         
-        created_events.append(db_event)
+        if overlaps:
+            raise HTTPException(
+                status_code=status.HTTP_409_CONFLICT,
+                detail={
+                    "message": f"Found conflicts for {len(overlaps)} events in batch",
+                    "conflicts": [
+                        {
+                            "index": idx,
+                            "event_ids": sorted(found["existing"]),
+                            "batch_indices": sorted(found["candidates"])
+                        }
+                        for idx, found in sorted(overlaps.items())
+                    ]
+                }
+            )
+    
+    # Bulk insert events, owner permissions and initial versions in one transaction.
+    # The budget covers one chunk; each further chunk adds its four statements
+    chunks = -(-len(batch.events) // settings.BATCH_INSERT_CHUNK_SIZE)
+    allow_statements(request, 4 * max(chunks - 1, 0))
+    created_events = await bulk_create_events(db, current_user.id, batch.events)
     
-    db.commit()
+    await db.commit()
     return created_events
\ No newline at end of file
@@ -0,0 +1,67 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
+
+from ..database import engine
+from ..utils import acl
+from ..utils.auth import user_cache
+from ..utils.broker import broker
+from ..utils.hashing import password_hasher
+from ..utils.metrics import PrometheusWriter
+from ..utils.pool import InstrumentedAsyncPool
+from ..utils.recurrence import rule_cache_stats
+
+router = APIRouter(tags=["diagnostics"])
+
+def _write_caches(writer: PrometheusWriter) -> None:
+    caches = {"users": user_cache.stats(), "event_access": acl.stats(), "recurrence": rule_cache_stats()}
+    for name, stats in caches.items():
+        writer.sample("cache_hits_total", "counter", "In-process cache hits", stats["hits"], cache=name)
+    for name, stats in caches.items():
+        writer.sample("cache_misses_total", "counter", "In-process cache misses", stats["misses"], cache=name)
+    for name, stats in caches.items():
+        writer.sample("cache_entries", "gauge", "Entries currently held", stats["size"], cache=name)
+
+def _write_password_hashing(writer: PrometheusWriter) -> None:
+    writer.sample("password_hash_pending", "gauge", "bcrypt operations queued or running",
+                  password_hasher.pending)
+    writer.sample("password_hash_rejected_total", "counter", "bcrypt operations refused with 503",
+                  password_hasher.rejected)
+    for op, histogram in password_hasher.latency.items():
+        writer.histogram("password_hash_duration_seconds", "bcrypt latency including queue wait",
+                         histogram, op=op)
+
+def _write_pool(writer: PrometheusWriter) -> None:
+    pool = engine.pool
+    if not isinstance(pool, InstrumentedAsyncPool):
+        return
+    writer.sample("db_pool_size", "gauge", "Configured pool size", pool.size())
+    writer.sample("db_pool_checked_out", "gauge", "Connections currently checked out", pool.checkedout())
+    writer.sample("db_pool_overflow", "gauge", "Open connections beyond pool size", max(pool.overflow(), 0))
+    writer.sample("db_pool_checkouts_total", "counter", "Connection checkouts", pool.checkouts)
+    writer.sample("db_pool_timeouts_total", "counter", "Checkouts that gave up waiting", pool.timeouts)
+    writer.histogram("db_pool_wait_seconds", "Time waiting for a connection", pool.wait_time)
+
+def _write_broker(writer: PrometheusWriter) -> None:
+    writer.sample("stream_subscribers", "gauge", "Open live-feed streams in this process", broker.subscribers)
+    writer.sample("stream_published_total", "counter", "Change notifications published", broker.published)
+    writer.sample("stream_delivered_total", "counter", "Notifications queued for a subscriber", broker.delivered)
+    writer.sample("stream_dropped_total", "counter", "Notifications dropped from full subscriber queues",
+                  broker.dropped)
+    writer.histogram("stream_fanout_seconds", "Time to queue one notification for all local subscribers",
+                     broker.fanout)
+    writer.histogram("stream_delivery_seconds", "Time from publish until a stream sends the notification",
+                     broker.latency)
+
+@router.get("/metrics", response_class=PlainTextResponse, include_in_schema=False)
+async def get_metrics():
+    """
+    Prometheus scrape endpoint. Unauthenticated, like most exporters; restrict it
+    at the proxy if route names or traffic volumes are sensitive.
+    """
+    writer = PrometheusWriter()
+    writer.write_routes()
+    _write_caches(writer)
+    _write_password_hashing(writer)
+    _write_pool(writer)
+    _write_broker(writer)
+    return PlainTextResponse(writer.render(), media_type="text/plain; version=0.0.4")
\ No newline at end of file
@@ -0,0 +1,193 @@
+import json
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from fastapi import APIRouter, Depends, HTTPException, Response, status
+from sqlalchemy import case, or_, select
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import aliased
+from typing import Dict, List, Optional, Tuple
+from zoneinfo import ZoneInfo
+
+from ..database import get_db
+from ..schemas.scheduling import WEEKDAYS, FreeBusy, FreeBusyQuery, Slot, SlotQuery, SlotSuggestions, WorkingHours
+from ..models.event import Event as EventModel
+from ..models.permission import Permission as PermissionModel
+from ..models.user import User as UserModel
+from ..utils.auth import get_current_active_user
+from ..utils.intervals import Block, as_utc, merge_intervals, subtract_intervals
+from ..utils.query_budget import query_budget
+from ..utils.recurrence import event_occurrences
+from .events import overlaps_period
+
+router = APIRouter(
+    prefix="/api",
+    tags=["scheduling"]
+)
+
+async def require_visible_users(db: AsyncSession, user_ids: List[int], caller_id: int):
+    """
+    404 for the first id that isn't a user, 403 for the first whose busy time the
+    caller may not see, checked in one query. A calendar is visible to its owner
+    and to anyone who holds a role on one of the same events.
+    """
+    mine = aliased(PermissionModel)
+    theirs = aliased(PermissionModel)
+    shares_event = select(mine.event_id).join(
+        theirs, theirs.event_id == mine.event_id
+    ).filter(
+        mine.user_id == caller_id, theirs.user_id == UserModel.id
+    ).exists()
+    found = dict((await db.execute(
+        select(UserModel.id, (UserModel.id == caller_id) | shares_event).filter(UserModel.id.in_(user_ids))
+    )).all())
+    missing = [user_id for user_id in user_ids if user_id not in found]
+    if missing:
+        raise HTTPException(status_code=404, detail=f"User with ID {missing[0]} not found")
+    hidden = [user_id for user_id in user_ids if not found[user_id]]
+    if hidden:
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail=f"You don't share an event with user {hidden[0]}, so their busy time is private"
+        )
+
+async def fetch_busy(db: AsyncSession, user_ids: List[int], caller_id: int,
+                     window_start: datetime, window_end: datetime) -> Dict[int, List[Block]]:
+    """
+    Each user's busy time in the window as merged blocks. Every event a user holds
+    a role on blocks their time, as it does in the conflict check; a block's keys
+    are the ids of the events in it that the caller holds a role on too.
+    """
+    # One row per (user, event) pair in the window, with the caller's own role on
+    # the event from an outer join; recurring series are expanded below. Patterns
+    # of one-off events are left out so thousands of rows aren't JSON-decoded.
+    caller = aliased(PermissionModel)
+    rows = (await db.execute(
+        select(
+            PermissionModel.user_id, EventModel.id, EventModel.start_time, EventModel.end_time,
+            EventModel.is_recurring,
+            case((EventModel.is_recurring.is_(True), EventModel.recurrence_pattern)).label("recurrence_pattern"),
+            caller.role.label("caller_role")
+        ).join(
+            EventModel, EventModel.id == PermissionModel.event_id
+        ).outerjoin(
+            caller, (caller.event_id == EventModel.id) & (caller.user_id == caller_id)
+        ).filter(
+            PermissionModel.user_id.in_(user_ids),
+            or_(
+                overlaps_period(db, window_start, window_end),
+                EventModel.is_recurring.is_(True) & (EventModel.start_time < window_end)
+            )
+        )
+    )).all()
+
+    intervals = defaultdict(list)
+    for row in rows:
+        user_id, event_id, start_time, end_time, _, pattern, caller_role = row
+        key = event_id if caller_role is not None else None
+        if pattern is None:
+            # Already matched against the window in SQL
+            intervals[user_id].append((as_utc(start_time), as_utc(end_time), key))
+            continue
+        for start, end in event_occurrences(row, window_start, window_end):
+            intervals[user_id].append((start, end, key))
+
+    return {user_id: merge_intervals(intervals[user_id], window_start, window_end) for user_id in user_ids}
+
+def working_windows(hours: Optional[WorkingHours], window_start: datetime,
+                    window_end: datetime) -> List[Tuple[datetime, datetime]]:
+    """
+    The search window cut down to working hours, as sorted UTC intervals. Hours
+    are wall-clock times in their zone, so they follow daylight saving changes.
+    """
+    if hours is None:
+        return [(window_start, window_end)]
+    zone = ZoneInfo(hours.timezone)
+    days = {WEEKDAYS.index(day) for day in hours.days}
+    windows = []
+    # A day either side, since the local date can differ from the UTC one
+    day = window_start.astimezone(zone).date() - timedelta(days=1)
+    last = window_end.astimezone(zone).date() + timedelta(days=1)
+    while day <= last:
+        if day.weekday() in days:
+            start = datetime.combine(day, hours.start, tzinfo=zone).astimezone(timezone.utc)
+            end = datetime.combine(day, hours.end, tzinfo=zone).astimezone(timezone.utc)
+            start, end = max(start, window_start), min(end, window_end)
+            if start < end:
+                windows.append((start, end))
+        day += timedelta(days=1)
+    return windows
+
+def first_on_grid(instant: datetime, step: timedelta, zone) -> datetime:
+    """The earliest grid point at or after ``instant``, counting from local midnight"""
+    local = instant.astimezone(zone)
+    midnight = datetime.combine(local.date(), datetime.min.time(), tzinfo=zone)
+    steps = -(-(local.replace(tzinfo=None) - midnight.replace(tzinfo=None)) // step)  # rounded up
+    return (midnight + steps * step).astimezone(timezone.utc)
+
+def busy_intervals(blocks):
+    return [
+        {"start_time": block.start.isoformat(), "end_time": block.end.isoformat(), "event_ids": sorted(block.keys)}
+        for block in blocks
+    ]
+
+@router.post("/freebusy", response_model=FreeBusy, dependencies=[Depends(query_budget(3))])
+async def get_free_busy(
+    query: FreeBusyQuery,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    Busy time of several users in one window, merged per user and across all of
+    them. Each user must be the caller or share an event with them. Only the
+    times are shown; an event is identified only when the caller holds a role on
+    it too.
+    """
+    window_start, window_end = as_utc(query.start_time), as_utc(query.end_time)
+    await require_visible_users(db, query.user_ids, current_user.id)
+    per_user = await fetch_busy(db, query.user_ids, current_user.id, window_start, window_end)
+
+    # Each user's blocks are already sorted runs, which the sort in the merge exploits
+    combined = merge_intervals(
+        (block.start, block.end, key)
+        for blocks in per_user.values() for block in blocks for key in (block.keys or (None,))
+    )
+    # Serialized here rather than validated back through the response model, which
+    # for a month of fifty calendars costs more than computing the answer
+    return Response(json.dumps({
+        "start_time": window_start.isoformat(),
+        "end_time": window_end.isoformat(),
+        "users": [{"user_id": user_id, "busy": busy_intervals(blocks)} for user_id, blocks in per_user.items()],
+        "combined": busy_intervals(combined),
+    }, separators=(",", ":")), media_type="application/json")
+
+@router.post("/events/suggest-slots", response_model=SlotSuggestions, dependencies=[Depends(query_budget(3))])
+async def suggest_slots(
+    query: SlotQuery,
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    The earliest slots of ``duration_minutes`` in the window, within working hours,
+    when the caller and every participant are free. Participants must share an
+    event with the caller, as for free/busy. Slots come from the complement
+    of everyone's merged busy time, so a slot suggested here passes the conflict check.
+    """
+    participants = list(dict.fromkeys([current_user.id, *query.user_ids]))
+    window_start, window_end = as_utc(query.start_time), as_utc(query.end_time)
+    await require_visible_users(db, participants, current_user.id)
+    per_user = await fetch_busy(db, participants, current_user.id, window_start, window_end)
+
+    busy = merge_intervals((block.start, block.end, None) for blocks in per_user.values() for block in blocks)
+    free = subtract_intervals(working_windows(query.working_hours, window_start, window_end), busy)
+
+    zone = ZoneInfo(query.working_hours.timezone) if query.working_hours else timezone.utc
+    duration, step = timedelta(minutes=query.duration_minutes), timedelta(minutes=query.step_minutes)
+    slots = []
+    for start, end in free:
+        slot = first_on_grid(start, step, zone)
+        while slot + duration <= end and len(slots) < query.max_results:
+            slots.append(Slot(start_time=slot, end_time=slot + duration))
+            slot += step
+        if len(slots) == query.max_results:
+            break
+    return SlotSuggestions(participants=participants, duration_minutes=query.duration_minutes, slots=slots)
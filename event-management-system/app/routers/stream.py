@@ -0,0 +1,82 @@
+import json
+import time
+from typing import Any, AsyncIterator, Callable, Dict, List, Optional
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import StreamingResponse
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..database import get_db
+from ..models.user import User as UserModel
+from ..utils.acl import READ_ROLES, require_event_role
+from ..utils.auth import get_current_active_user, oauth2_scheme, token_expiry
+from ..utils.broker import Channel, broker, event_channel, user_channel
+
+router = APIRouter(tags=["stream"])
+
+# Server-Sent Events: each notification is sent as
+#   event: <type>
+#   data: <notification as JSON>
+# with a comment line every EVENT_STREAM_HEARTBEAT_SECONDS, so proxies keep the
+# connection open and a dead client is noticed. A stream ends (at the next
+# heartbeat) once its token has expired; the client reconnects with a fresh one.
+
+SSE_HEADERS = {"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+RECONNECT_MS = 3000
+
+def format_event(message: Dict[str, Any]) -> str:
+    return f"event: {message['type']}\ndata: {json.dumps(message, separators=(',', ':'), default=str)}\n\n"
+
+async def sse_stream(channels: List[Channel], expires_at: Optional[float],
+                     ends_stream: Callable[[Dict[str, Any]], bool] = lambda message: False) -> AsyncIterator[str]:
+    # Subscribed before the first line goes out, so a client that has read it
+    # misses nothing published afterwards
+    subscription = broker.subscribe(channels)
+    try:
+        yield f"retry: {RECONNECT_MS}\n\n"
+        while True:
+            message = await subscription.get()
+            if expires_at is not None and time.time() >= expires_at:
+                return
+            if message is None:
+                yield ": keepalive\n\n"
+                continue
+            yield format_event(message)
+            if ends_stream(message):
+                return
+    finally:
+        broker.unsubscribe(subscription)
+
+def sse_response(stream: AsyncIterator[str]) -> StreamingResponse:
+    return StreamingResponse(stream, media_type="text/event-stream", headers=SSE_HEADERS)
+
+@router.get("/api/events/{event_id}/stream")
+async def stream_event_changes(
+    event_id: int,
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    Live notifications for one event: version.created, permission.changed and
+    event.deleted. The stream ends once the event is deleted or the caller's
+    access is revoked.
+    """
+    await require_event_role(db, event_id, current_user.id, READ_ROLES, "You don't have access to this event")
+    # An open stream holds no database connection
+    await db.close()
+
+    def ends_stream(message):
+        return message["type"] == "event.deleted" or current_user.id in message.get("revoked", ())
+
+    return sse_response(sse_stream([event_channel(event_id)], token_expiry(token), ends_stream))
+
+@router.get("/api/stream")
+async def stream_my_changes(
+    db: AsyncSession = Depends(get_db),
+    token: str = Depends(oauth2_scheme),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """Live notifications for every event the caller holds a role on, including roles just granted or revoked"""
+    await db.close()
+    return sse_response(sse_stream([user_channel(current_user.id)], token_expiry(token)))
@@ -0,0 +1,51 @@
+from fastapi import APIRouter, Depends, Query
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import Optional
+
+from ..database import get_db
+from ..schemas.sync import SyncResult
+from ..models.event import Event as EventModel
+from ..models.permission import Permission as PermissionModel
+from ..models.user import User as UserModel
+from ..utils.auth import get_current_active_user
+from ..utils.pagination import decode_cursor, encode_cursor
+from ..utils.query_budget import query_budget
+from ..utils.sync import changes_since
+
+router = APIRouter(
+    prefix="/api",
+    tags=["sync"]
+)
+
+@router.get("/sync", response_model=SyncResult, dependencies=[Depends(query_budget(3))])
+async def sync_events(
+    token: Optional[str] = Query(None, description="Token from the previous sync; omit it for a full sync"),
+    limit: int = Query(500, ge=1, le=1000, description="Most events (changed or removed) per response"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    Events created, edited, deleted, shared or unshared since ``token``, as a
+    list of current events plus the ids of those the caller can no longer see.
+    """
+    after = decode_cursor(token, (int,))[0] if token else 0
+    page = await changes_since(db, current_user.id, after, limit)
+
+    # Whatever the caller still holds a role on is sent as it is now; the rest
+    # was deleted or unshared
+    visible = {}
+    if page.event_ids:
+        visible = {event.id: event for event in (await db.scalars(
+            select(EventModel).join(
+                PermissionModel,
+                (PermissionModel.event_id == EventModel.id) & (PermissionModel.user_id == current_user.id)
+            ).filter(EventModel.id.in_(page.event_ids))
+        )).all()}
+
+    return SyncResult(
+        events=[visible[event_id] for event_id in page.event_ids if event_id in visible],
+        removed=[event_id for event_id in page.event_ids if event_id not in visible],
+        token=encode_cursor(page.token),
+        has_more=page.has_more
+    )
@@ -1,184 +1,278 @@
-from fastapi import APIRouter, Depends, HTTPException, status
-from sqlalchemy.orm import Session
-from typing import List
+from fastapi import APIRouter, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+from typing import AsyncIterator, List, Optional
 from datetime import datetime
 
 from ..database import get_db
-from ..schemas.version import EventVersion, VersionDiff
+from ..schemas.version import EventVersion, FieldBlame, VersionChange, VersionDiff, VersionRangeDiff
 from ..models.version import EventVersion as EventVersionModel
-from ..models.event import Event as EventModel
-from ..models.permission import Permission as PermissionModel
-from ..schemas.permission import RoleEnum
 from ..models.user import User as UserModel
+from ..utils.acl import EDIT_ROLES, READ_ROLES, event_user_ids, require_event_role
 from ..utils.auth import get_current_active_user
-from ..utils.diff import generate_diff
+from ..utils.broker import broker, version_created
+from ..utils.diff import field_values, generate_diff, json_patch
+from ..utils.etag import not_modified, version_etag
+from ..utils.intervals import as_utc
+from ..utils.pagination import NEXT_CURSOR_HEADER, decode_cursor, encode_cursor, parse_datetime, seek
+from ..utils.query_budget import query_budget
+from ..utils.sync import record_event_change
+from ..utils.versioning import (
+    chain_query, create_event_version, event_snapshot, load_version, load_versions, materialize_newest_first, materialize_page,
+    materialize_stream, stream_versions, to_schema, update_event_row
+)
 
 router = APIRouter(
     prefix="/api/events",
     tags=["versions"]
 )
 
-def check_event_access(db: Session, event_id: int, user_id: int):
-    """Check if user has access to the event"""
-    permission = db.query(PermissionModel).filter(
-        PermissionModel.event_id == event_id,
-        PermissionModel.user_id == user_id
-    ).first()
-    
-    if not permission:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have access to this event"
-        )
-    return permission
-
-def check_event_edit_access(db: Session, event_id: int, user_id: int):
-    """Check if user has edit access to the event"""
-    permission = db.query(PermissionModel).filter(
-        PermissionModel.event_id == event_id,
-        PermissionModel.user_id == user_id,
-        PermissionModel.role.in_([RoleEnum.owner.value, RoleEnum.editor.value])
-    ).first()
-    
-    if not permission:
-        raise HTTPException(
-            status_code=status.HTTP_403_FORBIDDEN,
-            detail="You don't have edit access to this event"
-        )
-    return permission
-
-@router.get("/{event_id}/history/{version_id}", response_model=EventVersion)
-def get_event_version(
+@router.get("/{event_id}/history/{version_id}", response_model=EventVersion, dependencies=[Depends(query_budget(3))])
+async def get_event_version(
     event_id: int,
     version_id: int,
-    db: Session = Depends(get_db),
+    request: Request,
+    response: Response,
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     # Check if user has access to the event
-    check_event_access(db, event_id, current_user.id)
+    await require_event_role(db, event_id, current_user.id, READ_ROLES, "You don't have access to this event")
     
-    # Get the specific version
-    version = db.query(EventVersionModel).filter(
-        EventVersionModel.event_id == event_id,
-        EventVersionModel.id == version_id
-    ).first()
+    # Get the specific version, rebuilt from its keyframe if stored as a delta. It
+    # is looked up first so that If-None-Match (even *) can't vouch for a missing one
+    found = await load_version(db, event_id, version_id)
     
-    if not version:
+    if not found:
         raise HTTPException(status_code=404, detail="Version not found")
     
-    return version
+    # Versions never change, so a client holding this version's ETag already has it
+    etag = version_etag(event_id, version_id)
+    unchanged = not_modified(request, etag)
+    if unchanged:
+        return unchanged
+    
+    response.headers["ETag"] = etag
+    return to_schema(*found)
 
-@router.post("/{event_id}/rollback/{version_id}", response_model=EventVersion)
-def rollback_event(
+@router.post("/{event_id}/rollback/{version_id}", response_model=EventVersion, dependencies=[Depends(query_budget(7))])
+async def rollback_event(
     event_id: int,
     version_id: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
-    # Check if user has edit access to the event
-    check_event_edit_access(db, event_id, current_user.id)
+    # Check if user has edit access to the event, loading it in the same query
+    access = await require_event_role(db, event_id, current_user.id, EDIT_ROLES,
+                                      "You don't have edit access to this event", load_event=True)
     
     # Get the event
-    event = db.query(EventModel).filter(EventModel.id == event_id).first()
+    event = access.event
     if not event:
         raise HTTPException(status_code=404, detail="Event not found")
     
     # Get the version to rollback to
-    version = db.query(EventVersionModel).filter(
-        EventVersionModel.event_id == event_id,
-        EventVersionModel.id == version_id
-    ).first()
+    found = await load_version(db, event_id, version_id)
     
-    if not version:
+    if not found:
         raise HTTPException(status_code=404, detail="Version not found")
     
-    # Update the event with the version data
-    version_data = version.data
-    
-    # Extract the fields we can update
-    event.title = version_data.get("title", event.title)
-    event.description = version_data.get("description", event.description)
+    # Update the event with the version data and record the rollback as a new
+    # version, in one transaction
+    version_data = found[1]
+    values = {
+        key: version_data[key]
+        for key in ("title", "description", "location", "is_recurring", "recurrence_pattern")
+        if key in version_data
+    }
     
     # Handle datetime fields carefully
-    if "start_time" in version_data:
-        event.start_time = datetime.fromisoformat(version_data["start_time"])
-    if "end_time" in version_data:
-        event.end_time = datetime.fromisoformat(version_data["end_time"])
-    
-    event.location = version_data.get("location", event.location)
-    event.is_recurring = version_data.get("is_recurring", event.is_recurring)
-    event.recurrence_pattern = version_data.get("recurrence_pattern", event.recurrence_pattern)
-    
-    db.commit()
-    
-    # Create a new version to record the rollback
-    new_version = EventVersionModel(
-        event_id=event_id,
-        created_by=current_user.id,
-        data={
-            "title": event.title,
-            "description": event.description,
-            "start_time": event.start_time.isoformat(),
-            "end_time": event.end_time.isoformat(),
-            "location": event.location,
-            "is_recurring": event.is_recurring,
-            "recurrence_pattern": event.recurrence_pattern
-        },
-        change_description=f"Rolled back to version {version_id}"
-    )
+    for key in ("start_time", "end_time"):
+        if key in version_data:
+            values[key] = datetime.fromisoformat(version_data[key])
     
-    db.add(new_version)
-    db.commit()
-    db.refresh(new_version)
+    # Versions saved before times were validated may run backwards
+    start_time = values.get("start_time", event.start_time)
+    end_time = values.get("end_time", event.end_time)
+    if as_utc(end_time) <= as_utc(start_time):
+        raise HTTPException(status_code=422, detail="Version ends before it starts and can't be restored")
     
-    return new_version
+    event = await update_event_row(db, event_id, values)
+    if not event:
+        raise HTTPException(status_code=404, detail="Event not found")
+    
+    new_version = await create_event_version(
+        db,
+        event,
+        current_user.id,
+        f"Rolled back to version {version_id}",
+        changed=values.keys()
+    )
+    await record_event_change(db, event_id)
+    await db.commit()
+    await broker.publish(version_created(event, new_version), await event_user_ids(db, event_id))
+    
+    return to_schema(new_version, event_snapshot(event))
 
-@router.get("/{event_id}/changelog", response_model=List[EventVersion])
-def get_event_changelog(
+@router.get("/{event_id}/changelog", response_model=List[EventVersion], dependencies=[Depends(query_budget(4))])
+async def get_event_changelog(
     event_id: int,
-    db: Session = Depends(get_db),
+    response: Response,
+    limit: int = Query(100, ge=1, le=1000),
+    cursor: Optional[str] = Query(None, description=f"Opaque cursor from a previous page's {NEXT_CURSOR_HEADER} header"),
+    format: str = Query("json", regex="^(json|ndjson)$",
+                        description="ndjson streams the whole history (after the cursor) one version per line"),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     # Check if user has access to the event
-    check_event_access(db, event_id, current_user.id)
+    await require_event_role(db, event_id, current_user.id, READ_ROLES, "You don't have access to this event")
+    
+    # Newest first by (created_at, id), served from ix_event_versions_event_created
+    sort_key = (EventVersionModel.created_at, EventVersionModel.id)
+    query = select(EventVersionModel).filter(EventVersionModel.event_id == event_id)
+    if cursor:
+        query = query.filter(seek(db, sort_key, decode_cursor(cursor, (parse_datetime, int)), descending=True))
+    query = query.order_by(*(column.desc() for column in sort_key))
+    
+    if format == "ndjson":
+        return StreamingResponse(stream_changelog(db, query), media_type="application/x-ndjson")
     
-    # Get all versions for the event, ordered by creation time
-    versions = db.query(EventVersionModel).filter(
-        EventVersionModel.event_id == event_id
-    ).order_by(EventVersionModel.created_at.desc()).all()
+    # Fetch one extra row to learn whether there is a next page
+    versions = (await db.scalars(query.limit(limit + 1))).all()
+    if len(versions) > limit:
+        versions = versions[:limit]
+        response.headers[NEXT_CURSOR_HEADER] = encode_cursor(versions[-1].created_at, versions[-1].id)
     
-    return versions
+    return [to_schema(version, data) for version, data in await materialize_page(db, event_id, versions)]
 
-@router.get("/{event_id}/diff/{version_id1}/{version_id2}", response_model=VersionDiff)
-def get_version_diff(
+async def stream_changelog(db: AsyncSession, query) -> AsyncIterator[str]:
+    """Yield versions as NDJSON, read newest first from a server-side cursor"""
+    rows = await stream_versions(db, query)
+    async for version, data in materialize_newest_first(rows):
+        yield to_schema(version, data).json() + "\n"
+
+@router.get("/{event_id}/diff/{version_id1}/{version_id2}", response_model=VersionDiff, dependencies=[Depends(query_budget(3))])
+async def get_version_diff(
     event_id: int,
     version_id1: int,
     version_id2: int,
-    db: Session = Depends(get_db),
+    db: AsyncSession = Depends(get_db),
     current_user: UserModel = Depends(get_current_active_user)
 ):
     # Check if user has access to the event
-    check_event_access(db, event_id, current_user.id)
+    await require_event_role(db, event_id, current_user.id, READ_ROLES, "You don't have access to this event")
     
     # Get both versions
-    version1 = db.query(EventVersionModel).filter(
-        EventVersionModel.event_id == event_id,
-        EventVersionModel.id == version_id1
-    ).first()
-    
-    version2 = db.query(EventVersionModel).filter(
-        EventVersionModel.event_id == event_id,
-        EventVersionModel.id == version_id2
-    ).first()
+    found = await load_versions(db, event_id, (version_id1, version_id2))
+    version1, version2 = found.get(version_id1), found.get(version_id2)
     
     if not version1 or not version2:
         raise HTTPException(status_code=404, detail="One or both versions not found")
     
     # Generate diff between versions
-    changes = generate_diff(version1.data, version2.data)
+    changes = generate_diff(version1[1], version2[1])
     
     return {
         "version1_id": version_id1,
         "version2_id": version_id2,
-        "changes": changes
-    }
\ No newline at end of file
+        "changes": changes,
+        "patch": json_patch(version1[1], version2[1])
+    }
+
+@router.get("/{event_id}/diff", response_model=VersionRangeDiff, dependencies=[Depends(query_budget(3))])
+async def get_version_range_diff(
+    event_id: int,
+    from_version_id: int = Query(..., alias="from", description="Version to diff from"),
+    to_version_id: Optional[int] = Query(None, alias="to", description="Version to diff to (default: latest)"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    Net JSON Patch between two versions plus the patch each version in between
+    applied, from one ordered pass over the rows (starting at the keyframe the
+    first version builds on)
+    """
+    await require_event_role(db, event_id, current_user.id, READ_ROLES, "You don't have access to this event")
+    
+    if to_version_id is not None and to_version_id < from_version_id:
+        raise HTTPException(status_code=400, detail="'from' must not be after 'to'")
+    
+    start = previous = None
+    versions = []
+    rows = await stream_versions(db, chain_query(event_id, to_version_id, from_version_id))
+    async for version, data in materialize_stream(rows):
+        if start is not None:
+            versions.append(VersionChange(
+                version_id=version.id,
+                created_by=version.created_by,
+                created_at=version.created_at,
+                change_description=version.change_description,
+                patch=json_patch(previous, data)
+            ))
+        elif version.id == from_version_id:
+            start = data
+        previous = data
+        last_id = version.id
+    
+    if start is None or (to_version_id is not None and last_id != to_version_id):
+        raise HTTPException(status_code=404, detail="One or both versions not found")
+    
+    return VersionRangeDiff(
+        from_version_id=from_version_id,
+        to_version_id=last_id,
+        patch=json_patch(start, previous),
+        versions=versions
+    )
+
+@router.get("/{event_id}/blame", response_model=List[FieldBlame], dependencies=[Depends(query_budget(3))])
+async def get_event_blame(
+    event_id: int,
+    to_version_id: Optional[int] = Query(None, alias="to", description="Blame as of this version (default: latest)"),
+    field: Optional[str] = Query(None, description="Only this field, e.g. location or recurrence_pattern"),
+    db: AsyncSession = Depends(get_db),
+    current_user: UserModel = Depends(get_current_active_user)
+):
+    """
+    For every field (each key of recurrence_pattern separately) the version that
+    last changed it, who made it and how many versions touched it, from one
+    ordered pass over the whole history
+    """
+    await require_event_role(db, event_id, current_user.id, READ_ROLES, "You don't have access to this event")
+    
+    query = select(EventVersionModel).filter(EventVersionModel.event_id == event_id)
+    if to_version_id is not None:
+        query = query.filter(EventVersionModel.id <= to_version_id)
+    
+    values = {}
+    blame = {}  # path -> (version, change count)
+    last_id = None
+    rows = await stream_versions(db, query.order_by(EventVersionModel.id))
+    async for version, data in materialize_stream(rows):
+        current = field_values(data)
+        for path, value in current.items():
+            if path not in values or values[path] != value:
+                blame[path] = (version, blame[path][1] + 1 if path in blame else 1)
+        for path in values.keys() - current.keys():
+            del blame[path]
+        values = current
+        last_id = version.id
+    
+    if last_id is None or (to_version_id is not None and last_id != to_version_id):
+        raise HTTPException(status_code=404, detail="Version not found")
+    
+    prefix = f"/{field.strip('/')}" if field else None
+    return [
+        FieldBlame(
+            path=path,
+            value=values[path],
+            version_id=version.id,
+            created_by=version.created_by,
+            created_at=version.created_at,
+            change_description=version.change_description,
+            changes=changes
+        )
+        for path, (version, changes) in sorted(blame.items())
+        if prefix is None or path == prefix or path.startswith(prefix + "/")
+    ]
\ No newline at end of file
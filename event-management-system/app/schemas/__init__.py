@@ -1,4 +1,7 @@
 from .user import User, UserCreate, UserUpdate, UserInDB, Token, TokenData
-from .event import Event, EventCreate, EventUpdate, EventInDB, EventBatchCreate
+from .event import Event, EventCreate, EventUpdate, EventInDB, EventBatchCreate, Occurrence
 from .permission import Permission, PermissionCreate, PermissionUpdate, PermissionInDB, ShareEvent, RoleEnum
-from .version import EventVersion, EventVersionCreate, EventVersionInDB, EventDiff, VersionDiff
\ No newline at end of file
+from .version import EventVersion, EventVersionCreate, EventVersionInDB, EventDiff, VersionDiff, VersionChange, VersionRangeDiff, FieldBlame
+from .scheduling import FreeBusyQuery, FreeBusy, UserFreeBusy, BusyInterval, WorkingHours, SlotQuery, Slot, SlotSuggestions
+from .sync import SyncResult
+from .calendar import CalendarFeedToken
\ No newline at end of file
@@ -0,0 +1,9 @@
+from pydantic import BaseModel
+from datetime import datetime
+
+class CalendarFeedToken(BaseModel):
+    # Pass as ?token= to the calendar feeds; it grants nothing else
+    token: str
+    expires_at: datetime
+    # Subscription URL of the caller's feed, with the token included
+    url: str
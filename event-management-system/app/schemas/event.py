@@ -1,7 +1,22 @@
-from pydantic import BaseModel
+from pydantic import BaseModel, validator
 from typing import Optional, Dict, Any, List
 from datetime import datetime
 
+from ..utils.intervals import as_utc
+from ..utils.recurrence import parse_rule
+
+def validate_recurrence_pattern(pattern: Optional[Dict[str, Any]]) -> Optional[Dict[str, Any]]:
+    if pattern is not None:
+        parse_rule(pattern)
+    return pattern
+
+def validate_period(end_time: Optional[datetime], values: Dict[str, Any]) -> Optional[datetime]:
+    # Whenever both ends are given; a PostgreSQL range can't end before it starts
+    start_time = values.get("start_time")
+    if start_time is not None and end_time is not None and as_utc(end_time) <= as_utc(start_time):
+        raise ValueError("end_time must be after start_time")
+    return end_time
+
 class EventBase(BaseModel):
     title: str
     description: Optional[str] = None
@@ -11,8 +26,11 @@ class EventBase(BaseModel):
     is_recurring: bool = False
     recurrence_pattern: Optional[Dict[str, Any]] = None
 
+# Only the request models validate the period: rows stored before the check
+# existed may be zero-length (or reversed) and must still serialize
 class EventCreate(EventBase):
-    pass
+    _check_recurrence = validator("recurrence_pattern", allow_reuse=True)(validate_recurrence_pattern)
+    _check_period = validator("end_time", allow_reuse=True)(validate_period)
 
 class EventUpdate(BaseModel):
     title: Optional[str] = None
@@ -23,17 +41,26 @@ class EventUpdate(BaseModel):
     is_recurring: Optional[bool] = None
     recurrence_pattern: Optional[Dict[str, Any]] = None
 
+    _check_recurrence = validator("recurrence_pattern", allow_reuse=True)(validate_recurrence_pattern)
+    _check_period = validator("end_time", allow_reuse=True)(validate_period)
+
 class EventInDB(EventBase):
     id: int
     owner_id: int
     created_at: datetime
     updated_at: Optional[datetime] = None
+    version: int = 1
 
     class Config:
         orm_mode = True
 
+class Occurrence(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
 class Event(EventInDB):
-    pass
+    # Set on recurring events when the list is queried with a date window
+    occurrences: Optional[List[Occurrence]] = None
 
 class EventBatchCreate(BaseModel):
     events: List[EventCreate]
\ No newline at end of file
@@ -0,0 +1,113 @@
+from pydantic import BaseModel, Field, validator
+from typing import List, Optional
+from datetime import datetime, time, timedelta
+from zoneinfo import ZoneInfo, ZoneInfoNotFoundError
+
+from ..config import settings
+from ..utils.intervals import as_utc
+
+WEEKDAYS = ("MO", "TU", "WE", "TH", "FR", "SA", "SU")
+
+def check_user_ids(user_ids: List[int]) -> List[int]:
+    # Keep the first mention of each user, in the order given
+    user_ids = list(dict.fromkeys(user_ids))
+    if not user_ids:
+        raise ValueError("at least one user is required")
+    if len(user_ids) > settings.FREEBUSY_MAX_USERS:
+        raise ValueError(f"at most {settings.FREEBUSY_MAX_USERS} users per query")
+    return user_ids
+
+def check_window(end_time: datetime, values: dict) -> datetime:
+    start_time = values.get("start_time")
+    if start_time is not None:
+        # Naive ends are UTC, as in the routes, so one may be naive and the other not
+        span = as_utc(end_time) - as_utc(start_time)
+        if span <= timedelta(0):
+            raise ValueError("end_time must be after start_time")
+        if span > timedelta(days=settings.FREEBUSY_MAX_DAYS):
+            raise ValueError(f"the window may span at most {settings.FREEBUSY_MAX_DAYS} days")
+    return end_time
+
+class FreeBusyQuery(BaseModel):
+    user_ids: List[int]
+    start_time: datetime
+    end_time: datetime
+
+    _check_user_ids = validator("user_ids", allow_reuse=True)(check_user_ids)
+    _check_window = validator("end_time", allow_reuse=True)(check_window)
+
+class BusyInterval(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    # Only events the caller holds a role on are identified
+    event_ids: List[int] = []
+
+class UserFreeBusy(BaseModel):
+    user_id: int
+    busy: List[BusyInterval]
+
+class FreeBusy(BaseModel):
+    start_time: datetime
+    end_time: datetime
+    users: List[UserFreeBusy]
+    # Times when at least one of the users is busy
+    combined: List[BusyInterval]
+
+class WorkingHours(BaseModel):
+    start: time = time(9, 0)
+    end: time = time(17, 0)
+    days: List[str] = ["MO", "TU", "WE", "TH", "FR"]
+    timezone: str = "UTC"
+
+    @validator("end")
+    def check_hours(cls, end, values):
+        start = values.get("start")
+        if start is not None and end <= start:
+            raise ValueError("end must be after start")
+        return end
+
+    @validator("days")
+    def check_days(cls, days):
+        days = [day.upper() for day in days]
+        unknown = [day for day in days if day not in WEEKDAYS]
+        if unknown or not days:
+            raise ValueError(f"days must be a non-empty list of {', '.join(WEEKDAYS)}")
+        return days
+
+    @validator("timezone")
+    def check_timezone(cls, timezone):
+        try:
+            ZoneInfo(timezone)
+        except (ZoneInfoNotFoundError, ValueError):
+            raise ValueError(f"unknown time zone {timezone!r}")
+        return timezone
+
+class SlotQuery(BaseModel):
+    # The caller is always a participant
+    user_ids: List[int] = []
+    duration_minutes: int = Field(..., ge=1, le=24 * 60)
+    start_time: datetime
+    end_time: datetime
+    # Without working hours any time of day may be suggested
+    working_hours: Optional[WorkingHours] = None
+    # Suggested starts fall on this grid, counted from midnight in the working-hours time zone
+    step_minutes: int = Field(30, ge=5, le=24 * 60)
+    max_results: int = Field(5, ge=1, le=100)
+
+    @validator("user_ids")
+    def check_participants(cls, user_ids):
+        user_ids = list(dict.fromkeys(user_ids))
+        if len(user_ids) > settings.FREEBUSY_MAX_USERS:
+            raise ValueError(f"at most {settings.FREEBUSY_MAX_USERS} users per query")
+        return user_ids
+
+    _check_window = validator("end_time", allow_reuse=True)(check_window)
+
+class Slot(BaseModel):
+    start_time: datetime
+    end_time: datetime
+
+class SlotSuggestions(BaseModel):
+    participants: List[int]
+    duration_minutes: int
+    slots: List[Slot]
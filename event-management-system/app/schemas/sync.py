@@ -0,0 +1,14 @@
+from pydantic import BaseModel
+from typing import List
+
+from .event import Event
+
+class SyncResult(BaseModel):
+    # Created, edited or newly shared since the token, as they are now
+    events: List[Event]
+    # Deleted, or no longer shared with the caller
+    removed: List[int]
+    # Pass back as ?token= on the next sync
+    token: str
+    # More changes are waiting; sync again straight away with the new token
+    has_more: bool
@@ -29,4 +29,27 @@ class EventDiff(BaseModel):
 class VersionDiff(BaseModel):
     version1_id: int
     version2_id: int
-    changes: List[EventDiff]
\ No newline at end of file
+    changes: List[EventDiff]
+    patch: List[Dict[str, Any]] = []  # JSON Patch (RFC 6902) from version1 to version2
+
+class VersionChange(BaseModel):
+    version_id: int
+    created_by: int
+    created_at: datetime
+    change_description: Optional[str] = None
+    patch: List[Dict[str, Any]]  # against the previous version
+
+class VersionRangeDiff(BaseModel):
+    from_version_id: int
+    to_version_id: int
+    patch: List[Dict[str, Any]]  # net change from the first version to the last
+    versions: List[VersionChange]  # every version after from_version_id, in order
+
+class FieldBlame(BaseModel):
+    path: str  # JSON Pointer, e.g. /location or /recurrence_pattern/interval
+    value: Any
+    version_id: int  # last version that set the current value
+    created_by: int
+    created_at: datetime
+    change_description: Optional[str] = None
+    changes: int  # versions that changed this field, its creation included
\ No newline at end of file
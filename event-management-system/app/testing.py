@@ -0,0 +1,33 @@
+"""
+Pytest plugin for router tests. Enable it with ``pytest -p app.testing`` or
+``pytest_plugins = ["app.testing"]`` in conftest.py.
+"""
+from contextlib import contextmanager
+
+import pytest
+
+from .database import engine
+from .utils.query_budget import QueryBudgetExceeded, capture_statements
+
+@pytest.fixture
+def query_budget():
+    """
+    Assert how many SQL statements a block may issue:
+
+        def test_get_event(client, auth_headers, query_budget):
+            with query_budget(2):
+                client.get("/api/events/1", headers=auth_headers)
+
+    Fails the test when the budget is exceeded, listing N+1 suspects. The
+    yielded StatementLog can be inspected for finer assertions.
+    """
+    @contextmanager
+    def budget(max_statements: int, label: str = "block"):
+        with capture_statements(engine.sync_engine) as log:
+            yield log
+        try:
+            log.check(label, max_statements, mode="raise")
+        except QueryBudgetExceeded as exc:
+            pytest.fail(str(exc), pytrace=False)
+
+    return budget
\ No newline at end of file
@@ -0,0 +1,91 @@
+from typing import Collection, Iterable, List, NamedTuple, Optional
+
+from fastapi import HTTPException, status
+from sqlalchemy import select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models.event import Event as EventModel
+from ..models.permission import Permission as PermissionModel
+from ..schemas.permission import RoleEnum
+from .cache import TTLCache
+
+READ_ROLES = (RoleEnum.owner.value, RoleEnum.editor.value, RoleEnum.viewer.value)
+EDIT_ROLES = (RoleEnum.owner.value, RoleEnum.editor.value)
+OWNER_ROLES = (RoleEnum.owner.value,)
+
+class EventAccess(NamedTuple):
+    event_exists: bool
+    role: Optional[str]
+    event: Optional[EventModel] = None  # only when resolved with load_event=True
+
+# (event_id, user_id) -> role. Only granted roles are cached, so a new share is
+# visible at once; role changes and removals in this process invalidate their
+# keys, and the TTL bounds how long other worker processes can lag behind.
+access_cache = TTLCache(maxsize=settings.ACL_CACHE_MAX_SIZE, ttl=settings.ACL_CACHE_TTL_SECONDS)
+request_memo_hits = 0
+
+def _memo(db: AsyncSession) -> dict:
+    """Per-request memo, living as long as the request's session"""
+    return db.info.setdefault("event_access", {})
+
+async def resolve_event_access(db: AsyncSession, event_id: int, user_id: int,
+                               load_event: bool = False) -> EventAccess:
+    """
+    The user's role on the event and whether the event exists, optionally with the
+    event itself, from one event-to-permission outer join.
+    """
+    global request_memo_hits
+    key = (event_id, user_id)
+    memo = _memo(db)
+    access = memo.get(key)
+    if access is not None and (access.event is not None or not load_event or not access.event_exists):
+        request_memo_hits += 1
+        return access
+
+    if not load_event:
+        role = access_cache.get(key)
+        if role is not None:
+            access = memo[key] = EventAccess(True, role)
+            return access
+
+    columns = (EventModel if load_event else EventModel.id, PermissionModel.role)
+    row = (await db.execute(
+        select(*columns).outerjoin(
+            PermissionModel,
+            (PermissionModel.event_id == EventModel.id) & (PermissionModel.user_id == user_id)
+        ).filter(EventModel.id == event_id)
+    )).first()
+
+    if row is None:
+        access = EventAccess(False, None)
+    else:
+        access = EventAccess(True, row.role, row[0] if load_event else None)
+        if row.role is not None:
+            access_cache.set(key, row.role)
+    memo[key] = access
+    return access
+
+async def require_event_role(db: AsyncSession, event_id: int, user_id: int, roles: Collection[str],
+                             detail: str = "Not enough permissions", load_event: bool = False) -> EventAccess:
+    """Resolve access and raise 403 unless the user holds one of ``roles``"""
+    access = await resolve_event_access(db, event_id, user_id, load_event)
+    if access.role not in roles:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail=detail)
+    return access
+
+async def event_user_ids(db: AsyncSession, event_id: int) -> List[int]:
+    """Everyone holding a role on the event"""
+    return list((await db.scalars(select(PermissionModel.user_id).filter(
+        PermissionModel.event_id == event_id
+    ))).all())
+
+def invalidate_event_access(db: AsyncSession, event_id: int, user_ids: Iterable[int]) -> None:
+    """Forget cached roles after permissions of these users on the event changed"""
+    memo = _memo(db)
+    for user_id in user_ids:
+        access_cache.invalidate((event_id, user_id))
+        memo.pop((event_id, user_id), None)
+
+def stats() -> dict:
+    return {**access_cache.stats(), "request_memo_hits": request_memo_hits}
@@ -1,31 +1,59 @@
 from datetime import datetime, timedelta
-from typing import Optional
+from typing import Optional, Tuple
 from jose import JWTError, jwt
-from passlib.context import CryptContext
-from fastapi import Depends, HTTPException, status
+from fastapi import Depends, HTTPException, Query, status
 from fastapi.security import OAuth2PasswordBearer
+from sqlalchemy import event, inspect, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy.orm import Session
 
 from ..config import settings
 from ..schemas.user import TokenData
 from ..models.user import User
 from ..database import get_db
+from .cache import TTLCache
+from .hashing import password_hasher
 
-pwd_context = CryptContext(schemes=["bcrypt"], deprecated="auto")
 oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login")
+optional_oauth2_scheme = OAuth2PasswordBearer(tokenUrl="api/auth/login", auto_error=False)
 
-def verify_password(plain_password, hashed_password):
-    return pwd_context.verify(plain_password, hashed_password)
+# Calendar apps subscribe to a URL and can't send an Authorization header, so feeds
+# take a long-lived token in the query string instead. Its scope claim confines it
+# to the feeds: get_current_user refuses any token that carries a scope. Its
+# generation claim ties it to the user's feed_token_generation, so issuing a new
+# token revokes the previous one (tokens from before the claim count as 0).
+FEED_SCOPE = "calendar-feed"
 
-def get_password_hash(password):
-    return pwd_context.hash(password)
+# Authenticated users keyed by token subject (username), so a request with a valid
+# token normally doesn't need a users query. Entries never outlive the token's exp.
+user_cache = TTLCache(maxsize=settings.USER_CACHE_MAX_SIZE, ttl=settings.USER_CACHE_TTL_SECONDS)
 
-def authenticate_user(db: Session, username: str, password: str):
-    user = db.query(User).filter(User.username == username).first()
+@event.listens_for(User, "after_update")
+@event.listens_for(User, "after_delete")
+def invalidate_cached_user(mapper, connection, target):
+    """Drop cached copies of a user whose row (e.g. is_active) changed"""
+    user_cache.invalidate(target.username)
+    for old_username in inspect(target).attrs.username.history.deleted:
+        user_cache.invalidate(old_username)
+
+@event.listens_for(Session, "do_orm_execute")
+def invalidate_cached_users_on_bulk_write(orm_execute_state):
+    """Bulk UPDATE/DELETE statements bypass mapper events, so flush the whole cache"""
+    if orm_execute_state.is_update or orm_execute_state.is_delete:
+        mapper = orm_execute_state.bind_mapper
+        if mapper is not None and mapper.class_ is User:
+            user_cache.clear()
+
+async def authenticate_user(db: AsyncSession, username: str, password: str):
+    user = await db.scalar(select(User).filter(User.username == username))
     if not user:
         return False
-    if not verify_password(password, user.hashed_password):
+    if not await password_hasher.verify(password, user.hashed_password):
         return False
+    # Transparently upgrade hashes made with a different cost factor
+    if password_hasher.needs_rehash(user.hashed_password):
+        user.hashed_password = await password_hasher.hash(password)
+        await db.commit()
     return user
 
 def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
@@ -38,7 +66,8 @@ def create_access_token(data: dict, expires_delta: Optional[timedelta] = None):
     encoded_jwt = jwt.encode(to_encode, settings.SECRET_KEY, algorithm=settings.ALGORITHM)
     return encoded_jwt
 
-async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = Depends(get_db)):
+async def user_from_token(token: str, db: AsyncSession, scope: Optional[str] = None) -> User:
+    """The user a valid token of ``scope`` (None: an access token) was issued to, else 401"""
     credentials_exception = HTTPException(
         status_code=status.HTTP_401_UNAUTHORIZED,
         detail="Could not validate credentials",
@@ -47,17 +76,84 @@ async def get_current_user(token: str = Depends(oauth2_scheme), db: Session = De
     try:
         payload = jwt.decode(token, settings.SECRET_KEY, algorithms=[settings.ALGORITHM])
         username: str = payload.get("sub")
-        if username is None:
+        if username is None or payload.get("scope") != scope:
             raise credentials_exception
         token_data = TokenData(username=username)
     except JWTError:
         raise credentials_exception
-    user = db.query(User).filter(User.username == token_data.username).first()
+    user = user_cache.get(token_data.username)
+    if user is not None:
+        return user
+    user = await db.scalar(select(User).filter(User.username == token_data.username))
     if user is None:
         raise credentials_exception
+    # Detach so the cached instance can be shared safely across requests
+    db.expunge(user)
+    user_cache.set(token_data.username, user, expires_at=payload.get("exp"))
+    return user
+
+async def get_current_user(token: str = Depends(oauth2_scheme), db: AsyncSession = Depends(get_db)):
+    return await user_from_token(token, db)
+
+async def create_feed_token(db: AsyncSession, user: User) -> Tuple[str, datetime]:
+    """
+    A calendar feed token for the user and when it expires, revoking the user's
+    previous one. The caller commits.
+    """
+    generation = await db.scalar(
+        update(User).filter(User.id == user.id)
+        .values(feed_token_generation=User.feed_token_generation + 1)
+        .returning(User.feed_token_generation)
+    )
+    expires_delta = timedelta(days=settings.CALENDAR_FEED_TOKEN_EXPIRE_DAYS)
+    token = create_access_token({"sub": user.username, "scope": FEED_SCOPE, "gen": generation}, expires_delta)
+    return token, datetime.utcfromtimestamp(jwt.get_unverified_claims(token)["exp"])
+
+async def feed_token_user(token: str, db: AsyncSession) -> User:
+    """The user a feed token was issued to, if it is still their newest one, else 401"""
+    user = await user_from_token(token, db, FEED_SCOPE)
+    generation = jwt.get_unverified_claims(token).get("gen", 0)
+    if generation > user.feed_token_generation:
+        # Issued since this copy was cached, maybe by another process
+        user_cache.invalidate(user.username)
+        user = await user_from_token(token, db, FEED_SCOPE)
+    if generation != user.feed_token_generation:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Feed token has been replaced by a newer one",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
     return user
 
+async def get_feed_user(
+    token: Optional[str] = Query(None, description="Feed token from POST /api/calendar/feed-token"),
+    bearer: Optional[str] = Depends(optional_oauth2_scheme),
+    db: AsyncSession = Depends(get_db)
+):
+    """The caller of a calendar feed, identified by a feed token in the URL or the usual bearer token"""
+    if token:
+        user = await feed_token_user(token, db)
+    elif bearer:
+        user = await user_from_token(bearer, db)
+    else:
+        raise HTTPException(
+            status_code=status.HTTP_401_UNAUTHORIZED,
+            detail="Not authenticated",
+            headers={"WWW-Authenticate": "Bearer"},
+        )
+    return await get_current_active_user(user)
+
+def token_expiry(token: str) -> Optional[float]:
+    """exp claim (epoch seconds) of a token get_current_user has already validated"""
+    return jwt.get_unverified_claims(token).get("exp")
+
 async def get_current_active_user(current_user: User = Depends(get_current_user)):
     if not current_user.is_active:
         raise HTTPException(status_code=400, detail="Inactive user")
-    return current_user
\ No newline at end of file
+    return current_user
+async def get_diagnostics_user(current_user: User = Depends(get_current_active_user)):
+    """The caller, if DIAGNOSTICS_USERS lists them; the diagnostics expose other users' traffic"""
+    allowed = {name.strip() for name in settings.DIAGNOSTICS_USERS.split(",") if name.strip()}
+    if current_user.username not in allowed:
+        raise HTTPException(status_code=status.HTTP_403_FORBIDDEN, detail="Not allowed to read diagnostics")
+    return current_user
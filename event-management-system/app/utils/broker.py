@@ -0,0 +1,276 @@
+import asyncio
+import json
+import logging
+import time
+from collections import defaultdict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional, Set, Tuple
+
+import asyncpg
+
+from ..config import settings
+from .etag import event_etag
+from .stats import Histogram
+
+logger = logging.getLogger(__name__)
+
+# Change notifications for live clients. A notification is a small JSON object
+#   {"type": "version.created" | "permission.changed" | "event.deleted", "event_id": ..., ...}
+# delivered to everyone subscribed to its event's channel and to the personal
+# channel of each user it is published for. Delivery is best effort: a client
+# that reconnects, or is told it lagged, re-fetches what it shows.
+
+# Publish-to-delivery latency, from 100µs up
+BROADCAST_BUCKETS = (0.0001, 0.00025, 0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5)
+
+Channel = Tuple[str, int]
+
+def event_channel(event_id: int) -> Channel:
+    return ("event", event_id)
+
+def user_channel(user_id: int) -> Channel:
+    return ("user", user_id)
+
+def version_created(event, version) -> Dict[str, Any]:
+    return {
+        "type": "version.created",
+        "event_id": event.id,
+        "version": event.version,
+        "version_id": version.id,
+        "created_by": version.created_by,
+        "change_description": version.change_description,
+        "etag": event_etag(event),
+    }
+
+def permission_changed(event_id: int, changed_by: int, revoked: Iterable[int] = ()) -> Dict[str, Any]:
+    # Who got which role is left to GET /permissions; ``revoked`` lost access altogether
+    return {"type": "permission.changed", "event_id": event_id, "changed_by": changed_by, "revoked": list(revoked)}
+
+def event_deleted(event_id: int, deleted_by: int) -> Dict[str, Any]:
+    return {"type": "event.deleted", "event_id": event_id, "deleted_by": deleted_by}
+
+class Subscription:
+    """
+    One client's notifications. The queue is bounded: a client that can't keep
+    up loses the oldest ones and is told how many with a "stream.lagged" notice.
+    A deque and one waiter future per subscription, woken by the broker's shared
+    heartbeat rather than a timer each, keep a broadcast to thousands cheap.
+    """
+
+    def __init__(self, broker: "InProcessBroker", channels: List[Channel], max_queued: int):
+        self.broker = broker
+        self.channels = channels
+        self.max_queued = max_queued
+        self.pending: Deque[Tuple[float, Dict[str, Any]]] = deque()
+        self.lagged = 0
+        self._waiter: Optional[asyncio.Future] = None
+
+    def push(self, published_at: float, message: Dict[str, Any]) -> None:
+        if len(self.pending) >= self.max_queued:
+            self.pending.popleft()
+            self.lagged += 1
+            self.broker.dropped += 1
+        self.pending.append((published_at, message))
+        self.wake()
+
+    def wake(self) -> None:
+        if self._waiter is not None and not self._waiter.done():
+            self._waiter.set_result(None)
+
+    async def get(self) -> Optional[Dict[str, Any]]:
+        """The next notification, or None when the heartbeat passes first"""
+        if self.lagged:
+            dropped, self.lagged = self.lagged, 0
+            return {"type": "stream.lagged", "dropped": dropped}
+        if not self.pending:
+            self._waiter = asyncio.get_running_loop().create_future()
+            try:
+                await self._waiter
+            finally:
+                self._waiter = None
+            if not self.pending:
+                return None
+        published_at, message = self.pending.popleft()
+        # Wall clock, since with NOTIFY the publisher may be another process
+        self.broker.latency.observe(max(time.time() - published_at, 0.0))
+        return message
+
+class InProcessBroker:
+    """Fans notifications out to the subscribers of this process"""
+
+    backend = "memory"
+
+    def __init__(self, max_queued: int, heartbeat: float):
+        self.max_queued = max_queued
+        self.heartbeat = heartbeat
+        self.channels: Dict[Channel, Set[Subscription]] = defaultdict(set)
+        self.subscriptions: Set[Subscription] = set()
+        self._ticker: Optional[asyncio.TimerHandle] = None
+        self.published = 0
+        self.delivered = 0
+        self.dropped = 0
+        # Time to enqueue one notification for all of its local subscribers
+        self.fanout = Histogram(BROADCAST_BUCKETS)
+        # From publish until a subscriber's stream picks the notification up
+        self.latency = Histogram(BROADCAST_BUCKETS)
+
+    async def start(self) -> None:
+        pass
+
+    async def stop(self) -> None:
+        if self._ticker is not None:
+            self._ticker.cancel()
+            self._ticker = None
+
+    @property
+    def subscribers(self) -> int:
+        return len(self.subscriptions)
+
+    def subscribe(self, channels: Iterable[Channel]) -> Subscription:
+        subscription = Subscription(self, list(channels), self.max_queued)
+        for channel in subscription.channels:
+            self.channels[channel].add(subscription)
+        self.subscriptions.add(subscription)
+        if self._ticker is None:
+            self._ticker = asyncio.get_running_loop().call_later(self.heartbeat, self._tick)
+        return subscription
+
+    def unsubscribe(self, subscription: Subscription) -> None:
+        for channel in subscription.channels:
+            subscribers = self.channels.get(channel)
+            if subscribers is not None:
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self.channels[channel]
+        self.subscriptions.discard(subscription)
+
+    def _tick(self) -> None:
+        """Every heartbeat, wake idle subscriptions so their streams send a keepalive"""
+        for subscription in self.subscriptions:
+            subscription.wake()
+        self._ticker = (asyncio.get_running_loop().call_later(self.heartbeat, self._tick)
+                        if self.subscriptions else None)
+
+    async def publish(self, message: Dict[str, Any], user_ids: Iterable[int] = ()) -> None:
+        """Send ``message`` to its event's channel and to these users' channels"""
+        self.published += 1
+        self.dispatch(time.time(), message, user_ids)
+
+    def dispatch(self, published_at: float, message: Dict[str, Any], user_ids: Iterable[int],
+                 to_event: bool = True) -> None:
+        started = time.perf_counter()
+        channels = [user_channel(user_id) for user_id in user_ids]
+        if to_event:
+            channels.append(event_channel(message["event_id"]))
+        # A set, so a client listening on several of these channels gets it once
+        targets = set()
+        for channel in channels:
+            targets.update(self.channels.get(channel, ()))
+        for subscription in targets:
+            subscription.push(published_at, message)
+        self.delivered += len(targets)
+        self.fanout.observe(time.perf_counter() - started)
+
+    def stats(self) -> dict:
+        kinds = defaultdict(int)
+        for kind, _ in self.channels:
+            kinds[kind] += 1
+        return {
+            "backend": self.backend,
+            "subscribers": self.subscribers,
+            "channels": dict(kinds),
+            "published": self.published,
+            "delivered": self.delivered,
+            "dropped": self.dropped,
+            "fanout": self.fanout.snapshot(),
+            "latency": self.latency.snapshot(),
+        }
+
+class PostgresBroker(InProcessBroker):
+    """
+    Publishes with NOTIFY so that every worker process, on every host, delivers
+    each notification to its own subscribers; one LISTEN connection per process
+    feeds them. NOTIFY payloads are limited to 8000 bytes, so long recipient
+    lists are split over several notifications.
+    """
+
+    backend = "postgres"
+    CHANNEL = "event_changes"
+    USERS_PER_NOTIFY = 500
+
+    def __init__(self, dsn: str, max_queued: int, heartbeat: float):
+        super().__init__(max_queued, heartbeat)
+        self.dsn = dsn
+        self.reconnects = 0
+        self._listener = None
+        self._pool = None
+        self._reconnecting: Optional[asyncio.Task] = None
+
+    async def start(self) -> None:
+        self._pool = await asyncpg.create_pool(self.dsn, ssl="require", min_size=1, max_size=2)
+        await self._listen()
+
+    async def _listen(self) -> None:
+        self._listener = await asyncpg.connect(self.dsn, ssl="require")
+        self._listener.add_termination_listener(self._on_lost)
+        await self._listener.add_listener(self.CHANNEL, self._on_notify)
+
+    def _on_lost(self, connection) -> None:
+        if self._listener is connection:
+            self._reconnecting = asyncio.get_running_loop().create_task(self._reconnect())
+
+    async def _reconnect(self) -> None:
+        delay = 0.5
+        while True:
+            logger.warning("LISTEN connection lost; reconnecting in %.1fs", delay)
+            await asyncio.sleep(delay)
+            try:
+                await self._listen()
+                self.reconnects += 1
+                return
+            except Exception:
+                delay = min(delay * 2, 30.0)
+
+    async def stop(self) -> None:
+        await super().stop()
+        if self._reconnecting is not None:
+            self._reconnecting.cancel()
+        listener, self._listener = self._listener, None
+        if listener is not None:
+            await listener.close()
+        if self._pool is not None:
+            await self._pool.close()
+
+    async def publish(self, message: Dict[str, Any], user_ids: Iterable[int] = ()) -> None:
+        self.published += 1
+        user_ids = list(user_ids)
+        published_at = time.time()
+        # The first notification also reaches the event's channel
+        for offset in range(0, max(len(user_ids), 1), self.USERS_PER_NOTIFY):
+            payload = json.dumps({
+                "message": message,
+                "user_ids": user_ids[offset:offset + self.USERS_PER_NOTIFY],
+                "to_event": offset == 0,
+                "published_at": published_at,
+            }, separators=(",", ":"), default=str)
+            try:
+                await self._pool.execute("SELECT pg_notify($1, $2)", self.CHANNEL, payload)
+            except Exception:
+                # The change itself is already committed; live clients catch up on reconnect
+                logger.exception("Could not publish %s for event %s", message["type"], message["event_id"])
+                return
+
+    def _on_notify(self, connection, pid: int, channel: str, payload: str) -> None:
+        data = json.loads(payload)
+        self.dispatch(data["published_at"], data["message"], data["user_ids"], data["to_event"])
+
+    def stats(self) -> dict:
+        return {**super().stats(), "reconnects": self.reconnects}
+
+def create_broker() -> InProcessBroker:
+    if settings.EVENT_BROKER == "postgres":
+        # asyncpg takes a plain libpq-style URL
+        return PostgresBroker("postgresql://" + settings.DATABASE_URL.partition("://")[2],
+                              settings.EVENT_STREAM_QUEUE_SIZE, settings.EVENT_STREAM_HEARTBEAT_SECONDS)
+    return InProcessBroker(settings.EVENT_STREAM_QUEUE_SIZE, settings.EVENT_STREAM_HEARTBEAT_SECONDS)
+
+broker = create_broker()
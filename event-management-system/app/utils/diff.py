@@ -33,4 +33,52 @@ def generate_diff(old_data: Dict[str, Any], new_data: Dict[str, Any]) -> List[Ev
                 new_value=new_data[key]
             ))
     
-    return changes
\ No newline at end of file
+    return changes
+
+def _pointer(path: str, key: Any) -> str:
+    """Append one JSON-Pointer (RFC 6901) reference token to ``path``"""
+    return f"{path}/{str(key).replace('~', '~0').replace('/', '~1')}"
+
+def json_patch(old: Any, new: Any, path: str = "") -> List[Dict[str, Any]]:
+    """
+    JSON Patch (RFC 6902) operations turning ``old`` into ``new``. Objects are
+    compared key by key and lists element by element, so changing one rule of a
+    recurrence_pattern is one small operation rather than a replacement of the
+    whole pattern.
+    """
+    if isinstance(old, dict) and isinstance(new, dict):
+        operations = [{"op": "remove", "path": _pointer(path, key)} for key in old if key not in new]
+        for key, value in new.items():
+            if key in old:
+                operations.extend(json_patch(old[key], value, _pointer(path, key)))
+            else:
+                operations.append({"op": "add", "path": _pointer(path, key), "value": value})
+        return operations
+
+    if isinstance(old, list) and isinstance(new, list):
+        common = min(len(old), len(new))
+        operations = []
+        for index in range(common):
+            operations.extend(json_patch(old[index], new[index], _pointer(path, index)))
+        for index in range(common, len(new)):
+            operations.append({"op": "add", "path": _pointer(path, index), "value": new[index]})
+        # Remove surplus elements from the end so earlier indexes stay valid
+        for index in reversed(range(common, len(old))):
+            operations.append({"op": "remove", "path": _pointer(path, index)})
+        return operations
+
+    if type(old) is type(new) and old == new:
+        return []
+    return [{"op": "replace", "path": path, "value": new}]
+
+def field_values(data: Any, path: str = "") -> Dict[str, Any]:
+    """
+    JSON-Pointer -> value for every field, descending into objects (so each key of
+    recurrence_pattern is a field of its own); lists and scalars are single values.
+    """
+    if isinstance(data, dict) and data:
+        values = {}
+        for key, value in data.items():
+            values.update(field_values(value, _pointer(path, key)))
+        return values
+    return {path: data}
\ No newline at end of file
@@ -0,0 +1,85 @@
+import hashlib
+import json
+from datetime import datetime, timedelta, timezone
+from email.utils import format_datetime, parsedate_to_datetime
+from typing import Any, Dict, Iterable, List, Optional
+
+from fastapi import HTTPException, Request, Response, status
+
+from ..config import settings
+from .intervals import as_utc
+
+# Strong ETags are opaque digests of whatever identifies a representation's state.
+# Handlers compare them against the request's preconditions before building any
+# response model, so an unchanged poll costs the access check and one lookup.
+
+def make_etag(*parts: Any) -> str:
+    digest = hashlib.sha1(json.dumps(parts, separators=(",", ":"), default=str).encode()).hexdigest()
+    return f'"{digest}"'
+
+def event_etag(event) -> str:
+    # Every write bumps the event's version number
+    return make_etag("event", event.id, event.version)
+
+def version_etag(event_id: int, version_id: int) -> str:
+    # Versions are immutable, so their ids are enough
+    return make_etag("version", event_id, version_id)
+
+def permissions_etag(event_id: int, permissions: Iterable[Any]) -> str:
+    return make_etag("permissions", event_id, sorted(
+        [(permission.id, permission.user_id, permission.role, permission.updated_at)
+         for permission in permissions],
+        key=lambda row: row[0]
+    ))
+
+def _parse(header: Optional[str]) -> List[str]:
+    if not header:
+        return []
+    return [tag.strip() for tag in header.split(",") if tag.strip()]
+
+def not_modified(request: Request, etag: str) -> Optional[Response]:
+    """A 304 response if If-None-Match already names ``etag`` (weak comparison), else None"""
+    tags = _parse(request.headers.get("if-none-match"))
+    if "*" in tags or etag in (tag[2:] if tag.startswith("W/") else tag for tag in tags):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers={"ETag": etag})
+    return None
+
+def last_modified(changed_at: datetime) -> str:
+    """
+    Last-Modified for state whose latest change is stamped ``changed_at``. Stamps
+    are taken when a transaction starts, so one committing later can carry an
+    earlier stamp; the header stays SYNC_SETTLE_SECONDS, plus the second it is
+    truncated to, behind the present so that such a change still counts as newer.
+    """
+    settled = datetime.now(timezone.utc) - timedelta(seconds=settings.SYNC_SETTLE_SECONDS + 1)
+    return format_datetime(min(as_utc(changed_at), settled).replace(microsecond=0), usegmt=True)
+
+def not_modified_since(request: Request, changed_at: datetime, headers: Dict[str, str]) -> Optional[Response]:
+    """
+    A 304 response if If-Modified-Since is no earlier than ``changed_at`` (to the
+    second), else None. The header is ignored alongside If-None-Match, which takes
+    precedence, and when it isn't a valid date in the past.
+    """
+    header = request.headers.get("if-modified-since")
+    if not header or "if-none-match" in request.headers:
+        return None
+    try:
+        since = as_utc(parsedate_to_datetime(header))
+    except (TypeError, ValueError):
+        return None
+    if since > datetime.now(timezone.utc) or as_utc(changed_at).replace(microsecond=0) > since:
+        return None
+    return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+def check_if_match(request: Request, etag: str) -> None:
+    """Raise 412 if the request carries If-Match and none of its tags strongly match ``etag``"""
+    tags = _parse(request.headers.get("if-match"))
+    if tags and "*" not in tags and etag not in tags:
+        raise precondition_failed(etag)
+
+def precondition_failed(etag: Optional[str] = None) -> HTTPException:
+    return HTTPException(
+        status_code=status.HTTP_412_PRECONDITION_FAILED,
+        detail="Event has changed since it was fetched",
+        headers={"ETag": etag} if etag else None
+    )
@@ -0,0 +1,108 @@
+import asyncio
+import multiprocessing
+import time
+from concurrent.futures import Executor, ProcessPoolExecutor
+from typing import Optional
+
+from fastapi import HTTPException, status
+from passlib.hash import bcrypt
+
+from ..config import settings
+from .stats import Histogram
+
+# bcrypt is deliberately slow; these buckets cover cheap test costs up to very high cost factors
+HASH_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.2, 0.3, 0.5, 0.75, 1.0, 2.0, 5.0)
+
+def _hash(password: str, rounds: int):
+    """Runs in a pool worker; returns the hash and the time spent computing it"""
+    started = time.perf_counter()
+    hashed = bcrypt.using(rounds=rounds).hash(password)
+    return hashed, time.perf_counter() - started
+
+def _verify(password: str, hashed_password: str):
+    """Runs in a pool worker; returns the verdict and the time spent computing it"""
+    started = time.perf_counter()
+    valid = bcrypt.verify(password, hashed_password)
+    return valid, time.perf_counter() - started
+
+class PasswordHasher:
+    """
+    Runs bcrypt in a bounded process pool so hashing never stalls the event loop.
+
+    At most ``max_pending`` operations may be queued or running; beyond that the
+    caller gets an immediate 503 rather than waiting behind a login storm.
+    With ``workers=0`` the default thread pool is used instead of processes.
+    """
+
+    def __init__(self, workers: int, max_pending: int, rounds: int):
+        self.workers = workers
+        self.max_pending = max_pending
+        self.rounds = rounds
+        self.pending = 0
+        self.rejected = 0
+        self.latency = {op: Histogram(HASH_BUCKETS) for op in ("hash", "verify")}
+        self.compute = {op: Histogram(HASH_BUCKETS) for op in ("hash", "verify")}
+        self._executor: Optional[Executor] = None
+
+    def _get_executor(self) -> Optional[Executor]:
+        if self.workers and self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.workers,
+                mp_context=multiprocessing.get_context("spawn")
+            )
+        return self._executor
+
+    async def _run(self, op: str, fn, *args):
+        if self.pending >= self.max_pending:
+            self.rejected += 1
+            raise HTTPException(
+                status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
+                detail="Authentication is temporarily overloaded, please retry",
+                headers={"Retry-After": "1"},
+            )
+        self.pending += 1
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            result, compute_time = await loop.run_in_executor(self._get_executor(), fn, *args)
+        finally:
+            self.pending -= 1
+        self.latency[op].observe(time.perf_counter() - started)
+        self.compute[op].observe(compute_time)
+        return result
+
+    async def hash(self, password: str) -> str:
+        return await self._run("hash", _hash, password, self.rounds)
+
+    async def verify(self, password: str, hashed_password: str) -> bool:
+        return await self._run("verify", _verify, password, hashed_password)
+
+    def needs_rehash(self, hashed_password: str) -> bool:
+        """True if the hash was made with a different cost factor than the configured one"""
+        try:
+            return bcrypt.from_string(hashed_password).rounds != self.rounds
+        except ValueError:
+            return True
+
+    def shutdown(self) -> None:
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+
+    def stats(self) -> dict:
+        """Latency is end-to-end (queue wait included); compute is time inside bcrypt"""
+        return {
+            "workers": self.workers,
+            "rounds": self.rounds,
+            "pending": self.pending,
+            "max_pending": self.max_pending,
+            "rejected": self.rejected,
+            "latency": {op: hist.snapshot() for op, hist in self.latency.items()},
+            "compute": {op: hist.snapshot() for op, hist in self.compute.items()},
+        }
+
+password_hasher = PasswordHasher(
+    workers=settings.PASSWORD_HASH_WORKERS,
+    max_pending=settings.PASSWORD_HASH_MAX_PENDING,
+    rounds=settings.BCRYPT_ROUNDS,
+)
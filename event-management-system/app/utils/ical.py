@@ -0,0 +1,118 @@
+from datetime import datetime, timezone
+from typing import List, Optional, Tuple
+
+from .intervals import as_utc
+from .recurrence import WEEKDAYS, first_slot, last_slot, parse_rule
+
+# iCalendar (RFC 5545) encoding for the calendar feeds. Lines end in CRLF and are
+# folded at 75 octets. Times are written in UTC ("...Z"), as events are stored
+# and recurrence is expanded, and clients show them in their own zone.
+
+PRODID = "-//Event Management System//Calendar Feed//EN"
+UID_DOMAIN = "event-management-system"
+CALENDAR_FOOTER = "END:VCALENDAR\r\n"
+
+WEEKDAY_NAMES = {number: name for name, number in WEEKDAYS.items()}
+
+def format_utc(value: datetime) -> str:
+    """DATE-TIME in UTC; naive values are UTC already. Formatted by hand, at half the cost of strftime"""
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc)
+    return "%04d%02d%02dT%02d%02d%02dZ" % (value.year, value.month, value.day, value.hour, value.minute, value.second)
+
+def escape_text(value: str) -> str:
+    """TEXT value: backslashes, semicolons, commas and line breaks escaped"""
+    return (value.replace("\\", "\\\\").replace(";", "\\;").replace(",", "\\,")
+            .replace("\r\n", "\\n").replace("\r", "\\n").replace("\n", "\\n"))
+
+def fold(line: str) -> str:
+    """A content line and its CRLF, folded into 75-octet lines without splitting a UTF-8 sequence"""
+    if line.isascii():
+        if len(line) <= 75:
+            return line + "\r\n"
+        # Continuation lines start with a space, which counts towards their 75 octets
+        return "\r\n ".join([line[:75]] + [line[i:i + 74] for i in range(75, len(line), 74)]) + "\r\n"
+    encoded = line.encode()
+    parts, start, limit = [], 0, 75
+    while start < len(encoded):
+        end = min(start + limit, len(encoded))
+        while end < len(encoded) and encoded[end] & 0xC0 == 0x80:  # inside a character
+            end -= 1
+        parts.append(encoded[start:end].decode())
+        start, limit = end, 74
+    return "\r\n ".join(parts) + "\r\n"
+
+def calendar_header(name: str) -> str:
+    return "".join(fold(line) for line in (
+        "BEGIN:VCALENDAR",
+        "VERSION:2.0",
+        f"PRODID:{PRODID}",
+        "CALSCALE:GREGORIAN",
+        f"X-WR-CALNAME:{escape_text(name)}",
+    ))
+
+def recurrence_lines(pattern: dict, start: datetime) -> Optional[Tuple[datetime, List[str]]]:
+    """
+    The first start of a series and its RRULE and EXDATE lines, or None if it
+    never occurs. RRULE always counts DTSTART as the first instance, so a start on
+    a weekday that byday leaves out moves to the first real one; it takes COUNT or
+    UNTIL but not both, so a series with both ends at the start of its last slot.
+    """
+    rule = parse_rule(pattern)
+    first = first_slot(rule, start)
+    if first is None:
+        return None
+    parts = [f"FREQ={rule.freq.upper()}"]
+    if rule.interval != 1:
+        parts.append(f"INTERVAL={rule.interval}")
+    if rule.count is not None and rule.until is not None:
+        until = last_slot(rule, start)
+        if until is None:
+            return None
+        parts.append(f"UNTIL={format_utc(until)}")
+    elif rule.count is not None:
+        parts.append(f"COUNT={rule.count}")
+    elif rule.until is not None:
+        parts.append(f"UNTIL={format_utc(rule.until)}")
+    if rule.byday:
+        parts.append("BYDAY=" + ",".join(WEEKDAY_NAMES[day] for day in rule.byday))
+    lines = ["RRULE:" + ";".join(parts)]
+    # An exception date skips that day's slot, which starts at the series' time of day
+    excluded = rule.except_starts | {datetime.combine(day, first.timetz()) for day in rule.except_dates}
+    if excluded:
+        lines.append("EXDATE:" + ",".join(format_utc(value) for value in sorted(excluded)))
+    return first, lines
+
+def encode_event(event) -> str:
+    """
+    One VEVENT from anything with the event's columns as attributes (a model or
+    a row). Empty if its series never occurs; a pattern that doesn't validate is
+    a single occurrence, as when it is expanded.
+    """
+    start, end, recurrence = event.start_time, event.end_time, ()
+    if event.is_recurring and event.recurrence_pattern:
+        start, end = as_utc(start), as_utc(end)
+        try:
+            series = recurrence_lines(event.recurrence_pattern, start)
+        except ValueError:
+            series = start, ()
+        if series is None:
+            return ""
+        first, recurrence = series
+        start, end = first, first + (end - start)
+    modified = format_utc(event.updated_at or event.created_at)
+
+    # These properties are fixed-width and well under 75 octets; only the rest need folding
+    parts = [
+        f"BEGIN:VEVENT\r\nUID:event-{event.id}@{UID_DOMAIN}\r\nDTSTAMP:{modified}\r\n"
+        f"CREATED:{format_utc(event.created_at)}\r\nLAST-MODIFIED:{modified}\r\nSEQUENCE:{event.version - 1}\r\n"
+        f"DTSTART:{format_utc(start)}\r\nDTEND:{format_utc(end)}\r\n"
+    ]
+    parts.extend([fold(line) for line in recurrence])
+    parts.append(fold(f"SUMMARY:{escape_text(event.title or '')}"))
+    if event.description:
+        parts.append(fold(f"DESCRIPTION:{escape_text(event.description)}"))
+    if event.location:
+        parts.append(fold(f"LOCATION:{escape_text(event.location)}"))
+    parts.append("END:VEVENT\r\n")
+    return "".join(parts)
@@ -0,0 +1,120 @@
+from datetime import datetime, timezone
+from heapq import heappush, heappop
+from operator import itemgetter
+from typing import Any, Dict, FrozenSet, Hashable, Iterable, List, NamedTuple, Optional, Set, Tuple
+
+Interval = Tuple[datetime, datetime, Hashable]
+
+def as_utc(value: datetime) -> datetime:
+    """Normalize a datetime to an aware UTC datetime (naive values are treated as UTC)"""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+def find_overlaps(existing: Iterable[Interval], candidates: Iterable[Interval]) -> Dict[Hashable, Dict[str, Set[Any]]]:
+    """
+    Sweep-line overlap detection over half-open [start, end) intervals.
+
+    Returns, for every candidate key that overlaps something, the keys of the
+    overlapping existing intervals and of the overlapping candidates. Overlaps
+    between two existing intervals are not reported.
+    """
+    points = []
+    for start, end, key in existing:
+        points.append((as_utc(start), as_utc(end), False, key))
+    for start, end, key in candidates:
+        points.append((as_utc(start), as_utc(end), True, key))
+    # Ties on start are ordered by end so empty intervals leave the active set first
+    points.sort(key=lambda p: (p[0], p[1]))
+
+    active_existing: List[Tuple[datetime, int, Hashable]] = []
+    active_candidates: List[Tuple[datetime, int, Hashable]] = []
+    result: Dict[Hashable, Dict[str, Set[Any]]] = {}
+
+    def entry(key):
+        return result.setdefault(key, {"existing": set(), "candidates": set()})
+
+    for seq, (start, end, is_candidate, key) in enumerate(points):
+        for heap in (active_existing, active_candidates):
+            while heap and heap[0][0] <= start:
+                heappop(heap)
+
+        if is_candidate:
+            for _, _, other in active_existing:
+                entry(key)["existing"].add(other)
+            for _, _, other in active_candidates:
+                entry(key)["candidates"].add(other)
+                entry(other)["candidates"].add(key)
+            heappush(active_candidates, (end, seq, key))
+        else:
+            for _, _, other in active_candidates:
+                entry(other)["existing"].add(key)
+            heappush(active_existing, (end, seq, key))
+
+    return result
+
+class Block(NamedTuple):
+    start: datetime
+    end: datetime
+    keys: FrozenSet[Hashable]
+
+def merge_intervals(intervals: Iterable[Interval], window_start: Optional[datetime] = None,
+                    window_end: Optional[datetime] = None) -> List[Block]:
+    """
+    Union of half-open [start, end) intervals as sorted, disjoint blocks, each with
+    the keys of the intervals it covers (None keys are left out). Intervals that
+    touch are merged, since no gap separates them. With a window, blocks are
+    clipped to it and intervals outside it are dropped. All datetimes must be
+    aware UTC, as expand() returns them.
+    """
+    points = []
+    for start, end, key in intervals:
+        if window_start is not None and start < window_start:
+            start = window_start
+        if window_end is not None and end > window_end:
+            end = window_end
+        if start < end:
+            points.append((start, end, key))
+    points.sort(key=itemgetter(0))
+
+    blocks: List[Block] = []
+    current_start = current_end = None
+    keys: Set[Hashable] = set()
+    for start, end, key in points:
+        if current_end is not None and start <= current_end:
+            if end > current_end:
+                current_end = end
+        else:
+            if current_end is not None:
+                blocks.append(Block(current_start, current_end, frozenset(keys)))
+            current_start, current_end, keys = start, end, set()
+        if key is not None:
+            keys.add(key)
+    if current_end is not None:
+        blocks.append(Block(current_start, current_end, frozenset(keys)))
+    return blocks
+
+def subtract_intervals(available: Iterable[Tuple[datetime, datetime]],
+                       busy: Iterable[Tuple[datetime, ...]]) -> List[Tuple[datetime, datetime]]:
+    """
+    The parts of ``available`` not covered by ``busy``. Both must be sorted and
+    disjoint (merge_intervals output qualifies); one pass walks them together.
+    """
+    busy = iter(busy)
+    current = next(busy, None)
+    free = []
+    for start, end in available:
+        # Skip busy blocks that end before this window starts
+        while current is not None and current[1] <= start:
+            current = next(busy, None)
+        while current is not None and current[0] < end:
+            if current[0] > start:
+                free.append((start, current[0]))
+            if current[1] >= end:
+                start = end
+                break
+            start = current[1]
+            current = next(busy, None)
+        if start < end:
+            free.append((start, end))
+    return free
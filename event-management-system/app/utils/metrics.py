@@ -0,0 +1,169 @@
+import time
+from collections import Counter
+from contextvars import ContextVar
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import event
+
+from .stats import Histogram
+
+# Statements per request: 1 is ideal, dozens usually means a query in a loop
+STATEMENT_BUCKETS = (1, 2, 3, 5, 10, 20, 50, 100, 250)
+
+class RequestStats:
+    """SQL issued while handling one request"""
+    __slots__ = ("statements", "db_time", "texts")
+
+    def __init__(self):
+        self.statements = 0
+        self.db_time = 0.0
+        # SQL text -> executions; compiled statements are cached, so this is cheap
+        self.texts: Counter = Counter()
+
+current_request: ContextVar[Optional[RequestStats]] = ContextVar("current_request", default=None)
+
+class RouteMetrics:
+    def __init__(self):
+        self.statuses: Counter = Counter()
+        self.latency = Histogram()
+        self.db_time = Histogram()
+        self.statements = Histogram(STATEMENT_BUCKETS)
+
+    def snapshot(self) -> dict:
+        return {
+            "requests": self.latency.count,
+            "statuses": {str(code): count for code, count in sorted(self.statuses.items())},
+            "latency": self.latency.snapshot(),
+            "db_time": self.db_time.snapshot(),
+            "statements_per_request": round(self.statements.sum / self.statements.count, 2)
+            if self.statements.count else None,
+        }
+
+class MetricsRegistry:
+    """Per-route request metrics, keyed by method and route template (not the raw path)"""
+
+    def __init__(self):
+        self.routes: Dict[Tuple[str, str], RouteMetrics] = {}
+
+    def observe(self, method: str, route: str, status_code: int, duration: float, stats: RequestStats) -> None:
+        metrics = self.routes.get((method, route))
+        if metrics is None:
+            metrics = self.routes[(method, route)] = RouteMetrics()
+        metrics.statuses[status_code] += 1
+        metrics.latency.observe(duration)
+        metrics.db_time.observe(stats.db_time)
+        metrics.statements.observe(stats.statements)
+
+    def snapshot(self) -> dict:
+        return {f"{method} {route}": metrics.snapshot() for (method, route), metrics in sorted(self.routes.items())}
+
+registry = MetricsRegistry()
+
+class MetricsMiddleware:
+    """
+    Pure ASGI middleware (no per-request task or body buffering, unlike
+    BaseHTTPMiddleware) that times each request and attributes it to the route
+    FastAPI matched, together with the SQL the request issued.
+    """
+
+    def __init__(self, app, registry: MetricsRegistry = registry):
+        self.app = app
+        self.registry = registry
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = current_request.set(stats)
+        status_code = 500
+
+        async def send_with_status(message):
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = message["status"]
+            await send(message)
+
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # The router stores the matched route in the (shared) scope
+            route = getattr(scope.get("route"), "path", None) or "<unmatched>"
+            self.registry.observe(scope["method"], route, status_code, time.perf_counter() - started, stats)
+            current_request.reset(token)
+
+def instrument_engine(sync_engine) -> None:
+    """Count statements and DB time against the current request (async engines: pass engine.sync_engine)"""
+
+    @event.listens_for(sync_engine, "before_cursor_execute")
+    def start_timer(conn, cursor, statement, parameters, context, executemany):
+        context._metrics_started = time.perf_counter()
+
+    @event.listens_for(sync_engine, "after_cursor_execute")
+    def record_statement(conn, cursor, statement, parameters, context, executemany):
+        stats = current_request.get()
+        if stats is not None:
+            stats.statements += 1
+            stats.texts[statement] += 1
+            stats.db_time += time.perf_counter() - context._metrics_started
+
+# Prometheus text exposition format 0.0.4
+
+def _escape(value) -> str:
+    return str(value).replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+def _labels(labels: Dict[str, object]) -> str:
+    if not labels:
+        return ""
+    return "{" + ",".join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + "}"
+
+def _number(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if isinstance(value, float) else str(value)
+
+class PrometheusWriter:
+    """Accumulates samples, emitting HELP/TYPE once per metric family"""
+
+    def __init__(self):
+        self.lines: List[str] = []
+        self._declared = set()
+
+    def _declare(self, name: str, kind: str, help_text: str) -> None:
+        if name not in self._declared:
+            self._declared.add(name)
+            self.lines.append(f"# HELP {name} {help_text}")
+            self.lines.append(f"# TYPE {name} {kind}")
+
+    def sample(self, name: str, kind: str, help_text: str, value: float, **labels) -> None:
+        self._declare(name, kind, help_text)
+        self.lines.append(f"{name}{_labels(labels)} {_number(value)}")
+
+    def histogram(self, name: str, help_text: str, histogram: Histogram, **labels) -> None:
+        self._declare(name, "histogram", help_text)
+        for bound, count in histogram.cumulative().items():
+            self.lines.append(f"{name}_bucket{_labels({**labels, 'le': _number(bound)})} {count}")
+        self.lines.append(f"{name}_sum{_labels(labels)} {_number(histogram.sum)}")
+        self.lines.append(f"{name}_count{_labels(labels)} {histogram.count}")
+
+    def write_routes(self, registry: MetricsRegistry = registry) -> None:
+        # Samples of one family must be contiguous, hence one pass per family
+        routes = sorted(registry.routes.items())
+        for (method, route), metrics in routes:
+            for code, count in sorted(metrics.statuses.items()):
+                self.sample("http_requests_total", "counter", "HTTP requests handled, by route and status",
+                            count, method=method, route=route, status=code)
+        for (method, route), metrics in routes:
+            self.histogram("http_request_duration_seconds", "Time from request start to the last response byte",
+                           metrics.latency, method=method, route=route)
+        for (method, route), metrics in routes:
+            self.histogram("http_request_db_duration_seconds", "Time spent executing SQL per request",
+                           metrics.db_time, method=method, route=route)
+        for (method, route), metrics in routes:
+            self.histogram("http_request_db_statements", "SQL statements executed per request",
+                           metrics.statements, method=method, route=route)
+
+    def render(self) -> str:
+        return "\n".join(self.lines) + "\n"
@@ -0,0 +1,57 @@
+import base64
+import json
+from datetime import datetime
+from typing import Any, Callable, Sequence, Tuple
+
+from fastapi import HTTPException, status
+from sqlalchemy import DateTime, tuple_
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+# Keyset ("seek") pagination: a page is fetched with WHERE (k1, k2) > (last k1, last k2)
+# ORDER BY k1, k2 instead of OFFSET, so every page costs the same index range scan
+# and rows inserted behind the cursor cannot shift later pages.
+# Cursors are the sort-key values of the last row returned, JSON-encoded then
+# base64url'd so clients treat them as opaque.
+
+NEXT_CURSOR_HEADER = "X-Next-Cursor"
+
+def _encode_value(value: Any) -> Any:
+    return value.isoformat() if isinstance(value, datetime) else value
+
+def encode_cursor(*values: Any) -> str:
+    raw = json.dumps([_encode_value(value) for value in values], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip("=")
+
+def decode_cursor(cursor: str, parsers: Sequence[Callable[[Any], Any]]) -> Tuple[Any, ...]:
+    """Decode a cursor made by encode_cursor, parsing each key with the matching parser"""
+    try:
+        padded = cursor + "=" * (-len(cursor) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode()))
+        if not isinstance(values, list) or len(values) != len(parsers):
+            raise ValueError("wrong number of keys")
+        return tuple(parse(value) for parse, value in zip(parsers, values))
+    except (ValueError, TypeError):
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Invalid pagination cursor"
+        )
+
+def _comparable(db: AsyncSession, column):
+    # SQLite compares datetimes as text, and server-default timestamps are stored
+    # without the microseconds that bound parameters carry, so an equal instant
+    # would sort before the cursor. Compare both sides normalised to milliseconds.
+    if db.get_bind().dialect.name == "sqlite" and isinstance(column.type, DateTime) \
+            and column.server_default is not None:
+        return lambda value: func.strftime("%Y-%m-%d %H:%M:%f", value)
+    return lambda value: value
+
+def seek(db: AsyncSession, columns: Sequence[Any], values: Sequence[Any], descending: bool = False):
+    """Row-value predicate selecting rows strictly after ``values`` in (columns) order"""
+    normalize = [_comparable(db, column) for column in columns]
+    left = tuple_(*(norm(column) for norm, column in zip(normalize, columns)))
+    right = tuple_(*(norm(value) for norm, value in zip(normalize, values)))
+    return left < right if descending else left > right
+
+def parse_datetime(value: str) -> datetime:
+    return datetime.fromisoformat(value)
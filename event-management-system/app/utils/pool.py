@@ -0,0 +1,58 @@
+import time
+
+from sqlalchemy import exc
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from .stats import Histogram
+
+# Checkout waits are normally sub-millisecond; anything near pool_timeout means starvation
+WAIT_BUCKETS = (0.0005, 0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+
+class InstrumentedAsyncPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that records how long each checkout waited (including opening a new
+    connection when the pool is below size), how many checkouts had to open an
+    overflow connection, and how many gave up with a pool timeout.
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.wait_time = Histogram(WAIT_BUCKETS)
+        self.checkouts = 0
+        self.timeouts = 0
+        self.overflow_connections = 0
+        self.peak_checked_out = 0
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except exc.TimeoutError:
+            self.timeouts += 1
+            raise
+        finally:
+            self.wait_time.observe(time.perf_counter() - started)
+        self.checkouts += 1
+        self.peak_checked_out = max(self.peak_checked_out, self.checkedout())
+        return connection
+
+    def _create_connection(self):
+        # overflow() turns positive once connections beyond pool_size are open
+        if self.overflow() > 0:
+            self.overflow_connections += 1
+        return super()._create_connection()
+
+    def stats(self) -> dict:
+        return {
+            "pool_size": self.size(),
+            "max_overflow": self._max_overflow,
+            "timeout_seconds": self._timeout,
+            "checked_out": self.checkedout(),
+            "checked_in": self.checkedin(),
+            "overflow": max(self.overflow(), 0),
+            "peak_checked_out": self.peak_checked_out,
+            "checkouts": self.checkouts,
+            "overflow_connections": self.overflow_connections,
+            "timeouts": self.timeouts,
+            "wait": self.wait_time.snapshot(),
+        }
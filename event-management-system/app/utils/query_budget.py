@@ -0,0 +1,111 @@
+import logging
+import re
+from collections import Counter
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+from fastapi import Request
+from sqlalchemy import event
+
+from ..config import settings
+from .metrics import current_request
+
+logger = logging.getLogger(__name__)
+
+_PLACEHOLDER = re.compile(r"\$\d+|%\(\w+\)s|\?")
+_PLACEHOLDER_LIST = re.compile(r"\(\s*\?(?:\s*,\s*\?)*\s*\)")
+_ROW_LIST = re.compile(r"\(\?\.\.\.\)(?:\s*,\s*\(\?\.\.\.\))+")
+_WHITESPACE = re.compile(r"\s+")
+
+def statement_shape(statement: str) -> str:
+    """
+    SQL with placeholders unified and IN / VALUES lists collapsed, so the same
+    query issued with different parameters (or list lengths) has one shape.
+    """
+    shape = _PLACEHOLDER.sub("?", statement)
+    shape = _PLACEHOLDER_LIST.sub("(?...)", shape)
+    shape = _ROW_LIST.sub("(?...)", shape)
+    return _WHITESPACE.sub(" ", shape).strip()
+
+class QueryBudgetExceeded(RuntimeError):
+    pass
+
+class StatementLog:
+    """Statements issued within some scope, counted by exact SQL text"""
+
+    def __init__(self, texts: Optional[Counter] = None):
+        self.texts: Counter = texts if texts is not None else Counter()
+
+    @property
+    def count(self) -> int:
+        return sum(self.texts.values())
+
+    def shapes(self) -> Counter:
+        shapes = Counter()
+        for text, count in self.texts.items():
+            shapes[statement_shape(text)] += count
+        return shapes
+
+    def suspects(self, threshold: Optional[int] = None) -> Dict[str, int]:
+        """Shapes repeated at least ``threshold`` times: usually a query inside a loop"""
+        threshold = threshold or settings.QUERY_BUDGET_REPEAT_THRESHOLD
+        return {shape: count for shape, count in self.shapes().most_common() if count >= threshold}
+
+    def check(self, label: str, max_statements: int, mode: Optional[str] = None) -> None:
+        """Log or raise QueryBudgetExceeded if more than ``max_statements`` were issued"""
+        mode = mode or settings.QUERY_BUDGET_MODE
+        count = self.count
+        if mode == "off" or count <= max_statements:
+            return
+        message = f"{label} issued {count} SQL statements, budget is {max_statements}"
+        suspects = self.suspects()
+        if suspects:
+            message += "; N+1 suspects:" + "".join(
+                f"\n  {repeats}x {shape[:200]}" for shape, repeats in suspects.items()
+            )
+        if mode == "raise":
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+def query_budget(max_statements: int):
+    """
+    Route dependency declaring how many SQL statements a request may issue,
+    authentication included:
+
+        @router.get("/{event_id}", dependencies=[Depends(query_budget(3))])
+
+    Counts come from the metrics middleware. The check runs after the response
+    has been sent, so QUERY_BUDGET_MODE=raise fails the request in the server
+    log and in TestClient (which re-raises server errors) rather than for the
+    client.
+    """
+    async def enforce_query_budget(request: Request):
+        yield
+        stats = current_request.get()
+        if stats is None:
+            return
+        route = getattr(request.scope.get("route"), "path", request.url.path)
+        allowance = getattr(request.state, "extra_statements", 0)
+        StatementLog(stats.texts).check(f"{request.method} {route}", max_statements + allowance)
+    return enforce_query_budget
+
+def allow_statements(request: Request, count: int) -> None:
+    """Raise this request's budget by ``count``, for work that scales with its input"""
+    request.state.extra_statements = getattr(request.state, "extra_statements", 0) + count
+
+@contextmanager
+def capture_statements(sync_engine) -> Iterator[StatementLog]:
+    """
+    Record every statement the engine executes inside the block, from any thread
+    or task, e.g. an app driven by TestClient (async engines: pass engine.sync_engine)
+    """
+    log = StatementLog()
+
+    def record(conn, cursor, statement, parameters, context, executemany):
+        log.texts[statement] += 1
+
+    event.listen(sync_engine, "after_cursor_execute", record)
+    try:
+        yield log
+    finally:
+        event.remove(sync_engine, "after_cursor_execute", record)
\ No newline at end of file
@@ -0,0 +1,289 @@
+import calendar
+import json
+from datetime import date, datetime, timedelta
+from functools import lru_cache
+from typing import FrozenSet, Iterator, List, NamedTuple, Optional, Tuple
+
+from ..config import settings
+from .intervals import as_utc
+
+# recurrence_pattern is an RRULE-style JSON object:
+#   {"freq": "daily" | "weekly" | "monthly" | "yearly",   required
+#    "interval": 2,                     every 2nd day/week/..., default 1
+#    "count": 10,                       at most 10 occurrences (exceptions included, as in RFC 5545)
+#    "until": "2025-06-30T00:00:00Z",   no occurrence starts after this (a bare date means end of day)
+#    "byday": ["MO", "WE"],             daily/weekly only: restrict to these weekdays
+#    "exceptions": ["2025-03-03T09:00:00Z", "2025-04-01"]}   skip this start, or every start on this date
+# The event's own start_time/end_time are the first occurrence and its duration.
+# Everything is expanded in UTC.
+
+Occurrence = Tuple[datetime, datetime]
+
+FREQUENCIES = ("daily", "weekly", "monthly", "yearly")
+WEEKDAYS = {"MO": 0, "TU": 1, "WE": 2, "TH": 3, "FR": 4, "SA": 5, "SU": 6}
+
+class RecurrenceRule(NamedTuple):
+    freq: str
+    interval: int
+    count: Optional[int]
+    until: Optional[datetime]
+    byday: Tuple[int, ...]
+    except_starts: FrozenSet[datetime]
+    except_dates: FrozenSet[date]
+
+def _parse_instant(value, end_of_day: bool = False):
+    """ISO datetime -> aware UTC datetime; ISO date -> date (or its last instant)"""
+    if not isinstance(value, str):
+        raise ValueError(f"expected an ISO date or datetime, got {value!r}")
+    if len(value) == 10:
+        day = date.fromisoformat(value)
+        if end_of_day:
+            return as_utc(datetime.combine(day, datetime.max.time()))
+        return day
+    return as_utc(datetime.fromisoformat(value.replace("Z", "+00:00")))
+
+# The per-pattern memo: every series sharing a pattern shares its parsed rule
+@lru_cache(maxsize=settings.RECURRENCE_CACHE_MAX_SIZE)
+def _parse_rule(key: str) -> RecurrenceRule:
+    pattern = json.loads(key)
+    if not isinstance(pattern, dict):
+        raise ValueError("recurrence_pattern must be an object")
+
+    freq = str(pattern.get("freq", "")).lower()
+    if freq not in FREQUENCIES:
+        raise ValueError(f"freq must be one of {', '.join(FREQUENCIES)}")
+
+    interval = pattern.get("interval", 1)
+    count = pattern.get("count")
+    if not isinstance(interval, int) or interval < 1:
+        raise ValueError("interval must be a positive integer")
+    if count is not None and (not isinstance(count, int) or count < 1):
+        raise ValueError("count must be a positive integer")
+
+    until = pattern.get("until")
+    if until is not None:
+        until = _parse_instant(until, end_of_day=True)
+
+    byday = pattern.get("byday") or []
+    if byday and freq not in ("daily", "weekly"):
+        raise ValueError("byday is only supported for daily and weekly recurrence")
+    try:
+        byday = tuple(sorted({WEEKDAYS[str(day).upper()] for day in byday}))
+    except KeyError as exc:
+        raise ValueError(f"unknown weekday {exc.args[0]!r} in byday")
+
+    exceptions = [_parse_instant(value) for value in pattern.get("exceptions") or []]
+    return RecurrenceRule(
+        freq=freq,
+        interval=interval,
+        count=count,
+        until=until,
+        byday=byday,
+        except_starts=frozenset(value for value in exceptions if isinstance(value, datetime)),
+        except_dates=frozenset(value for value in exceptions if not isinstance(value, datetime)),
+    )
+
+def _pattern_key(pattern: dict) -> str:
+    return json.dumps(pattern, sort_keys=True, separators=(",", ":"), default=str)
+
+def parse_rule(pattern: dict) -> RecurrenceRule:
+    """Validate a recurrence_pattern; raises ValueError describing the first problem"""
+    return _parse_rule(_pattern_key(pattern))
+
+def rule_cache_stats() -> dict:
+    """Hit/miss counters of the parsed-pattern memo, shaped like TTLCache.stats()"""
+    info = _parse_rule.cache_info()
+    lookups = info.hits + info.misses
+    return {
+        "size": info.currsize,
+        "maxsize": info.maxsize,
+        "hits": info.hits,
+        "misses": info.misses,
+        "hit_rate": round(info.hits / lookups, 4) if lookups else 0.0,
+    }
+
+def _add_months(value: datetime, months: int) -> Optional[datetime]:
+    """Same day and time ``months`` later, or None if that month has no such day"""
+    month_index = value.month - 1 + months
+    year, month = value.year + month_index // 12, month_index % 12 + 1
+    if value.day > calendar.monthrange(year, month)[1]:
+        return None
+    return value.replace(year=year, month=month)
+
+def _first_period(rule: RecurrenceRule, start: datetime, earliest: datetime) -> Tuple[int, int]:
+    """
+    Jump straight to the first period that can hold a start at or after ``earliest``.
+    Returns that period's index and how many slots the skipped periods held, so
+    ``count`` is still honoured without generating them.
+    """
+    if earliest <= start:
+        return 0, 0
+
+    if rule.freq == "daily":
+        period = (earliest - start).days // rule.interval
+        if not rule.byday:
+            return period, period
+        # Weekdays of successive periods repeat every 7 periods
+        cycle = [(start.weekday() + i * rule.interval) % 7 in rule.byday for i in range(7)]
+        return period, (period // 7) * sum(cycle) + sum(cycle[:period % 7])
+
+    if rule.freq == "weekly":
+        week_start = start - timedelta(days=start.weekday())
+        period = (earliest - week_start).days // (7 * rule.interval)
+        days = rule.byday or (start.weekday(),)
+        first_week = sum(1 for day in days if day >= start.weekday())
+        return period, (first_week + (period - 1) * len(days)) if period else 0
+
+    months = (earliest.year - start.year) * 12 + earliest.month - start.month
+    if rule.freq == "yearly":
+        period = max(months // 12 - 1, 0) // rule.interval
+        step = 12 * rule.interval
+    else:
+        period = max(months - 1, 0) // rule.interval
+        step = rule.interval
+    if start.day <= 28:
+        return period, period
+    # Months without this day (e.g. the 31st) produce no slot
+    return period, sum(1 for i in range(period) if _add_months(start, i * step) is not None)
+
+def _slots(rule: RecurrenceRule, start: datetime, period: int) -> Iterator[datetime]:
+    """Candidate starts from ``period`` onwards, in order"""
+    if rule.freq == "daily":
+        step = timedelta(days=rule.interval)
+        current = start + step * period
+        while True:
+            if not rule.byday or current.weekday() in rule.byday:
+                yield current
+            current += step
+    elif rule.freq == "weekly":
+        days = rule.byday or (start.weekday(),)
+        week_start = start - timedelta(days=start.weekday())
+        step = timedelta(weeks=rule.interval)
+        current = week_start + step * period
+        while True:
+            for day in days:
+                slot = current + timedelta(days=day)
+                if slot >= start:
+                    yield slot
+            current += step
+    else:
+        step = rule.interval * (12 if rule.freq == "yearly" else 1)
+        while True:
+            slot = _add_months(start, period * step)
+            if slot is not None:
+                yield slot
+            period += 1
+
+def _fixed_step(rule: RecurrenceRule, start: datetime) -> Optional[timedelta]:
+    """The constant gap between starts, for series that have one"""
+    if rule.freq == "daily" and not rule.byday:
+        return timedelta(days=rule.interval)
+    if rule.freq == "weekly" and rule.byday in ((), (start.weekday(),)):
+        return timedelta(weeks=rule.interval)
+    return None
+
+def _expand_fixed(rule: RecurrenceRule, start: datetime, duration: timedelta, step: timedelta,
+                  window_start: datetime, window_end: datetime) -> List[Occurrence]:
+    """Starts are start + i * step, so the index range inside the window is plain arithmetic"""
+    first = max((window_start - duration - start) // step + 1, 0)
+    stop = -((start - window_end) // step)
+    if rule.count is not None:
+        stop = min(stop, rule.count)
+    if rule.until is not None:
+        stop = min(stop, (rule.until - start) // step + 1)
+    slots = (start + step * i for i in range(first, stop))
+    if rule.except_starts or rule.except_dates:
+        slots = (slot for slot in slots
+                 if slot not in rule.except_starts and slot.date() not in rule.except_dates)
+    return [(slot, slot + duration) for slot in slots]
+
+def _expand(rule: RecurrenceRule, start: datetime, duration: timedelta,
+            window_start: datetime, window_end: datetime) -> Iterator[Occurrence]:
+    step = _fixed_step(rule, start)
+    if step is not None:
+        yield from _expand_fixed(rule, start, duration, step, window_start, window_end)
+        return
+
+    if first_slot(rule, start) is None:
+        return
+    period, seen = _first_period(rule, start, window_start - duration)
+    for slot in _slots(rule, start, period):
+        if rule.count is not None and seen >= rule.count:
+            return
+        if slot >= window_end or (rule.until is not None and slot > rule.until):
+            return
+        seen += 1
+        if slot + duration <= window_start:
+            continue
+        if slot in rule.except_starts or slot.date() in rule.except_dates:
+            continue
+        yield slot, slot + duration
+
+def expand(pattern: Optional[dict], start: datetime, end: datetime,
+           window_start: datetime, window_end: datetime) -> Tuple[Occurrence, ...]:
+    """
+    Occurrences [start, end) of a series that overlap [window_start, window_end),
+    generated lazily from the first period that can reach the window. Without a
+    pattern the event is its own single occurrence.
+    """
+    start, end = as_utc(start), as_utc(end)
+    window_start, window_end = as_utc(window_start), as_utc(window_end)
+    if not pattern:
+        return ((start, end),) if start < window_end and end > window_start else ()
+
+    rule = parse_rule(pattern)
+    return tuple(_expand(rule, start, end - start, window_start, window_end))
+
+def event_occurrences(event, window_start: datetime, window_end: datetime) -> Tuple[Occurrence, ...]:
+    """
+    Occurrences of a stored event inside the window. Patterns stored before they
+    were validated are treated as non-recurring rather than failing the request.
+    """
+    pattern = event.recurrence_pattern if event.is_recurring else None
+    try:
+        return expand(pattern, event.start_time, event.end_time, window_start, window_end)
+    except ValueError:
+        return expand(None, event.start_time, event.end_time, window_start, window_end)
+
+def first_slot(rule: RecurrenceRule, start: datetime) -> Optional[datetime]:
+    """
+    The first start of a series: the event's own start unless byday leaves its
+    weekday out. None if no weekday of byday is ever reached (e.g. every 7th day,
+    on another weekday), in which case the series never occurs.
+    """
+    start = as_utc(start)
+    if not rule.byday or start.weekday() in rule.byday:
+        return start
+    if rule.freq == "weekly":
+        later = [day for day in rule.byday if day > start.weekday()]
+        if later:
+            return start + timedelta(days=later[0] - start.weekday())
+        return start + timedelta(days=7 * rule.interval + rule.byday[0] - start.weekday())
+    # Daily: the weekdays of successive periods repeat every 7 periods
+    for period in range(1, 7):
+        slot = start + timedelta(days=period * rule.interval)
+        if slot.weekday() in rule.byday:
+            return slot
+    return None
+
+def last_slot(rule: RecurrenceRule, start: datetime) -> Optional[datetime]:
+    """
+    The last start of a series bounded by both ``count`` and ``until`` (exceptions
+    included), for formats that accept only one of them. None if it has no start.
+    """
+    start = first_slot(rule, start)
+    if start is None or start > rule.until:
+        return None
+    step = _fixed_step(rule, start)
+    if step is not None:
+        return start + step * min(rule.count - 1, (rule.until - start) // step)
+    last = None
+    for seen, slot in enumerate(_slots(rule, start, 0)):
+        if seen >= rule.count or slot > rule.until:
+            break
+        last = slot
+    return last
+
+def horizon(start: datetime) -> datetime:
+    """How far ahead open-ended series are expanded when no window end is given"""
+    return as_utc(start) + timedelta(days=settings.RECURRENCE_HORIZON_DAYS)
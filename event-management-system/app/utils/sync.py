@@ -0,0 +1,69 @@
+from datetime import datetime, timedelta, timezone
+from typing import Iterable, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import case, func, insert, literal, select
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from ..config import settings
+from ..models.change import EventChange as EventChangeModel
+from ..models.permission import Permission as PermissionModel
+
+# Delta sync: every write that changes what a user sees of an event appends an
+# event_changes row for that user, and a sync token is the last row id the
+# client has caught up to. A sync answers with the current state of each event
+# changed since, or a tombstone when the user can no longer see it, so replaying
+# a change twice is harmless.
+
+async def record_event_change(db: AsyncSession, event_id: int) -> None:
+    """Log a change for everyone holding a role on the event, in one INSERT ... SELECT. The caller commits."""
+    await db.execute(insert(EventChangeModel).from_select(
+        ["user_id", "event_id"],
+        select(PermissionModel.user_id, literal(event_id)).filter(PermissionModel.event_id == event_id)
+    ))
+
+async def record_user_changes(db: AsyncSession, changes: Iterable[Tuple[int, int]]) -> None:
+    """Log (user_id, event_id) changes, such as roles granted or removed, with one executemany"""
+    rows = [{"user_id": user_id, "event_id": event_id} for user_id, event_id in changes]
+    if rows:
+        await db.execute(insert(EventChangeModel), rows)
+
+class ChangePage(NamedTuple):
+    event_ids: List[int]  # each changed event once, in the order of its latest change
+    token: int
+    has_more: bool
+
+async def changes_since(db: AsyncSession, user_id: int, after: int, limit: int) -> ChangePage:
+    """
+    Events whose latest change for the user is after ``after``, from one range
+    scan of ix_event_changes_user_seq grouped by event.
+
+    Ids are allocated when a row is inserted but become visible when its
+    transaction commits, so a lower id can appear after a higher one was read.
+    The returned token therefore stops at the newest change older than
+    SYNC_SETTLE_SECONDS, by when every lower id has committed; newer changes
+    are returned now and again on the next sync.
+    """
+    cutoff = datetime.now(timezone.utc) - timedelta(seconds=settings.SYNC_SETTLE_SECONDS)
+    seq = func.max(EventChangeModel.id).label("seq")
+    settled = func.max(case((EventChangeModel.created_at <= cutoff, EventChangeModel.id))).label("settled")
+    rows = (await db.execute(
+        select(EventChangeModel.event_id, seq, settled)
+        .filter(EventChangeModel.user_id == user_id, EventChangeModel.id > after)
+        .group_by(EventChangeModel.event_id)
+        .order_by(seq)
+        .limit(limit + 1)
+    )).all()
+
+    page = rows[:limit]
+    if not page:
+        return ChangePage([], after, False)
+    token = min(page[-1].seq, max((row.settled for row in page if row.settled is not None), default=after))
+    # A held-back token would hand the same page out again; the rest waits for the next sync
+    has_more = len(rows) > limit and token == page[-1].seq
+    return ChangePage([row.event_id for row in page], token, has_more)
+
+async def last_change_at(db: AsyncSession, user_id: int) -> Optional[datetime]:
+    """When the user's view of any event last changed, from ix_event_changes_user_time"""
+    return await db.scalar(
+        select(func.max(EventChangeModel.created_at)).filter(EventChangeModel.user_id == user_id)
+    )
@@ -0,0 +1,208 @@
+from typing import Any, AsyncIterable, AsyncIterator, Dict, Iterable, List, Optional, Sequence, Tuple
+from sqlalchemy import and_, insert, or_, select, update
+from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.sql import func
+
+from ..config import settings
+from ..models.event import Event as EventModel
+from ..models.version import EventVersion as EventVersionModel
+from ..schemas.version import EventVersion
+
+# Versions are stored either as full snapshots ("keyframes") or, in delta mode, as
+# field-level changes against the previous version:
+#   {"set": {field: new_value, ...}, "unset": [field, ...]}
+# events.version numbers an event's versions from 1. Version 1 and then every
+# VERSION_KEYFRAME_INTERVAL-th version is a keyframe, so rebuilding any version
+# reads at most that many rows. Version order within an event is id order.
+
+def event_snapshot(event) -> Dict[str, Any]:
+    """Full versioned state of an event"""
+    return {
+        "title": event.title,
+        "description": event.description,
+        "start_time": event.start_time.isoformat(),
+        "end_time": event.end_time.isoformat(),
+        "location": event.location,
+        "is_recurring": event.is_recurring,
+        "recurrence_pattern": event.recurrence_pattern
+    }
+
+def compute_delta(old: Dict[str, Any], new: Dict[str, Any]) -> Dict[str, Any]:
+    return {
+        "set": {key: value for key, value in new.items() if key not in old or old[key] != value},
+        "unset": [key for key in old if key not in new]
+    }
+
+def apply_delta(base: Dict[str, Any], delta: Dict[str, Any]) -> Dict[str, Any]:
+    data = dict(base)
+    data.update(delta.get("set", {}))
+    for key in delta.get("unset", []):
+        data.pop(key, None)
+    return data
+
+def materialize(rows: Iterable[EventVersionModel],
+                base: Optional[Dict[str, Any]] = None) -> List[Tuple[EventVersionModel, Dict[str, Any]]]:
+    """
+    Rebuild full snapshots for rows in ascending id order. The first row must be a
+    keyframe unless ``base`` (the snapshot of the version just before it) is given.
+    """
+    result = []
+    data = base
+    for row in rows:
+        data = _next_snapshot(data, row)
+        result.append((row, data))
+    return result
+
+def _next_snapshot(previous: Optional[Dict[str, Any]], row) -> Dict[str, Any]:
+    if row.is_keyframe:
+        return row.data
+    if previous is None:
+        raise ValueError(f"Version {row.id} has no keyframe before it")
+    return apply_delta(previous, row.data)
+
+async def stream_versions(db: AsyncSession, query) -> AsyncIterable[Any]:
+    """
+    Version rows of ``query`` from a server-side cursor, as plain column rows so
+    nothing accumulates in the session's identity map
+    """
+    return await db.stream(
+        query.with_only_columns(*EventVersionModel.__table__.columns)
+        .execution_options(yield_per=settings.CHANGELOG_STREAM_BATCH_SIZE)
+    )
+
+async def materialize_stream(rows: AsyncIterable[Any]) -> AsyncIterator[Tuple[Any, Dict[str, Any]]]:
+    """materialize() for rows arriving in ascending id order, holding one snapshot at a time"""
+    data = None
+    async for row in rows:
+        data = _next_snapshot(data, row)
+        yield row, data
+
+def chain_query(event_id: int, upto_version_id: Optional[int] = None, from_version_id: Optional[int] = None):
+    """
+    Rows from the last keyframe at or before ``from_version_id`` (by default
+    ``upto_version_id``, or the latest version) up to ``upto_version_id``
+    """
+    anchor_id = upto_version_id if from_version_id is None else from_version_id
+    keyframe_id = select(func.max(EventVersionModel.id)).filter(
+        EventVersionModel.event_id == event_id,
+        EventVersionModel.is_keyframe.is_(True)
+    )
+    query = select(EventVersionModel).filter(EventVersionModel.event_id == event_id)
+    if anchor_id is not None:
+        keyframe_id = keyframe_id.filter(EventVersionModel.id <= anchor_id)
+    if upto_version_id is not None:
+        query = query.filter(EventVersionModel.id <= upto_version_id)
+    return query.filter(
+        EventVersionModel.id >= keyframe_id.scalar_subquery()
+    ).order_by(EventVersionModel.id)
+
+async def materialize_page(db: AsyncSession, event_id: int,
+                           rows: Sequence[EventVersionModel]) -> List[Tuple[EventVersionModel, Dict[str, Any]]]:
+    """Snapshots for an arbitrary page of one event's versions, kept in the page's order"""
+    if not rows:
+        return []
+    ids = [row.id for row in rows]
+    chain = (await db.scalars(chain_query(event_id, max(ids), min(ids)))).all()
+    snapshots = {row.id: data for row, data in materialize(chain)}
+    return [(row, snapshots[row.id]) for row in rows]
+
+async def materialize_newest_first(rows: AsyncIterable[Any]) -> AsyncIterator[Tuple[Any, Dict[str, Any]]]:
+    """
+    Rebuild snapshots from rows read newest first. Deltas are held back until the
+    keyframe they build on arrives, so at most VERSION_KEYFRAME_INTERVAL rows are
+    buffered whatever the length of the history.
+    """
+    pending = []
+    async for row in rows:
+        pending.append(row)
+        if row.is_keyframe:
+            for item in reversed(materialize(sorted(pending, key=lambda r: r.id))):
+                yield item
+            pending = []
+    # Only reached with rows left over when the oldest row read is not a keyframe
+    for item in reversed(materialize(sorted(pending, key=lambda r: r.id))):
+        yield item
+
+async def load_version(db: AsyncSession, event_id: int,
+                       version_id: int) -> Optional[Tuple[EventVersionModel, Dict[str, Any]]]:
+    """Fetch one version together with its reconstructed snapshot (one query)"""
+    rows = (await db.scalars(chain_query(event_id, version_id))).all()
+    if not rows or rows[-1].id != version_id:
+        return None
+    return materialize(rows)[-1]
+
+async def load_versions(db: AsyncSession, event_id: int,
+                        version_ids: Iterable[int]) -> Dict[int, Tuple[EventVersionModel, Dict[str, Any]]]:
+    """
+    Several versions with their snapshots, by id, in one query that reads only
+    each version's own keyframe chain. Ids not found are left out.
+    """
+    version_ids = set(version_ids)
+    chains = []
+    for version_id in version_ids:
+        keyframe_id = select(func.max(EventVersionModel.id)).filter(
+            EventVersionModel.event_id == event_id,
+            EventVersionModel.is_keyframe.is_(True),
+            EventVersionModel.id <= version_id
+        ).scalar_subquery()
+        chains.append(and_(EventVersionModel.id >= keyframe_id, EventVersionModel.id <= version_id))
+    rows = (await db.scalars(
+        select(EventVersionModel)
+        .filter(EventVersionModel.event_id == event_id, or_(*chains))
+        .order_by(EventVersionModel.id)
+    )).all()
+    # Each chain starts at a keyframe, so the merged rows rebuild in one pass
+    return {row.id: (row, data) for row, data in materialize(rows) if row.id in version_ids}
+
+async def update_event_row(db: AsyncSession, event_id: int, values: Dict[str, Any],
+                           expected_version: Optional[int] = None) -> Optional[EventModel]:
+    """
+    UPDATE ... RETURNING the event with ``values`` applied and its version number
+    bumped, refreshing an already loaded instance in place. The row lock taken by
+    the UPDATE queues concurrent writers until this transaction ends. With
+    ``expected_version`` only that version is updated; None means no row matched.
+    """
+    query = update(EventModel).where(EventModel.id == event_id)
+    if expected_version is not None:
+        query = query.where(EventModel.version == expected_version)
+    # updated_at is set explicitly: onupdate values aren't synchronized into a loaded instance
+    return (await db.scalars(
+        query.values(**values, version=EventModel.version + 1, updated_at=func.now())
+        .returning(EventModel)
+        .execution_options(populate_existing=True, synchronize_session="fetch")
+    )).one_or_none()
+
+async def create_event_version(db: AsyncSession, event: EventModel, user_id: int, description: str = None,
+                               changed: Optional[Iterable[str]] = None) -> EventVersionModel:
+    """
+    Record the event's current state as its version number ``event.version``,
+    in the caller's transaction (the caller commits). In delta mode only the
+    ``changed`` fields are stored, unless the version is due a keyframe.
+    """
+    data = event_snapshot(event)
+    stored, is_keyframe = data, True
+
+    if (settings.VERSION_STORAGE_MODE == "delta" and changed is not None
+            and (event.version - 1) % settings.VERSION_KEYFRAME_INTERVAL):
+        stored, is_keyframe = {"set": {key: data[key] for key in changed}, "unset": []}, False
+
+    return (await db.scalars(
+        insert(EventVersionModel).values(
+            event_id=event.id,
+            created_by=user_id,
+            data=stored,
+            is_keyframe=is_keyframe,
+            change_description=description
+        ).returning(EventVersionModel)
+    )).one()
+
+def to_schema(version: EventVersionModel, data: Dict[str, Any]) -> EventVersion:
+    """Response model for a version, carrying its full snapshot rather than the stored delta"""
+    return EventVersion(
+        id=version.id,
+        event_id=version.event_id,
+        data=data,
+        created_by=version.created_by,
+        created_at=version.created_at,
+        change_description=version.change_description
+    )
@@ -0,0 +1,189 @@
+"""
+Live-feed broadcast benchmark: holds many SSE streams open on one event, edits
+the event, and measures how long each notification takes to reach every stream.
+
+Latency runs from just before the PUT is sent until a stream has read the
+version.created notification, so it includes the write itself. The server's
+own view (subscriber count, fan-out time, publish-to-send latency) is read
+from /api/diagnostics/stream when --diagnostics-token belongs to a user in the
+server's DIAGNOSTICS_USERS, and is null otherwise. Streams are plain sockets
+rather than httpx clients so that one process can hold ten thousand of them;
+raise the open file limit first (ulimit -n 65536), for the server too.
+
+    python run.py                                  # or: uvicorn app.main:app --workers 1
+    python benchmarks/broadcast.py --base-url http://localhost:8000 --connections 10000 --broadcasts 20
+
+--broker-only measures the in-process broker alone (no HTTP, no database):
+
+    python benchmarks/broadcast.py --broker-only --connections 10000
+
+Requires httpx (pip install -r benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+import time
+from urllib.parse import urlsplit
+
+import httpx
+
+from concurrency import authenticate, percentile
+
+def summarize(latencies) -> dict:
+    return {
+        "count": len(latencies),
+        "p50_ms": round(percentile(latencies, 50) * 1000, 2),
+        "p99_ms": round(percentile(latencies, 99) * 1000, 2),
+        "max_ms": round(max(latencies, default=0.0) * 1000, 2),
+    }
+
+class Stream:
+    """One SSE connection, recording when each version.created notification arrived"""
+
+    def __init__(self):
+        self.received = {}  # event version number -> perf_counter at receipt
+        self.reader = self.writer = None
+
+    async def open(self, host: str, port: int, path: str, headers: dict) -> None:
+        self.reader, self.writer = await asyncio.open_connection(host, port)
+        request = [f"GET {path} HTTP/1.1", f"Host: {host}", "Accept: text/event-stream"]
+        request += [f"{name}: {value}" for name, value in headers.items()]
+        self.writer.write(("\r\n".join(request) + "\r\n\r\n").encode())
+        await self.writer.drain()
+        status = await self.reader.readline()
+        if b" 200 " not in status:
+            raise RuntimeError(f"stream refused: {status.decode().strip()}")
+        # Headers, then the retry: preamble sent once the server has subscribed
+        while not (await self.reader.readline()).startswith(b"retry:"):
+            pass
+
+    async def read(self) -> None:
+        # Chunked framing lines are skipped along with everything that isn't data
+        while True:
+            line = await self.reader.readline()
+            if not line:
+                return
+            if line.startswith(b"data:") and b'"version.created"' in line:
+                self.received[json.loads(line[5:])["version"]] = time.perf_counter()
+
+    def close(self) -> None:
+        if self.writer is not None:
+            self.writer.close()
+
+async def run_http(args) -> dict:
+    url = urlsplit(args.base_url)
+    async with httpx.AsyncClient(base_url=args.base_url, timeout=60) as client:
+        headers = await authenticate(client)
+        response = await client.post("/api/events?force_create=true", json={
+            "title": "Broadcast benchmark",
+            "start_time": "2030-06-01T09:00:00",
+            "end_time": "2030-06-01T10:00:00",
+        }, headers=headers)
+        response.raise_for_status()
+        event_id = response.json()["id"]
+
+        # Open streams a batch at a time so the listen backlog isn't overrun
+        streams = [Stream() for _ in range(args.connections)]
+        started = time.perf_counter()
+        for offset in range(0, len(streams), args.connect_batch):
+            await asyncio.gather(*(
+                stream.open(url.hostname, url.port or 80, f"/api/events/{event_id}/stream", headers)
+                for stream in streams[offset:offset + args.connect_batch]
+            ))
+        connect_time = time.perf_counter() - started
+        readers = [asyncio.create_task(stream.read()) for stream in streams]
+
+        sent_at = {}
+        per_broadcast = []
+        for _ in range(args.broadcasts):
+            sent = time.perf_counter()
+            response = await client.put(f"/api/events/{event_id}", json={"location": f"Room {len(sent_at)}"},
+                                        headers=headers)
+            response.raise_for_status()
+            version = response.json()["version"]
+            sent_at[version] = sent
+            # Wait until every stream has it (or the timeout passes) before the next edit
+            deadline = time.perf_counter() + args.timeout
+            while time.perf_counter() < deadline and not all(version in s.received for s in streams):
+                await asyncio.sleep(0.005)
+            arrivals = [s.received[version] - sent for s in streams if version in s.received]
+            per_broadcast.append(max(arrivals, default=0.0))
+            await asyncio.sleep(args.interval)
+
+        response = await client.get("/api/diagnostics/stream", headers={
+            "Authorization": f"Bearer {args.diagnostics_token}"
+        } if args.diagnostics_token else headers)
+        server = response.json() if response.status_code == 200 else None
+
+        for task in readers:
+            task.cancel()
+        for stream in streams:
+            stream.close()
+
+    latencies = [
+        stream.received[version] - sent
+        for stream in streams for version, sent in sent_at.items() if version in stream.received
+    ]
+    return {
+        "base_url": args.base_url,
+        "connections": args.connections,
+        "connect_s": round(connect_time, 2),
+        "broadcasts": args.broadcasts,
+        "expected_deliveries": args.connections * args.broadcasts,
+        "delivery_latency": summarize(latencies),
+        "last_delivery_per_broadcast": summarize(per_broadcast),
+        "server": server,
+    }
+
+async def run_broker_only(args) -> dict:
+    # The broker is used directly, so the app's settings only need to import
+    sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+    from app.utils.broker import InProcessBroker, event_channel
+
+    broker = InProcessBroker(max_queued=100, heartbeat=15)
+    subscriptions = [broker.subscribe([event_channel(1)]) for _ in range(args.connections)]
+    latencies = []
+
+    async def consume(subscription):
+        while True:
+            message = await subscription.get()
+            if message is not None:
+                latencies.append(time.perf_counter() - message["sent"])
+
+    consumers = [asyncio.create_task(consume(subscription)) for subscription in subscriptions]
+    per_broadcast = []
+    for i in range(args.broadcasts):
+        before = len(latencies)
+        await broker.publish({"type": "version.created", "event_id": 1, "version": i, "sent": time.perf_counter()})
+        while len(latencies) - before < args.connections:
+            await asyncio.sleep(0)
+        per_broadcast.append(max(latencies[before:]))
+    for task in consumers:
+        task.cancel()
+
+    return {
+        "connections": args.connections,
+        "broadcasts": args.broadcasts,
+        "delivery_latency": summarize(latencies),
+        "last_delivery_per_broadcast": summarize(per_broadcast),
+        "server": broker.stats(),
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--connections", type=int, default=1000)
+    parser.add_argument("--broadcasts", type=int, default=20)
+    parser.add_argument("--interval", type=float, default=0.1, help="pause between edits, seconds")
+    parser.add_argument("--timeout", type=float, default=10.0, help="seconds to wait for every stream per edit")
+    parser.add_argument("--connect-batch", type=int, default=200)
+    parser.add_argument("--diagnostics-token", help="access token of a DIAGNOSTICS_USERS user, for the server's stats")
+    parser.add_argument("--broker-only", action="store_true")
+    args = parser.parse_args()
+    run = run_broker_only if args.broker_only else run_http
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
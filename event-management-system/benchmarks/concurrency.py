@@ -0,0 +1,106 @@
+"""
+Concurrent-request throughput benchmark for a running API server.
+
+Registers a throwaway user, seeds a batch of events, then issues authenticated
+GET requests from many concurrent clients and prints throughput and latency
+percentiles as JSON.
+
+    python run.py                                  # or: uvicorn app.main:app --workers 1
+    python benchmarks/concurrency.py --base-url http://localhost:8000 --concurrency 64
+
+Requires httpx (pip install -r benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import statistics
+import time
+import uuid
+
+import httpx
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    if not ordered:
+        return 0.0
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+async def authenticate(client: httpx.AsyncClient) -> dict:
+    name = f"bench_{uuid.uuid4().hex[:12]}"
+    await client.post("/api/auth/register", json={
+        "username": name, "email": f"{name}@example.com", "password": "bench-password"
+    })
+    response = await client.post("/api/auth/login", data={"username": name, "password": "bench-password"})
+    response.raise_for_status()
+    return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+async def seed_events(client: httpx.AsyncClient, headers: dict, count: int) -> list:
+    events = [
+        {
+            "title": f"Bench event {i}",
+            "start_time": f"2030-01-01T{i % 24:02d}:00:00",
+            "end_time": f"2030-01-01T{i % 24:02d}:30:00",
+        }
+        for i in range(count)
+    ]
+    response = await client.post("/api/events/batch?force_create=true", json={"events": events}, headers=headers)
+    response.raise_for_status()
+    return [event["id"] for event in response.json()]
+
+async def run(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=60) as client:
+        headers = await authenticate(client)
+        event_ids = await seed_events(client, headers, args.events)
+
+        latencies = []
+        errors = 0
+        queue = asyncio.Queue()
+        for i in range(args.requests):
+            queue.put_nowait(i)
+
+        async def worker():
+            nonlocal errors
+            while True:
+                try:
+                    i = queue.get_nowait()
+                except asyncio.QueueEmpty:
+                    return
+                # Alternate between the list endpoint and single-event reads
+                url = "/api/events?limit=50" if i % 2 else f"/api/events/{event_ids[i % len(event_ids)]}"
+                started = time.perf_counter()
+                response = await client.get(url, headers=headers)
+                latencies.append(time.perf_counter() - started)
+                if response.status_code != 200:
+                    errors += 1
+
+        started = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(args.concurrency)))
+        elapsed = time.perf_counter() - started
+
+    return {
+        "base_url": args.base_url,
+        "requests": args.requests,
+        "concurrency": args.concurrency,
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(args.requests / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2),
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+    }
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--events", type=int, default=200)
+    args = parser.parse_args()
+    print(json.dumps(asyncio.run(run(args)), indent=2))
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,411 @@
+"""
+End-to-end benchmark suite: seeds a deterministic dataset, then drives each
+router with concurrent clients and reports throughput and latency per scenario.
+
+By default the app runs in-process (httpx's ASGI transport) on a throwaway SQLite
+file; --database-url points it at a local PostgreSQL instead, and --base-url
+benchmarks an already running server (e.g. uvicorn with several workers).
+The same --seed always produces the same users, events, versions and shares,
+so JSON results from two commits can be compared with --baseline.
+
+    python benchmarks/suite.py --output before.json
+    git checkout <other commit>
+    python benchmarks/suite.py --baseline before.json
+
+Requires httpx (pip install -r benchmarks/requirements.txt).
+"""
+import argparse
+import asyncio
+import json
+import os
+import platform
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+from collections import defaultdict
+from datetime import datetime, timedelta
+
+import httpx
+
+from concurrency import percentile
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), ".."))
+PASSWORD = "bench-password"
+LOCATIONS = ["Room A", "Room B", "Main hall", "Online", None]
+SCENARIOS = [
+    "login", "event_list", "event_get", "event_update", "hot_event_update", "changelog", "diff",
+    "share", "freebusy", "suggest_slots", "sync", "calendar_feed", "event_create", "batch", "event_delete",
+]
+
+def git_commit() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], cwd=ROOT, capture_output=True, text=True, check=True
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+async def run_limited(coroutines, concurrency: int) -> list:
+    """Await coroutine factories with at most ``concurrency`` in flight, results in order"""
+    results = [None] * len(coroutines)
+    queue = asyncio.Queue()
+    for item in enumerate(coroutines):
+        queue.put_nowait(item)
+
+    async def worker():
+        while not queue.empty():
+            index, make = queue.get_nowait()
+            results[index] = await make()
+
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    return results
+
+class Dataset:
+    """Deterministic synthetic data: everything derives from the seed"""
+
+    def __init__(self, seed: int, users: int, events_per_user: int, versions: int, fanout: int):
+        self.seed = seed
+        self.rng = random.Random(seed)
+        self.usernames = [f"bench{seed}_user{i}" for i in range(users)]
+        self.events_per_user = events_per_user
+        self.versions = versions
+        self.fanout = min(fanout, users - 1)
+        self.headers = []       # per user
+        self.user_ids = []      # per user
+        self.owned = []         # per user: event ids
+        self.collaborators = defaultdict(set)  # per user: users holding a role on one of the same events
+        self.version_ids = {}   # event id -> (owner, version ids oldest first), sampled events only
+
+    def event(self, owner: int, index: int, rng: random.Random = None) -> dict:
+        rng = rng or self.rng
+        start = datetime(2030, 1, 1) + timedelta(minutes=30 * rng.randrange(0, 2 * 24 * 365))
+        event = {
+            "title": f"Event {owner}-{index}",
+            "description": f"Synthetic event {index} of user {owner}",
+            "start_time": start.isoformat(),
+            "end_time": (start + timedelta(minutes=rng.choice([30, 60, 90, 120]))).isoformat(),
+            "location": rng.choice(LOCATIONS),
+        }
+        if rng.random() < 0.1:
+            event["is_recurring"] = True
+            event["recurrence_pattern"] = {"freq": "weekly", "count": 10}
+        return event
+
+    def all_events(self):
+        return [(owner, event_id) for owner, ids in enumerate(self.owned) for event_id in ids]
+
+async def seed(client: httpx.AsyncClient, data: Dataset, concurrency: int) -> dict:
+    started = time.perf_counter()
+
+    async def register_and_login(name):
+        await client.post("/api/auth/register", json={
+            "username": name, "email": f"{name}@example.com", "password": PASSWORD
+        })
+        response = await client.post("/api/auth/login", data={"username": name, "password": PASSWORD})
+        response.raise_for_status()
+        return {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+    data.headers = await run_limited(
+        [lambda name=name: register_and_login(name) for name in data.usernames], concurrency
+    )
+
+    # Events in user order, one batch each, so ids are the same on every run
+    for owner, headers in enumerate(data.headers):
+        events = [data.event(owner, index) for index in range(data.events_per_user)]
+        response = await client.post("/api/events/batch?force_create=true", json={"events": events}, headers=headers)
+        response.raise_for_status()
+        created = response.json()
+        data.owned.append([event["id"] for event in created])
+        data.user_ids.append(created[0]["owner_id"])
+
+    # K - 1 edits per event on top of its creation version
+    async def edit(owner, event_id, revision):
+        response = await client.put(f"/api/events/{event_id}", json={
+            "title": f"Event {owner} revision {revision}",
+            "description": f"Edited {revision} times",
+        }, headers=data.headers[owner])
+        response.raise_for_status()
+
+    for revision in range(1, data.versions):
+        await run_limited(
+            [lambda owner=owner, event_id=event_id: edit(owner, event_id, revision)
+             for owner, event_id in data.all_events()],
+            concurrency
+        )
+
+    # Every event shared with ``fanout`` other users
+    async def share(owner, event_id, targets):
+        response = await client.post(f"/api/events/{event_id}/share", json={"users": [
+            {"user_id": data.user_ids[target], "role": "editor" if i % 2 else "viewer"}
+            for i, target in enumerate(targets)
+        ]}, headers=data.headers[owner])
+        response.raise_for_status()
+
+    shares = []
+    for owner, event_id in data.all_events():
+        others = [user for user in range(len(data.usernames)) if user != owner]
+        shares.append((owner, event_id, data.rng.sample(others, data.fanout)))
+    if data.fanout:
+        await run_limited(
+            [lambda item=item: share(*item) for item in shares], concurrency
+        )
+    # Free/busy is only visible between users who share an event
+    for owner, _, targets in shares:
+        for user in (owner, *targets):
+            data.collaborators[user].update((owner, *targets))
+
+    # Version ids of a sample of events, for the diff scenario
+    sample = data.rng.sample(data.all_events(), min(100, len(data.all_events())))
+    for owner, event_id in sample:
+        response = await client.get(f"/api/events/{event_id}/changelog?limit=1000", headers=data.headers[owner])
+        response.raise_for_status()
+        data.version_ids[event_id] = (owner, sorted(version["id"] for version in response.json()))
+
+    return {
+        "users": len(data.usernames),
+        "events": len(data.all_events()),
+        "versions": len(data.all_events()) * data.versions,
+        "shares": len(shares) * data.fanout,
+        "elapsed_s": round(time.perf_counter() - started, 2),
+    }
+
+def scenario_requests(name: str, data: Dataset, count: int, batch_size: int, created: list):
+    """
+    (method, url, kwargs, expected status, acting user) for each request of a
+    scenario, drawn from the scenario's own seeded stream
+    """
+    rng = random.Random(f"{data.seed}:{name}")
+    events = data.all_events()
+    users = range(len(data.usernames))
+    requests = []
+    for i in range(count):
+        owner, event_id = rng.choice(events)
+        headers = data.headers[owner]
+        if name == "login":
+            user = rng.choice(users)
+            requests.append(("POST", "/api/auth/login",
+                             {"data": {"username": data.usernames[user], "password": PASSWORD}}, 200, user))
+        elif name == "event_list":
+            user = rng.choice(users)
+            requests.append(("GET", "/api/events?limit=50", {"headers": data.headers[user]}, 200, user))
+        elif name == "event_get":
+            requests.append(("GET", f"/api/events/{event_id}", {"headers": headers}, 200, owner))
+        elif name == "event_update":
+            requests.append(("PUT", f"/api/events/{event_id}",
+                             {"headers": headers, "json": {"location": f"Room {rng.randrange(100)}"}}, 200, owner))
+        elif name == "hot_event_update":
+            # Every client edits the same event, so writers queue on its row
+            hot_owner, hot_event_id = events[0]
+            requests.append(("PUT", f"/api/events/{hot_event_id}",
+                             {"headers": data.headers[hot_owner], "json": {"location": f"Room {rng.randrange(100)}"}},
+                             200, hot_owner))
+        elif name == "changelog":
+            requests.append(("GET", f"/api/events/{event_id}/changelog?limit=50", {"headers": headers}, 200, owner))
+        elif name == "diff":
+            event_id = rng.choice(sorted(data.version_ids))
+            owner, version_ids = data.version_ids[event_id]
+            first, second = sorted(rng.sample(version_ids, 2)) if len(version_ids) > 1 else version_ids * 2
+            requests.append(("GET", f"/api/events/{event_id}/diff/{first}/{second}",
+                             {"headers": data.headers[owner]}, 200, owner))
+        elif name == "share":
+            targets = rng.sample([user for user in users if user != owner], data.fanout)
+            requests.append(("POST", f"/api/events/{event_id}/share", {"headers": headers, "json": {"users": [
+                {"user_id": data.user_ids[target], "role": rng.choice(["viewer", "editor"])} for target in targets
+            ]}}, 200, owner))
+        elif name == "freebusy":
+            # Up to 50 of the caller's collaborators over one month of the seeded two years
+            start = datetime(2030, 1, 1) + timedelta(days=rng.randrange(0, 700))
+            visible = sorted(data.collaborators[owner] | {owner})
+            requests.append(("POST", "/api/freebusy", {"headers": headers, "json": {
+                "user_ids": [data.user_ids[user] for user in rng.sample(visible, min(50, len(visible)))],
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(days=30)).isoformat(),
+            }}, 200, owner))
+        elif name == "suggest_slots":
+            # A one-hour meeting with up to 10 collaborators in a fortnight of working days
+            start = datetime(2030, 1, 1) + timedelta(days=rng.randrange(0, 700))
+            others = sorted(data.collaborators[owner] - {owner})
+            requests.append(("POST", "/api/events/suggest-slots", {"headers": headers, "json": {
+                "user_ids": [data.user_ids[user] for user in rng.sample(others, min(10, len(others)))],
+                "duration_minutes": 60,
+                "start_time": start.isoformat(),
+                "end_time": (start + timedelta(days=14)).isoformat(),
+                "working_hours": {"start": "09:00", "end": "17:00", "timezone": "Europe/Berlin"},
+            }}, 200, owner))
+        elif name == "sync":
+            # A full sync from no token, the heaviest case: the first page of everything the user sees
+            user = rng.choice(users)
+            requests.append(("GET", "/api/sync?limit=500", {"headers": data.headers[user]}, 200, user))
+        elif name == "calendar_feed":
+            # A subscribed calendar app re-downloading the whole feed
+            user = rng.choice(users)
+            requests.append(("GET", "/api/calendar.ics", {"headers": data.headers[user]}, 200, user))
+        elif name == "event_create":
+            requests.append(("POST", "/api/events?force_create=true",
+                             {"headers": headers, "json": data.event(owner, 10_000 + i, rng)}, 200, owner))
+        elif name == "batch":
+            requests.append(("POST", "/api/events/batch?force_create=true", {"headers": headers, "json": {
+                "events": [data.event(owner, 20_000 + i * batch_size + j, rng) for j in range(batch_size)]
+            }}, 200, owner))
+        elif name == "event_delete":
+            if i >= len(created):
+                break
+            owner, event_id = created[i]
+            requests.append(("DELETE", f"/api/events/{event_id}", {"headers": data.headers[owner]}, 204, owner))
+    return requests
+
+async def run_scenario(client: httpx.AsyncClient, requests: list, concurrency: int, on_response=None) -> dict:
+    latencies = []
+    errors = 0
+
+    async def send(method, url, kwargs, expected, user):
+        nonlocal errors
+        started = time.perf_counter()
+        response = await client.request(method, url, **kwargs)
+        latencies.append(time.perf_counter() - started)
+        if response.status_code != expected:
+            errors += 1
+        elif on_response is not None:
+            on_response(user, response)
+
+    started = time.perf_counter()
+    await run_limited([lambda request=request: send(*request) for request in requests], concurrency)
+    elapsed = time.perf_counter() - started
+    if not latencies:
+        return {"requests": 0}
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "elapsed_s": round(elapsed, 3),
+        "throughput_rps": round(len(latencies) / elapsed, 1),
+        "latency_ms": {
+            "mean": round(statistics.mean(latencies) * 1000, 2),
+            "p50": round(percentile(latencies, 50) * 1000, 2),
+            "p99": round(percentile(latencies, 99) * 1000, 2),
+        },
+    }
+
+async def run_suite(client: httpx.AsyncClient, args) -> dict:
+    data = Dataset(args.seed, args.users, args.events_per_user, args.versions, args.fanout)
+    seeded = await seed(client, data, args.concurrency)
+
+    # event_delete removes what event_create added, leaving the seeded data intact
+    created = []
+
+    def remember_created(owner, response):
+        created.append((owner, response.json()["id"]))
+
+    results = {}
+    for name in args.scenarios:
+        requests = scenario_requests(name, data, args.requests, args.batch_size, created)
+        results[name] = await run_scenario(
+            client, requests, args.concurrency, remember_created if name == "event_create" else None
+        )
+    return {"dataset": seeded, "scenarios": results}
+
+async def run_in_process(args) -> dict:
+    # The app reads its settings at import time
+    os.environ["DATABASE_URL"] = args.database_url
+    os.environ.setdefault("AUTO_CREATE_TABLES", "true")
+    sys.path.insert(0, ROOT)
+    from app.main import app
+    from app.database import engine
+
+    await app.router.startup()
+    try:
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://bench", timeout=120) as client:
+            return await run_suite(client, args)
+    finally:
+        await app.router.shutdown()
+        await engine.dispose()
+
+async def run_against_server(args) -> dict:
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+    async with httpx.AsyncClient(base_url=args.base_url, limits=limits, timeout=120) as client:
+        return await run_suite(client, args)
+
+def compare(results: dict, baseline: dict) -> dict:
+    """Relative change per scenario; negative latency and positive throughput are improvements"""
+    def change(new, old):
+        return round(100 * (new - old) / old, 1) if old else None
+
+    changes = {}
+    for name, new in results["scenarios"].items():
+        old = baseline.get("scenarios", {}).get(name)
+        if not old or not old.get("requests") or not new.get("requests"):
+            continue
+        changes[name] = {
+            "throughput_pct": change(new["throughput_rps"], old["throughput_rps"]),
+            "p50_pct": change(new["latency_ms"]["p50"], old["latency_ms"]["p50"]),
+            "p99_pct": change(new["latency_ms"]["p99"], old["latency_ms"]["p99"]),
+        }
+    return {"commit": baseline.get("meta", {}).get("commit"), "changes": changes}
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--base-url", help="benchmark a running server instead of the app in-process")
+    parser.add_argument("--database-url", help="in-process only; default: a temporary SQLite file")
+    parser.add_argument("--seed", type=int, default=42)
+    parser.add_argument("--users", type=int, default=20)
+    parser.add_argument("--events-per-user", type=int, default=25, help="at least 1")
+    parser.add_argument("--versions", type=int, default=5, help="versions per event, creation included")
+    parser.add_argument("--fanout", type=int, default=5, help="users each event is shared with")
+    parser.add_argument("--batch-size", type=int, default=20, help="events per /batch request")
+    parser.add_argument("--requests", type=int, default=200, help="requests per scenario")
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--scenarios", default=",".join(SCENARIOS),
+                        help=f"comma-separated subset of: {', '.join(SCENARIOS)}")
+    parser.add_argument("--output", help="also write the JSON report to this file")
+    parser.add_argument("--baseline", help="JSON report of an earlier run to compare against")
+    args = parser.parse_args()
+
+    if args.events_per_user < 1 or args.users < 2:
+        parser.error("need at least 2 users and 1 event per user")
+    args.scenarios = [name.strip() for name in args.scenarios.split(",") if name.strip()]
+    unknown = set(args.scenarios) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+
+    scratch = None
+    if args.base_url:
+        results = asyncio.run(run_against_server(args))
+        target = args.base_url
+    else:
+        if not args.database_url:
+            scratch = tempfile.mkdtemp(prefix="event-bench-")
+            args.database_url = "sqlite:///" + os.path.join(scratch, "bench.db")
+        results = asyncio.run(run_in_process(args))
+        target = args.database_url.split("://")[0] + " (in-process)"
+
+    report = {
+        "meta": {
+            "commit": git_commit(),
+            "timestamp": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "target": target,
+            "params": {key: getattr(args, key) for key in (
+                "seed", "users", "events_per_user", "versions", "fanout", "batch_size", "requests", "concurrency"
+            )},
+        },
+        **results,
+    }
+    if args.baseline:
+        with open(args.baseline) as baseline:
+            report["baseline"] = compare(report, json.load(baseline))
+
+    output = json.dumps(report, indent=2)
+    print(output)
+    if args.output:
+        with open(args.output, "w") as file:
+            file.write(output + "\n")
+    if scratch:
+        for name in os.listdir(scratch):
+            os.remove(os.path.join(scratch, name))
+        os.rmdir(scratch)
+
+if __name__ == "__main__":
+    main()
\ No newline at end of file
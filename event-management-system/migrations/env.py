@@ -0,0 +1,51 @@
+from logging.config import fileConfig
+
+from alembic import context
+from sqlalchemy import engine_from_config, pool
+
+from app.config import settings
+from app.database import Base
+from app.models import change, event, permission, user, version  # noqa: F401 - registers the tables
+
+config = context.config
+if config.config_file_name is not None:
+    fileConfig(config.config_file_name)
+
+# Same database as the app, through the synchronous driver (psycopg2 / sqlite3);
+# "%" is ConfigParser's interpolation character
+config.set_main_option("sqlalchemy.url", settings.DATABASE_URL_WITH_SSL.replace("%", "%%"))
+target_metadata = Base.metadata
+
+def run_migrations_offline():
+    """Emit the SQL instead of running it: alembic upgrade head --sql"""
+    context.configure(
+        url=config.get_main_option("sqlalchemy.url"),
+        target_metadata=target_metadata,
+        literal_binds=True,
+        dialect_opts={"paramstyle": "named"},
+    )
+    with context.begin_transaction():
+        context.run_migrations()
+
+def run_migrations_online():
+    connectable = engine_from_config(
+        config.get_section(config.config_ini_section, {}),
+        prefix="sqlalchemy.",
+        poolclass=pool.NullPool,
+    )
+    with connectable.connect() as connection:
+        context.configure(
+            connection=connection,
+            target_metadata=target_metadata,
+            # SQLite can't ALTER most things in place; batch mode copies the table instead
+            render_as_batch=connection.dialect.name == "sqlite",
+            # Each revision commits on its own, so a failed index build keeps earlier ones
+            transaction_per_migration=True,
+        )
+        with context.begin_transaction():
+            context.run_migrations()
+
+if context.is_offline_mode():
+    run_migrations_offline()
+else:
+    run_migrations_online()
\ No newline at end of file
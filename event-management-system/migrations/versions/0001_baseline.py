@@ -0,0 +1,80 @@
+"""Baseline: the schema as create_all built it before migrations existed
+
+Databases created that way are marked with `alembic stamp 0001_baseline`
+and then upgraded like any other.
+
+Revision ID: 0001_baseline
+Revises:
+Create Date: 2026-10-18 09:00:00
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects.postgresql import JSONB
+
+revision = "0001_baseline"
+down_revision = None
+branch_labels = None
+depends_on = None
+
+def json_type():
+    return JSONB().with_variant(sa.JSON(), "sqlite")
+
+def upgrade():
+    op.create_table(
+        "users",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("username", sa.String()),
+        sa.Column("email", sa.String()),
+        sa.Column("hashed_password", sa.String()),
+        sa.Column("is_active", sa.Boolean()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_users_id", "users", ["id"])
+    op.create_index("ix_users_username", "users", ["username"], unique=True)
+    op.create_index("ix_users_email", "users", ["email"], unique=True)
+
+    op.create_table(
+        "events",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("title", sa.String()),
+        sa.Column("description", sa.Text()),
+        sa.Column("start_time", sa.DateTime(timezone=True)),
+        sa.Column("end_time", sa.DateTime(timezone=True)),
+        sa.Column("location", sa.String(), nullable=True),
+        sa.Column("is_recurring", sa.Boolean()),
+        sa.Column("recurrence_pattern", json_type(), nullable=True),
+        sa.Column("owner_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_events_id", "events", ["id"])
+    op.create_index("ix_events_title", "events", ["title"])
+
+    op.create_table(
+        "permissions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_id", sa.Integer(), sa.ForeignKey("events.id", ondelete="CASCADE")),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("role", sa.String()),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("updated_at", sa.DateTime(timezone=True)),
+    )
+    op.create_index("ix_permissions_id", "permissions", ["id"])
+
+    op.create_table(
+        "event_versions",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("event_id", sa.Integer(), sa.ForeignKey("events.id", ondelete="CASCADE")),
+        sa.Column("data", json_type()),
+        sa.Column("created_by", sa.Integer(), sa.ForeignKey("users.id")),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+        sa.Column("change_description", sa.Text(), nullable=True),
+    )
+    op.create_index("ix_event_versions_id", "event_versions", ["id"])
+
+def downgrade():
+    op.drop_table("event_versions")
+    op.drop_table("permissions")
+    op.drop_table("events")
+    op.drop_table("users")
\ No newline at end of file
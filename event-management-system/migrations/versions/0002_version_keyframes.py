@@ -0,0 +1,32 @@
+"""event_versions.is_keyframe for delta version storage
+
+scripts/convert_version_storage.py may already have added the column, so it is
+only added when missing.
+
+Revision ID: 0002_version_keyframes
+Revises: 0001_baseline
+Create Date: 2026-10-18 09:10:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0002_version_keyframes"
+down_revision = "0001_baseline"
+branch_labels = None
+depends_on = None
+
+def _has_keyframe_column():
+    if op.get_context().as_sql:
+        return False
+    columns = sa.inspect(op.get_bind()).get_columns("event_versions")
+    return any(column["name"] == "is_keyframe" for column in columns)
+
+def upgrade():
+    if not _has_keyframe_column():
+        with op.batch_alter_table("event_versions") as batch:
+            batch.add_column(sa.Column("is_keyframe", sa.Boolean(), nullable=False, server_default=sa.true()))
+
+def downgrade():
+    # Deltas are unreadable without the flag; run convert_version_storage.py --to full first
+    with op.batch_alter_table("event_versions") as batch:
+        batch.drop_column("is_keyframe")
\ No newline at end of file
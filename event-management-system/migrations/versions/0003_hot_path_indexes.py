@@ -0,0 +1,82 @@
+"""Indexes for the hot query paths
+
+- events (start_time, end_time): overlap predicate of conflict checks and date windows
+- events (start_time, id): keyset pagination of the event list
+- events GiST tstzrange(start_time, end_time): && overlap lookups (PostgreSQL only)
+- permissions (user_id, event_id): "events visible to user X" joins
+- permissions (event_id, user_id) unique: one role per user and event, ON CONFLICT target of sharing
+- event_versions (event_id, created_at, id): newest-first changelog pages
+
+tstzrange() rejects a range that ends before it starts, which the schema used
+to allow, so such events have their start and end swapped first.
+
+On PostgreSQL every index is built CONCURRENTLY, outside a transaction, so
+writes continue while it builds. If a build fails it leaves an INVALID index
+behind; drop it before running the upgrade again.
+
+Revision ID: 0003_hot_path_indexes
+Revises: 0002_version_keyframes
+Create Date: 2026-10-18 09:20:00
+"""
+from contextlib import nullcontext
+
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0003_hot_path_indexes"
+down_revision = "0002_version_keyframes"
+branch_labels = None
+depends_on = None
+
+INDEXES = [
+    ("ix_events_start_end", "events", ["start_time", "end_time"], False),
+    ("ix_events_start_id", "events", ["start_time", "id"], False),
+    ("ix_permissions_user_event", "permissions", ["user_id", "event_id"], False),
+    ("uq_permissions_event_user", "permissions", ["event_id", "user_id"], True),
+    ("ix_event_versions_event_created", "event_versions", ["event_id", "created_at", "id"], False),
+]
+
+# Concurrent shares could insert a user twice; keep the owner row, else the newest
+DEDUPE_PERMISSIONS = """
+    DELETE FROM permissions WHERE id IN (
+        SELECT id FROM (
+            SELECT id, ROW_NUMBER() OVER (
+                PARTITION BY event_id, user_id
+                ORDER BY CASE WHEN role = 'owner' THEN 0 ELSE 1 END, id DESC
+            ) AS position
+            FROM permissions
+        ) ranked
+        WHERE position > 1
+    )
+"""
+
+# Both sides of SET read the old row, so this swaps the two columns
+SWAP_REVERSED_PERIODS = """
+    UPDATE events SET start_time = end_time, end_time = start_time WHERE end_time < start_time
+"""
+
+def _is_postgres():
+    return op.get_context().dialect.name == "postgresql"
+
+def _outside_transaction():
+    # CREATE/DROP INDEX CONCURRENTLY refuses to run inside a transaction block
+    return op.get_context().autocommit_block() if _is_postgres() else nullcontext()
+
+def upgrade():
+    op.execute(DEDUPE_PERMISSIONS)
+    op.execute(SWAP_REVERSED_PERIODS)
+    with _outside_transaction():
+        for name, table, columns, unique in INDEXES:
+            op.create_index(name, table, columns, unique=unique, if_not_exists=True,
+                            postgresql_concurrently=True)
+        if _is_postgres():
+            op.create_index("ix_events_period", "events", [sa.text("tstzrange(start_time, end_time)")],
+                            if_not_exists=True, postgresql_using="gist", postgresql_concurrently=True)
+
+def downgrade():
+    with _outside_transaction():
+        if _is_postgres():
+            op.drop_index("ix_events_period", table_name="events", if_exists=True,
+                          postgresql_concurrently=True)
+        for name, table, _, _ in reversed(INDEXES):
+            op.drop_index(name, table_name=table, if_exists=True, postgresql_concurrently=True)
\ No newline at end of file
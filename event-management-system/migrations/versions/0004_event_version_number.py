@@ -0,0 +1,33 @@
+"""events.version: per-event version number for optimistic locking
+
+Backfilled with the number of versions each event already has, which also keeps
+delta storage's keyframe spacing (version 1, then every
+VERSION_KEYFRAME_INTERVAL-th) in step with histories written before it.
+
+Revision ID: 0004_event_version_number
+Revises: 0003_hot_path_indexes
+Create Date: 2026-10-18 11:40:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0004_event_version_number"
+down_revision = "0003_hot_path_indexes"
+branch_labels = None
+depends_on = None
+
+BACKFILL_VERSIONS = """
+    UPDATE events SET version = (
+        SELECT COUNT(*) FROM event_versions WHERE event_versions.event_id = events.id
+    )
+    WHERE EXISTS (SELECT 1 FROM event_versions WHERE event_versions.event_id = events.id)
+"""
+
+def upgrade():
+    with op.batch_alter_table("events") as batch:
+        batch.add_column(sa.Column("version", sa.Integer(), nullable=False, server_default="1"))
+    op.execute(BACKFILL_VERSIONS)
+
+def downgrade():
+    with op.batch_alter_table("events") as batch:
+        batch.drop_column("version")
@@ -0,0 +1,37 @@
+"""event_changes: per-user change log behind GET /api/sync
+
+Seeded with one row per existing permission, so a client's first sync (without
+a token) returns every event it can see. The table is new and empty until then,
+so its index is built inline rather than concurrently.
+
+Revision ID: 0005_event_changes
+Revises: 0004_event_version_number
+Create Date: 2026-10-18 16:30:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0005_event_changes"
+down_revision = "0004_event_version_number"
+branch_labels = None
+depends_on = None
+
+SEED_CHANGES = """
+    INSERT INTO event_changes (user_id, event_id)
+    SELECT user_id, event_id FROM permissions WHERE user_id IS NOT NULL ORDER BY event_id, user_id
+"""
+
+def upgrade():
+    op.create_table(
+        "event_changes",
+        sa.Column("id", sa.BigInteger().with_variant(sa.Integer(), "sqlite"), primary_key=True),
+        sa.Column("user_id", sa.Integer(), sa.ForeignKey("users.id", ondelete="CASCADE"), nullable=False),
+        sa.Column("event_id", sa.Integer(), nullable=False),
+        sa.Column("created_at", sa.DateTime(timezone=True), server_default=sa.func.now()),
+    )
+    op.execute(SEED_CHANGES)
+    op.create_index("ix_event_changes_user_seq", "event_changes", ["user_id", "id"])
+
+def downgrade():
+    op.drop_index("ix_event_changes_user_seq", table_name="event_changes")
+    op.drop_table("event_changes")
@@ -0,0 +1,32 @@
+"""event_changes (user_id, created_at): when a user's calendar feed last changed
+
+The feed's Last-Modified is the newest change logged for the user, read from
+this index in one lookup. Built CONCURRENTLY on PostgreSQL, outside a
+transaction, since event_changes takes a row for every write.
+
+Revision ID: 0006_event_changes_user_time
+Revises: 0005_event_changes
+Create Date: 2026-10-18 18:10:00
+"""
+from contextlib import nullcontext
+
+from alembic import op
+
+revision = "0006_event_changes_user_time"
+down_revision = "0005_event_changes"
+branch_labels = None
+depends_on = None
+
+def _outside_transaction():
+    # CREATE/DROP INDEX CONCURRENTLY refuses to run inside a transaction block
+    return op.get_context().autocommit_block() if op.get_context().dialect.name == "postgresql" else nullcontext()
+
+def upgrade():
+    with _outside_transaction():
+        op.create_index("ix_event_changes_user_time", "event_changes", ["user_id", "created_at"],
+                        if_not_exists=True, postgresql_concurrently=True)
+
+def downgrade():
+    with _outside_transaction():
+        op.drop_index("ix_event_changes_user_time", table_name="event_changes", if_exists=True,
+                      postgresql_concurrently=True)
@@ -0,0 +1,25 @@
+"""users.feed_token_generation: revoke calendar feed tokens by issuing new ones
+
+Feed tokens carry the generation they were issued at and only the user's
+current one is accepted. Existing tokens carry none and count as generation 0,
+so they keep working until the user next requests a token.
+
+Revision ID: 0007_user_feed_token_generation
+Revises: 0006_event_changes_user_time
+Create Date: 2026-10-18 20:30:00
+"""
+from alembic import op
+import sqlalchemy as sa
+
+revision = "0007_user_feed_token_generation"
+down_revision = "0006_event_changes_user_time"
+branch_labels = None
+depends_on = None
+
+def upgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.add_column(sa.Column("feed_token_generation", sa.Integer(), nullable=False, server_default="0"))
+
+def downgrade():
+    with op.batch_alter_table("users") as batch:
+        batch.drop_column("feed_token_generation")
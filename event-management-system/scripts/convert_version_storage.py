@@ -0,0 +1,93 @@
+"""
+Convert existing event_versions rows between full-snapshot and delta storage.
+
+Adds the is_keyframe column if the table predates it, then rewrites every event's
+history so that every VERSION_KEYFRAME_INTERVAL-th version is a full keyframe and
+the rest are deltas (or, with --to full, expands everything back to snapshots).
+Prints the JSON payload size before and after; --dry-run only skips the row rewrites.
+
+    python scripts/convert_version_storage.py [--to delta|full] [--dry-run]
+"""
+import argparse
+import asyncio
+import json
+import os
+import sys
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), "..")))
+
+from sqlalchemy import inspect, select, text, update
+
+from app.config import settings
+from app.database import SessionLocal, engine
+from app.models import event, permission, user  # noqa: F401 - registers the related mappers
+from app.models.version import EventVersion as EventVersionModel
+from app.utils.versioning import compute_delta, materialize
+
+def payload_size(data) -> int:
+    return len(json.dumps(data, separators=(",", ":"), default=str))
+
+async def ensure_keyframe_column():
+    def add_if_missing(conn):
+        columns = {column["name"] for column in inspect(conn).get_columns("event_versions")}
+        if "is_keyframe" not in columns:
+            conn.execute(text(
+                "ALTER TABLE event_versions ADD COLUMN is_keyframe BOOLEAN NOT NULL DEFAULT TRUE"
+            ))
+    async with engine.begin() as conn:
+        await conn.run_sync(add_if_missing)
+
+async def convert(target: str, interval: int, dry_run: bool) -> dict:
+    totals = {"events": 0, "versions": 0, "bytes_before": 0, "bytes_after": 0}
+
+    async with SessionLocal() as db:
+        event_ids = (await db.scalars(
+            select(EventVersionModel.event_id).distinct().order_by(EventVersionModel.event_id)
+        )).all()
+
+    for event_id in event_ids:
+        async with SessionLocal() as db:
+            rows = (await db.scalars(
+                select(EventVersionModel)
+                .filter(EventVersionModel.event_id == event_id)
+                .order_by(EventVersionModel.id)
+            )).all()
+            snapshots = materialize(rows)
+
+            previous = None
+            for position, (row, data) in enumerate(snapshots):
+                is_keyframe = target == "full" or position % interval == 0
+                stored = data if is_keyframe else compute_delta(previous, data)
+                totals["bytes_before"] += payload_size(row.data)
+                totals["bytes_after"] += payload_size(stored)
+                if not dry_run and (row.is_keyframe != is_keyframe or row.data != stored):
+                    await db.execute(
+                        update(EventVersionModel)
+                        .where(EventVersionModel.id == row.id)
+                        .values(data=stored, is_keyframe=is_keyframe)
+                    )
+                previous = data
+
+            totals["events"] += 1
+            totals["versions"] += len(rows)
+            if not dry_run:
+                await db.commit()
+
+    return totals
+
+async def main(args):
+    await ensure_keyframe_column()
+    totals = await convert(args.to, args.interval, args.dry_run)
+    before, after = totals["bytes_before"], totals["bytes_after"]
+    totals["saved_percent"] = round(100 * (before - after) / before, 1) if before else 0.0
+    totals["dry_run"] = args.dry_run
+    print(json.dumps(totals, indent=2))
+    await engine.dispose()
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Convert event version storage")
+    parser.add_argument("--to", choices=["delta", "full"], default="delta")
+    parser.add_argument("--interval", type=int, default=settings.VERSION_KEYFRAME_INTERVAL,
+                        help="write a full keyframe every N versions")
+    parser.add_argument("--dry-run", action="store_true", help="report sizes without writing")
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,72 @@
+import os
+import sqlite3
+import tempfile
+import uuid
+
+# The app reads its settings at import, so point it at a throwaway SQLite
+# database (and cheap bcrypt) before anything imports it
+DATABASE_PATH = os.path.join(tempfile.mkdtemp(prefix="event-management-tests-"), "test.db")
+os.environ["DATABASE_URL"] = f"sqlite:///{DATABASE_PATH}"
+os.environ["AUTO_CREATE_TABLES"] = "true"
+os.environ["BCRYPT_ROUNDS"] = "4"
+os.environ["PASSWORD_HASH_WORKERS"] = "0"
+os.environ["QUERY_BUDGET_MODE"] = "raise"
+
+import pytest
+from fastapi.testclient import TestClient
+
+pytest_plugins = ["app.testing"]
+
+@pytest.fixture(scope="session")
+def client():
+    from app.main import app
+    with TestClient(app) as client:
+        yield client
+
+@pytest.fixture
+def sql():
+    """Run raw SQL on the test database, e.g. to plant rows the API would refuse"""
+    def execute(statement: str, *params):
+        with sqlite3.connect(DATABASE_PATH) as conn:
+            return conn.execute(statement, params).fetchall()
+    return execute
+
+def register(client):
+    """A freshly registered user and its auth headers; its password is "password" """
+    name = f"user_{uuid.uuid4().hex[:12]}"
+    response = client.post("/api/auth/register", json={
+        "username": name, "email": f"{name}@example.com", "password": "password"
+    })
+    assert response.status_code == 200, response.text
+    user = response.json()
+    response = client.post("/api/auth/login", data={"username": name, "password": "password"})
+    assert response.status_code == 200, response.text
+    return user, {"Authorization": f"Bearer {response.json()['access_token']}"}
+
+@pytest.fixture
+def registered(client):
+    return register(client)
+
+@pytest.fixture
+def user(registered):
+    return registered[0]
+
+@pytest.fixture
+def auth_headers(registered):
+    return registered[1]
+
+@pytest.fixture
+def other_user(client):
+    """A second user, with its auth headers"""
+    return register(client)
+
+@pytest.fixture
+def event(client, auth_headers):
+    """An event owned by the ``user``"""
+    response = client.post("/api/events", json={
+        "title": "Planning",
+        "start_time": "2030-01-07T09:00:00Z",
+        "end_time": "2030-01-07T10:00:00Z",
+    }, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    return response.json()
@@ -0,0 +1,26 @@
+from app.utils.auth import user_cache
+
+def test_feed_token_revoked_by_a_newer_one(client, auth_headers, event):
+    old = client.post("/api/calendar/feed-token", headers=auth_headers).json()["token"]
+    assert client.get("/api/calendar.ics", params={"token": old}).status_code == 200
+
+    new = client.post("/api/calendar/feed-token", headers=auth_headers).json()["token"]
+    response = client.get("/api/calendar.ics", params={"token": old})
+    assert response.status_code == 401
+    response = client.get("/api/calendar.ics", params={"token": new})
+    assert response.status_code == 200
+    assert "BEGIN:VEVENT" in response.text
+
+def test_feed_token_issued_after_the_user_was_cached(client, user, auth_headers, monkeypatch):
+    token = client.post("/api/calendar/feed-token", headers=auth_headers).json()["token"]
+    # As if another process had issued the token: this one still caches the old generation
+    client.get("/api/events", headers=auth_headers)
+    cached = user_cache.get(user["username"])
+    assert cached is not None
+    monkeypatch.setattr(cached, "feed_token_generation", cached.feed_token_generation - 1)
+    assert client.get("/api/calendar.ics", params={"token": token}).status_code == 200
+
+def test_feed_token_opens_only_the_feeds(client, auth_headers):
+    token = client.post("/api/calendar/feed-token", headers=auth_headers).json()["token"]
+    response = client.get("/api/events", headers={"Authorization": f"Bearer {token}"})
+    assert response.status_code == 401
@@ -0,0 +1,36 @@
+import pytest
+
+def test_create_rejects_an_event_that_ends_before_it_starts(client, auth_headers):
+    for end_time in ["2030-01-07T08:00:00Z", "2030-01-07T09:00:00Z", "2030-01-07T09:30:00+01:00"]:
+        response = client.post("/api/events", json={
+            "title": "Backwards", "start_time": "2030-01-07T09:00:00Z", "end_time": end_time
+        }, headers=auth_headers)
+        assert response.status_code == 422, end_time
+
+def test_update_rejects_a_period_that_ends_before_it_starts(client, auth_headers, event):
+    # Checked against the stored end when only the start is sent
+    for changes in [{"start_time": "2030-01-07T11:00:00Z"},
+                    {"end_time": "2030-01-07T08:00:00Z"},
+                    {"start_time": "2030-01-07T12:00:00Z", "end_time": "2030-01-07T11:00:00Z"}]:
+        response = client.put(f"/api/events/{event['id']}", json=changes, headers=auth_headers)
+        assert response.status_code == 422, changes
+    response = client.put(f"/api/events/{event['id']}", json={"end_time": "2030-01-07T12:00:00Z"},
+                          headers=auth_headers)
+    assert response.status_code == 200, response.text
+
+@pytest.mark.parametrize("legacy_period", [
+    "end_time = start_time",
+    "start_time = end_time, end_time = start_time",
+])
+def test_legacy_rows_with_a_bad_period_still_read(client, auth_headers, event, sql, legacy_period):
+    # Rows stored before the check existed, which SQLite deployments never migrate
+    sql(f"UPDATE events SET {legacy_period} WHERE id = ?", event["id"])
+
+    assert client.get(f"/api/events/{event['id']}", headers=auth_headers).status_code == 200
+    response = client.get("/api/events", headers=auth_headers)
+    assert response.status_code == 200
+    assert [item["id"] for item in response.json()] == [event["id"]]
+    assert client.get("/api/sync", headers=auth_headers).status_code == 200
+    response = client.put(f"/api/events/{event['id']}", json={"title": "Renamed"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["title"] == "Renamed"
@@ -0,0 +1,133 @@
+"""
+One request per router under the query_budget fixture, with the in-process
+caches cleared first, since the routes' budgets are set for a cold cache.
+"""
+import pytest
+
+from app.config import settings
+from app.utils.acl import access_cache
+from app.utils.auth import user_cache
+from app.utils.hashing import password_hasher
+from app.utils.pagination import NEXT_CURSOR_HEADER
+
+@pytest.fixture(autouse=True)
+def cold_caches():
+    user_cache.clear()
+    access_cache.clear()
+
+def test_auth_login_upgrading_the_hash(client, user, monkeypatch, query_budget):
+    # A changed cost factor makes login rewrite the user's hash: the worst case
+    monkeypatch.setattr(password_hasher, "rounds", password_hasher.rounds + 1)
+    with query_budget(2):
+        response = client.post("/api/auth/login", data={"username": user["username"], "password": "password"})
+    assert response.status_code == 200
+
+def batch(count):
+    return {"events": [
+        {"title": f"Batch {i}", "start_time": f"2031-02-{i + 1:02d}T09:00:00Z", "end_time": f"2031-02-{i + 1:02d}T10:00:00Z"}
+        for i in range(count)
+    ]}
+
+def test_events_batch(client, auth_headers, query_budget):
+    with query_budget(6):
+        response = client.post("/api/events/batch", json=batch(20), headers=auth_headers)
+    assert response.status_code == 200
+    assert [event["title"] for event in response.json()] == [f"Batch {i}" for i in range(20)]
+
+def test_events_batch_over_several_chunks(client, auth_headers, monkeypatch, query_budget):
+    # Each chunk after the first adds its four INSERTs to the route's budget
+    monkeypatch.setattr(settings, "BATCH_INSERT_CHUNK_SIZE", 5)
+    with query_budget(6 + 4 * 3):
+        response = client.post("/api/events/batch", json=batch(20), headers=auth_headers)
+    assert response.status_code == 200
+    assert [event["title"] for event in response.json()] == [f"Batch {i}" for i in range(20)]
+
+def test_events_batch_with_optional_fields(client, auth_headers, query_budget):
+    # Rows with and without a description or location still go in one INSERT
+    events = batch(6)["events"]
+    for i, event in enumerate(events):
+        event["start_time"] = event["start_time"].replace("2031-02", "2031-03")
+        event["end_time"] = event["end_time"].replace("2031-02", "2031-03")
+        if i % 2:
+            event["location"] = f"Room {i}"
+        if i % 3:
+            event["description"] = f"Agenda {i}"
+    with query_budget(6):
+        response = client.post("/api/events/batch", json={"events": events}, headers=auth_headers)
+    assert response.status_code == 200
+    assert [(event["location"], event["description"]) for event in response.json()] == [
+        (event.get("location"), event.get("description")) for event in events
+    ]
+
+def test_events_get_event(client, auth_headers, event, query_budget):
+    with query_budget(2):
+        response = client.get(f"/api/events/{event['id']}", headers=auth_headers)
+    assert response.status_code == 200
+
+def test_events_list_past_series_without_occurrences(client, auth_headers, event, query_budget):
+    # Each of these ended long before the window but is still a candidate row for it
+    response = client.post("/api/events/batch", json={"events": [
+        {"title": f"Over {day}", "start_time": f"2029-01-{day:02d}T09:00:00Z",
+         "end_time": f"2029-01-{day:02d}T10:00:00Z", "is_recurring": True,
+         "recurrence_pattern": {"freq": "daily", "count": 1}}
+        for day in range(1, 21)
+    ]}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+
+    params = {"start_date": "2030-01-01T00:00:00Z", "end_date": "2030-02-01T00:00:00Z", "limit": 2}
+    found, pages = [], 0
+    while True:
+        with query_budget(5):
+            response = client.get("/api/events", params=params, headers=auth_headers)
+        assert response.status_code == 200
+        found += [item["id"] for item in response.json()]
+        pages += 1
+        if NEXT_CURSOR_HEADER not in response.headers:
+            break
+        params["cursor"] = response.headers[NEXT_CURSOR_HEADER]
+    # Short pages carry the cursor on until the live event turns up
+    assert found == [event["id"]]
+    assert pages == 2
+
+def test_collaboration_list_permissions(client, auth_headers, event, query_budget):
+    with query_budget(3):
+        response = client.get(f"/api/events/{event['id']}/permissions", headers=auth_headers)
+    assert response.status_code == 200
+
+def test_versions_changelog(client, auth_headers, event, query_budget):
+    client.put(f"/api/events/{event['id']}", json={"location": "Room 1"}, headers=auth_headers)
+    user_cache.clear()
+    access_cache.clear()
+    with query_budget(4):
+        response = client.get(f"/api/events/{event['id']}/changelog", headers=auth_headers)
+    assert response.status_code == 200
+    assert len(response.json()) == 2
+
+def test_scheduling_freebusy(client, user, auth_headers, event, query_budget):
+    with query_budget(3):
+        response = client.post("/api/freebusy", json={
+            "user_ids": [user["id"]],
+            "start_time": "2030-01-07T00:00:00Z",
+            "end_time": "2030-01-08T00:00:00Z",
+        }, headers=auth_headers)
+    assert response.status_code == 200
+
+def test_sync_full(client, auth_headers, event, query_budget):
+    with query_budget(3):
+        response = client.get("/api/sync", headers=auth_headers)
+    assert response.status_code == 200
+
+def test_calendar_feed(client, auth_headers, event, query_budget):
+    with query_budget(3):
+        response = client.get("/api/calendar.ics", headers=auth_headers)
+    assert response.status_code == 200
+    assert "BEGIN:VEVENT" in response.text
+
+def test_calendar_feed_token(client, auth_headers, query_budget):
+    with query_budget(2):
+        response = client.post("/api/calendar/feed-token", headers=auth_headers)
+    assert response.status_code == 200
+    user_cache.clear()
+    with query_budget(3):
+        response = client.get("/api/calendar.ics", params={"token": response.json()["token"]})
+    assert response.status_code == 200
@@ -0,0 +1,121 @@
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+from app.config import settings
+from app.utils.recurrence import expand, horizon, parse_rule
+
+def utc(*args) -> datetime:
+    return datetime(*args, tzinfo=timezone.utc)
+
+def starts(pattern, start, window_start, window_end, duration=timedelta(hours=1)):
+    return [slot for slot, _ in expand(pattern, start, start + duration, window_start, window_end)]
+
+# Monday 3 March 2025, 09:00
+MONDAY = utc(2025, 3, 3, 9)
+
+def test_daily_with_byday_skips_other_weekdays():
+    pattern = {"freq": "daily", "byday": ["MO", "WE", "FR"]}
+    assert starts(pattern, MONDAY, MONDAY, MONDAY + timedelta(days=7)) == [
+        utc(2025, 3, 3, 9), utc(2025, 3, 5, 9), utc(2025, 3, 7, 9),
+    ]
+
+def test_daily_interval_with_byday():
+    # Every other day from a Monday lands on each weekday in turn
+    pattern = {"freq": "daily", "interval": 2, "byday": ["MO", "TU"]}
+    assert starts(pattern, MONDAY, MONDAY, utc(2025, 4, 1)) == [
+        utc(2025, 3, 3, 9), utc(2025, 3, 11, 9), utc(2025, 3, 17, 9), utc(2025, 3, 25, 9), utc(2025, 3, 31, 9),
+    ]
+
+def test_daily_byday_that_is_never_reached():
+    # Every 7th day is always a Monday, so a Tuesday-only series never occurs
+    pattern = {"freq": "daily", "interval": 7, "byday": ["TU"]}
+    assert starts(pattern, MONDAY, MONDAY, utc(2026, 1, 1)) == []
+
+def test_weekly_with_interval():
+    # Starts on a Thursday, so that week's Monday is before the series
+    pattern = {"freq": "weekly", "interval": 2, "byday": ["MO", "TH"]}
+    thursday = utc(2025, 3, 6, 9)
+    assert starts(pattern, thursday, thursday, utc(2025, 4, 8)) == [
+        utc(2025, 3, 6, 9), utc(2025, 3, 17, 9), utc(2025, 3, 20, 9), utc(2025, 3, 31, 9), utc(2025, 4, 3, 9),
+    ]
+
+def test_weekly_with_interval_and_no_byday():
+    pattern = {"freq": "weekly", "interval": 3}
+    assert starts(pattern, MONDAY, MONDAY, utc(2025, 4, 15)) == [
+        utc(2025, 3, 3, 9), utc(2025, 3, 24, 9), utc(2025, 4, 14, 9),
+    ]
+
+@pytest.mark.parametrize("pattern, expected", [
+    # until comes first; a bare date includes that whole day
+    ({"freq": "daily", "count": 10, "until": "2025-03-05"}, 3),
+    # count comes first
+    ({"freq": "daily", "count": 2, "until": "2025-03-31"}, 2),
+    # Same with a series that has no fixed step
+    ({"freq": "weekly", "byday": ["MO", "FR"], "count": 10, "until": "2025-03-14T09:00:00Z"}, 4),
+    ({"freq": "weekly", "byday": ["MO", "FR"], "count": 3, "until": "2025-12-31"}, 3),
+])
+def test_count_and_until_together(pattern, expected):
+    assert len(starts(pattern, MONDAY, MONDAY, utc(2026, 1, 1))) == expected
+
+def test_exception_dates_and_starts():
+    pattern = {"freq": "daily", "exceptions": ["2025-03-04", "2025-03-06T09:00:00Z"]}
+    assert starts(pattern, MONDAY, MONDAY, utc(2025, 3, 8)) == [
+        utc(2025, 3, 3, 9), utc(2025, 3, 5, 9), utc(2025, 3, 7, 9),
+    ]
+
+def test_exceptions_count_towards_count():
+    pattern = {"freq": "weekly", "byday": ["MO", "WE"], "count": 4, "exceptions": ["2025-03-05"]}
+    assert starts(pattern, MONDAY, MONDAY, utc(2026, 1, 1)) == [
+        utc(2025, 3, 3, 9), utc(2025, 3, 10, 9), utc(2025, 3, 12, 9),
+    ]
+
+@pytest.mark.parametrize("pattern", [
+    {"freq": "daily", "count": 40},
+    {"freq": "daily", "interval": 3, "byday": ["MO", "WE", "SA"], "count": 25},
+    {"freq": "weekly", "interval": 2, "byday": ["TU", "SU"], "count": 15, "exceptions": ["2025-04-01"]},
+    {"freq": "weekly", "byday": ["MO"], "until": "2025-06-30"},
+    {"freq": "monthly", "count": 12},
+    {"freq": "yearly", "interval": 2, "count": 5},
+])
+def test_window_mid_series_matches_full_expansion(pattern):
+    everything = starts(pattern, MONDAY, MONDAY, utc(2040, 1, 1), duration=timedelta(hours=2))
+    for window_start, window_end in [(utc(2025, 3, 20), utc(2025, 4, 20)),
+                                     (utc(2025, 3, 17, 10), utc(2025, 5, 1)),
+                                     (utc(2026, 3, 3), utc(2030, 1, 1))]:
+        # An occurrence that started before the window but runs into it counts
+        expected = [slot for slot in everything
+                    if slot < window_end and slot + timedelta(hours=2) > window_start]
+        assert starts(pattern, MONDAY, window_start, window_end, duration=timedelta(hours=2)) == expected
+
+def test_windows_are_half_open():
+    pattern = {"freq": "daily"}
+    # Ends exactly when the window opens, starts exactly when it closes: neither overlaps
+    assert starts(pattern, MONDAY, utc(2025, 3, 4, 10), utc(2025, 3, 5, 9)) == []
+
+def test_monthly_skips_months_without_the_day():
+    pattern = {"freq": "monthly", "count": 4}
+    start = utc(2025, 1, 31, 9)
+    assert starts(pattern, start, start, utc(2026, 1, 1)) == [
+        utc(2025, 1, 31, 9), utc(2025, 3, 31, 9), utc(2025, 5, 31, 9), utc(2025, 7, 31, 9),
+    ]
+
+def test_naive_times_are_utc():
+    pattern = {"freq": "daily", "count": 2}
+    naive = datetime(2025, 3, 3, 9)
+    assert starts(pattern, naive, naive, datetime(2025, 3, 10)) == [utc(2025, 3, 3, 9), utc(2025, 3, 4, 9)]
+
+def test_horizon():
+    assert horizon(datetime(2025, 3, 3)) == utc(2025, 3, 3) + timedelta(days=settings.RECURRENCE_HORIZON_DAYS)
+
+@pytest.mark.parametrize("pattern", [
+    {"freq": "hourly"},
+    {"freq": "daily", "interval": 0},
+    {"freq": "daily", "count": 0},
+    {"freq": "monthly", "byday": ["MO"]},
+    {"freq": "weekly", "byday": ["XX"]},
+    {"freq": "daily", "exceptions": [20250303]},
+])
+def test_invalid_patterns(pattern):
+    with pytest.raises(ValueError):
+        parse_rule(pattern)
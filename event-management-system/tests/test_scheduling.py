@@ -0,0 +1,60 @@
+import pytest
+
+WINDOW = {"start_time": "2030-01-07T00:00:00Z", "end_time": "2030-01-08T00:00:00Z"}
+
+def test_freebusy_of_a_stranger_is_private(client, auth_headers, other_user):
+    stranger, stranger_headers = other_user
+    client.post("/api/events", json={
+        "title": "Private", "start_time": "2030-01-07T13:00:00Z", "end_time": "2030-01-07T14:00:00Z"
+    }, headers=stranger_headers)
+
+    response = client.post("/api/freebusy", json={"user_ids": [stranger["id"]], **WINDOW}, headers=auth_headers)
+    assert response.status_code == 403
+    response = client.post("/api/events/suggest-slots", json={
+        "user_ids": [stranger["id"]], "duration_minutes": 30, **WINDOW
+    }, headers=auth_headers)
+    assert response.status_code == 403
+
+def test_freebusy_of_a_collaborator(client, user, auth_headers, event, other_user):
+    collaborator, collaborator_headers = other_user
+    response = client.post(f"/api/events/{event['id']}/share", json={
+        "users": [{"user_id": collaborator["id"], "role": "viewer"}]
+    }, headers=auth_headers)
+    assert response.status_code == 200, response.text
+    # An event the caller has no role on shows as busy time without its id
+    client.post("/api/events", json={
+        "title": "Private", "start_time": "2030-01-07T13:00:00Z", "end_time": "2030-01-07T14:00:00Z"
+    }, headers=collaborator_headers)
+
+    response = client.post("/api/freebusy", json={"user_ids": [user["id"], collaborator["id"]], **WINDOW},
+                           headers=auth_headers)
+    assert response.status_code == 200, response.text
+    busy = {entry["user_id"]: entry["busy"] for entry in response.json()["users"]}
+    assert [block["event_ids"] for block in busy[collaborator["id"]]] == [[event["id"]], []]
+
+    # Visibility runs both ways, and covers the slot suggester
+    response = client.post("/api/events/suggest-slots", json={
+        "user_ids": [user["id"]], "duration_minutes": 30, **WINDOW
+    }, headers=collaborator_headers)
+    assert response.status_code == 200, response.text
+    assert response.json()["slots"][0]["start_time"].startswith("2030-01-07T00:00:00")
+
+def test_freebusy_of_an_unknown_user(client, auth_headers):
+    response = client.post("/api/freebusy", json={"user_ids": [10 ** 9], **WINDOW}, headers=auth_headers)
+    assert response.status_code == 404
+
+@pytest.mark.parametrize("start_time, end_time, status_code", [
+    ("2030-01-07T00:00:00", "2030-01-08T00:00:00Z", 200),
+    ("2030-01-07T00:00:00Z", "2030-01-08T00:00:00", 200),
+    # 01:00+02:00 is 23:00 UTC the day before, so this window is 25 hours long
+    ("2030-01-07T01:00:00+02:00", "2030-01-08T00:00:00", 200),
+    ("2030-01-08T00:00:00", "2030-01-07T00:00:00Z", 422),
+    ("2030-01-07T00:00:00", "2030-01-07T02:00:00+02:00", 422),
+])
+def test_freebusy_window_mixing_naive_and_aware_times(client, user, auth_headers, start_time, end_time, status_code):
+    # Naive times are UTC, so either end may carry an offset
+    window = {"start_time": start_time, "end_time": end_time}
+    response = client.post("/api/freebusy", json={"user_ids": [user["id"]], **window}, headers=auth_headers)
+    assert response.status_code == status_code, response.text
+    response = client.post("/api/events/suggest-slots", json={"duration_minutes": 30, **window}, headers=auth_headers)
+    assert response.status_code == status_code, response.text
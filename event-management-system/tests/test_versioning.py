@@ -0,0 +1,84 @@
+import json
+import os
+import subprocess
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+from app.utils.versioning import compute_delta, materialize
+
+PROJECT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+SNAPSHOTS = [
+    {"title": "Standup", "location": None, "is_recurring": False, "recurrence_pattern": None},
+    {"title": "Standup", "location": "Room 1", "is_recurring": False, "recurrence_pattern": None},
+    {"title": "Daily standup", "location": "Room 1", "is_recurring": True,
+     "recurrence_pattern": {"freq": "daily", "byday": ["MO", "TU"]}},
+    {"title": "Daily standup", "location": "Room 1", "is_recurring": True,
+     "recurrence_pattern": {"freq": "daily", "byday": ["MO", "TU", "WE"]}},
+    # A field dropped from the snapshot is recorded under "unset"
+    {"title": "Daily standup", "is_recurring": True, "recurrence_pattern": {"freq": "daily"}},
+    {"title": "Daily standup", "location": "Room 2", "is_recurring": False, "recurrence_pattern": None},
+    {"title": "Standup", "location": "Room 2", "is_recurring": False, "recurrence_pattern": None},
+]
+
+def stored_rows(snapshots, interval):
+    """Rows as delta storage writes them: a keyframe every ``interval`` versions, deltas between"""
+    rows, previous = [], None
+    for position, data in enumerate(snapshots):
+        is_keyframe = position % interval == 0
+        rows.append(SimpleNamespace(id=position + 1, is_keyframe=is_keyframe,
+                                    data=data if is_keyframe else compute_delta(previous, data)))
+        previous = data
+    return rows
+
+@pytest.mark.parametrize("interval", [1, 2, 3, len(SNAPSHOTS) + 1])
+def test_delta_chain_rebuilds_full_snapshots(interval):
+    rows = stored_rows(SNAPSHOTS, interval)
+    assert [data for _, data in materialize(rows)] == SNAPSHOTS
+
+def test_delta_chain_from_a_base():
+    rows = stored_rows(SNAPSHOTS, len(SNAPSHOTS))
+    assert [data for _, data in materialize(rows[3:], base=SNAPSHOTS[2])] == SNAPSHOTS[3:]
+
+def test_delta_without_a_keyframe_before_it():
+    rows = stored_rows(SNAPSHOTS, len(SNAPSHOTS))
+    with pytest.raises(ValueError):
+        materialize(rows[1:])
+
+def convert(*args):
+    subprocess.run([sys.executable, "scripts/convert_version_storage.py", *args],
+                   cwd=PROJECT_DIR, env=os.environ, check=True, capture_output=True)
+
+def test_convert_to_delta_and_back_is_lossless(client, auth_headers, event, sql):
+    def stored_versions(event_id):
+        rows = sql("SELECT is_keyframe, data FROM event_versions WHERE event_id = ? ORDER BY id", event_id)
+        return [(bool(is_keyframe), json.loads(data)) for is_keyframe, data in rows]
+
+    for location in ["Room 1", "Room 2", None, "Room 3", "Room 3b", "Room 4"]:
+        response = client.put(f"/api/events/{event['id']}", json={"location": location}, headers=auth_headers)
+        assert response.status_code == 200, response.text
+    response = client.put(f"/api/events/{event['id']}", json={"title": "Review"}, headers=auth_headers)
+    assert response.status_code == 200, response.text
+
+    def history():
+        response = client.get(f"/api/events/{event['id']}/changelog", headers=auth_headers)
+        assert response.status_code == 200, response.text
+        return [version["data"] for version in reversed(response.json())]
+
+    snapshots = history()
+    assert len(snapshots) == 8
+
+    convert("--to", "full")
+    assert stored_versions(event["id"]) == [(True, data) for data in snapshots]
+    assert history() == snapshots
+
+    convert("--to", "delta", "--interval", "3")
+    stored = stored_versions(event["id"])
+    assert [is_keyframe for is_keyframe, _ in stored] == [position % 3 == 0 for position in range(8)]
+    assert history() == snapshots
+
+    convert("--to", "full")
+    assert stored_versions(event["id"]) == [(True, data) for data in snapshots]
+    assert history() == snapshots